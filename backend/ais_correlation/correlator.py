@@ -1,17 +1,100 @@
 import os
+import logging
 import pandas as pd
 from datetime import timedelta
 import numpy as np
+from .store import AISStore, search_area
+from .tracks import closest_points_of_approach
+from telemetry import span
+
+logger = logging.getLogger("aeonblue.ais")
+
+# Per-candidate columns of the fixes bounding each CPA segment
+FIX_COLUMNS = ("fix0_lat", "fix0_lon", "fix0_time", "fix1_lat", "fix1_lon", "fix1_time")
 
 class AISCorrelator:
-    def __init__(self, csv_path: str = None):
+    def __init__(self, csv_path: str = None, store_dir: str = None, backend: str = None):
         if csv_path is None:
             self.csv_path = os.getenv("AIS_CSV_PATH", "DataSet/AIS/marine_cadastre_ais.csv")
         else:
             self.csv_path = csv_path
-        
-        self._cached_df = None
+
+        if store_dir is None:
+            store_dir = os.getenv("AIS_STORE_DIR", "DataSet/AIS/store")
+        self.backend = backend or os.getenv("AIS_BACKEND", "arrow")
+        self.store = self._open_store(store_dir)
+        self._store_ready = False
+
+        # ST_DWithin radius around the backtrack origin (5km to absorb drift margin of error)
+        self.search_radius_m = 5000
+        # Number of ranked vessels returned to the client per origin
+        self.top_k = int(os.getenv("AIS_TOP_K", "10"))
+        # Consecutive fixes further apart than this are not interpolated into one track segment
+        self.max_track_gap_min = 60
+        # Fixes read around the origin to rebuild tracks: covers a 25 kn vessel over one max gap
+        self.track_search_radius_m = self.search_radius_m + 46000
+        # Most recent hourly partitions memory-mapped by the background warm-up
+        self.preload_hours = int(os.getenv("AIS_PRELOAD_HOURS", "24"))
             
+    def _open_store(self, store_dir: str):
+        """
+        The fix store of the configured backend: the Arrow store (default), or PostGIS
+        (AIS_BACKEND=postgis, AIS_DATABASE_URL). The PostGIS table is only created and
+        loaded by `python -m ais_correlation.postgis`; if that backend cannot be used the
+        layer fails, so workers never end up on different stores.
+        """
+        if self.backend == "postgis":
+            from .postgis import PostGISStore
+
+            return PostGISStore()
+        if self.backend != "arrow":
+            raise ValueError(f"Unknown AIS_BACKEND {self.backend!r} (arrow or postgis)")
+        return AISStore(store_dir)
+
+    def _check_postgis(self):
+        """
+        The PostGIS table must already be loaded: schema DDL and a full COPY have no
+        place on the request path of every worker.
+        """
+        if not self.store.is_current():
+            raise RuntimeError("AIS_BACKEND=postgis but the database has no loaded AIS table (or an older layout); "
+                               "load it with `python -m ais_correlation.postgis <csv>`")
+        if os.path.exists(self.csv_path) and not self.store.is_current(self.csv_path):
+            logger.warning("[AIS Correlation] The PostGIS table was not loaded from %s; serving it as loaded.",
+                           self.csv_path)
+        return True
+
+    def cache_fingerprint(self):
+        """
+        Configuration and input-data version of this layer, for the result cache.
+        The data version is the store manifest (which records the source CSV it was built from).
+        """
+        manifest = self.store.read_manifest()
+        if manifest is None and os.path.exists(self.csv_path):
+            data_version = [self.csv_path, os.path.getmtime(self.csv_path)]
+        else:
+            data_version = manifest
+        return {
+            "layer_version": 2,
+            "search_radius_m": self.search_radius_m,
+            "top_k": self.top_k,
+            "max_track_gap_min": self.max_track_gap_min,
+            "data": data_version
+        }
+
+    def preload(self):
+        """
+        Checks the store once and maps its most recent partitions (background warm-up).
+        A missing or stale Arrow store is still built on first use; an unusable PostGIS
+        backend fails here.
+        """
+        if self.backend == "postgis":
+            self._store_ready = self._check_postgis()
+        elif self.store.is_current(self.csv_path):
+            self._store_ready = True
+        if self._store_ready:
+            self.store.preload(self.preload_hours)
+
     def _haversine_distance_m(self, lat1, lon1, lat2, lon2):
         """
         Calculate the great circle distance in meters between two points 
@@ -28,120 +111,207 @@ class AISCorrelator:
         r = 6371000 # Radius of earth in meters
         return c * r
 
-    def get_ais_data(self):
-        """
-        Loads the Marine Cadastre CSV Data if it exists. 
-        Mocks the data block if the directory/file does not exist.
-        """
-        if self._cached_df is not None:
-            return self._cached_df
-
-        if os.path.exists(self.csv_path):
-            print(f"[AIS Correlation] Loading Marine Cadastre Data from {self.csv_path} (This may take a moment on first load...)")
-            cols_to_use = ['mmsi', 'base_date_time', 'longitude', 'latitude', 'sog', 'vessel_name', 'imo', 'call_sign', 'vessel_type']
-            try:
-                self._cached_df = pd.read_csv(self.csv_path, usecols=cols_to_use, low_memory=False)
-            except ValueError:
-                # Fallback if the new dataset format isn't matched exactly
-                self._cached_df = pd.read_csv(self.csv_path, low_memory=False)
-                
-            # Rename columns to match expected mock data structures
-            rename_map = {
-                'mmsi': 'MMSI',
-                'base_date_time': 'BaseDateTime',
-                'longitude': 'LON',
-                'latitude': 'LAT',
-                'sog': 'SOG',
-                'vessel_name': 'VesselName',
-                'imo': 'IMO',
-                'call_sign': 'CallSign',
-                'vessel_type': 'VesselType'
-            }
-            self._cached_df.rename(columns=rename_map, inplace=True)
-            
-            # Fast datetime conversion
-            if 'BaseDateTime' in self._cached_df.columns:
-                print(f"[AIS Correlation] Parsing dates...")
-                # The format is typically '%Y-%m-%d %H:%M:%S' or '%Y-%m-%dT%H:%M:%S'
-                self._cached_df['BaseDateTime'] = pd.to_datetime(self._cached_df['BaseDateTime'], format='mixed', errors='coerce')
-            
-            return self._cached_df
-        else:
-            print(f"[AIS Correlation] CSV {self.csv_path} not found. Generating Mock Marine Cadastre Data...")
-            # Marine Cadastre columns mock
-            return pd.DataFrame({
-                "MMSI": [123456789, 987654321],
-                "BaseDateTime": [pd.to_datetime("2023-11-04T12:00:00"), pd.to_datetime("2023-11-04T12:05:00")],
-                "LAT": [28.582, 28.580],
-                "LON": [-89.704, -89.708],
-                "SOG": [14.5, 0.5],
-                "VesselName": ["MOCK TANKER ALPHA", "MOCK BULK CARRIER BETA"],
-                "IMO": ["IMO1234567", "IMO7654321"],
-                "CallSign": ["WXYZ", "ABCD"],
-                "VesselType": [70, 70] # 70 typically refers to Cargo ships
-            })
+    def get_ais_data(self, time_window_start, time_window_end, columns: list = None, near: tuple = None):
+        """
+        Returns the AIS fixes inside [time_window_start, time_window_end].
+        Reads from the columnar, hour-partitioned store (building it once from the
+        Marine Cadastre CSV if needed), so only the hours covering the window are touched.
+        If `near` = ([(lat, lon), ...], radius_m) is given, the store's spatial index also
+        limits the read to fixes inside the bounding boxes of that radius around the points.
+        Mocks the data block if the directory/file does not exist (Arrow backend only).
+        """
+        if self._store_ready:
+            pass
+        elif self.backend == "postgis":
+            self._store_ready = self._check_postgis()
+        elif self.store.is_current(self.csv_path):
+            self._store_ready = True
+        elif os.path.exists(self.csv_path):
+            logger.info("[AIS Correlation] Columnar store missing or stale. Ingesting %s (one-time cost)...",
+                        self.csv_path)
+            self.store.ingest_csv(self.csv_path)
+            self._store_ready = True
 
-    def execute_forensic_join(self, backtrack_origin: dict, leak_start_time: str):
+        if self._store_ready:
+            if near is not None:
+                return self.store.query(time_window_start, time_window_end, near[0], near[1], columns=columns)
+            return self.store.read_window(time_window_start, time_window_end, columns)
+
+        logger.info("[AIS Correlation] CSV %s not found. Generating Mock Marine Cadastre Data...", self.csv_path)
+        # Marine Cadastre columns mock
+        df = pd.DataFrame({
+            "MMSI": [123456789, 987654321],
+            "BaseDateTime": [pd.to_datetime("2023-11-04T12:00:00"), pd.to_datetime("2023-11-04T12:05:00")],
+            "LAT": [28.582, 28.580],
+            "LON": [-89.704, -89.708],
+            "SOG": [14.5, 0.5],
+            "VesselName": ["MOCK TANKER ALPHA", "MOCK BULK CARRIER BETA"],
+            "IMO": ["IMO1234567", "IMO7654321"],
+            "CallSign": ["WXYZ", "ABCD"],
+            "VesselType": [70, 70] # 70 typically refers to Cargo ships
+        })
+        in_window = (df['BaseDateTime'] >= time_window_start) & (df['BaseDateTime'] <= time_window_end)
+        return df[in_window].reset_index(drop=True)
+
+    def _join_window(self, leak_start_time: str):
         """
-        The Forensic Join (Pandas adaptation of ST_DWithin over Marine Cadastre CSV):
+        The ±30 min attribution window around the leak start, plus the track margin
+        (one max track gap) by which reads are widened to rebuild tracks crossing it.
         """
-        print(f"[AIS Correlation] Executing spatiotemporal join at Origin {backtrack_origin} near {leak_start_time}")
-        
         leak_start = pd.to_datetime(leak_start_time)
         if leak_start.tzinfo is not None:
             leak_start = leak_start.tz_convert('UTC').tz_localize(None)
-            
+
+        track_margin = timedelta(minutes=self.max_track_gap_min)
         time_window_start = leak_start - timedelta(minutes=30)
         time_window_end = leak_start + timedelta(minutes=30)
-        
-        # Load dataset
-        df = self.get_ais_data()
-        
-        # Make sure CSV dates are also naive for a clean comparison
-        if df['BaseDateTime'].dt.tz is not None:
-            df['BaseDateTime'] = df['BaseDateTime'].dt.tz_convert('UTC').dt.tz_localize(None)
-        
-        # 1. Temporal Filter: Filter rows where BaseDateTime is within ±30 min window
-        df_filtered = df[(df['BaseDateTime'] >= time_window_start) & (df['BaseDateTime'] <= time_window_end)].copy()
-        
-        # 2. Spatial Join: Calculate distance between all vessels and the origin point
+        return time_window_start, time_window_end, track_margin
+
+    def execute_forensic_join(self, backtrack_origin: dict, leak_start_time: str):
+        """
+        The Forensic Join (ST_DWithin over Marine Cadastre fixes: in PostGIS itself on the
+        postgis backend, a pandas adaptation over the Arrow store otherwise):
+        """
+        logger.info("[AIS Correlation] Executing spatiotemporal join at Origin %s near %s",
+                    backtrack_origin, leak_start_time)
+        time_window_start, time_window_end, track_margin = self._join_window(leak_start_time)
+
+        # 1. Index lookup: fixes from the hourly buckets and grid cells around the origin,
+        # widened by one max track gap in time and space so that segments passing the origin
+        # between two distant pings are still reconstructed
+        # (store timestamps are naive UTC, matching leak_start)
+        with span("ais.load"):
+            df_fixes = self.get_ais_data(time_window_start - track_margin, time_window_end + track_margin,
+                                         near=([(backtrack_origin["lat"], backtrack_origin["lon"])], self.track_search_radius_m))
+
+        return self._match_vessels(df_fixes, backtrack_origin, leak_start_time,
+                                   time_window_start, time_window_end, track_margin)
+
+    def execute_batch_join(self, origins: list):
+        """
+        Batch Forensic Join for many (backtrack_origin, leak_start_time) pairs at once.
+        Read windows are sorted and merged where they overlap, each merged window is read
+        from the store once for all of its origins (union of their index cells), and the
+        fixes are sorted by time once so every origin's window is a binary-searched slice
+        of the shared frame (sort-merge), followed by a broadcast bounding-box test.
+        Returns one vessel list per origin, in input order.
+        """
+        logger.info("[AIS Correlation] Executing batch spatiotemporal join for %s origins", len(origins))
+        windows = [self._join_window(o["leak_start_time"]) for o in origins]
+        read_start = np.array([(w[0] - w[2]).value for w in windows], dtype=np.int64)
+        read_end = np.array([(w[1] + w[2]).value for w in windows], dtype=np.int64)
+
+        # Group origins whose read windows overlap into clusters served by one read each
+        order = np.argsort(read_start, kind="stable")
+        clusters = []
+        for idx in order:
+            if clusters and read_start[idx] <= clusters[-1]["end"]:
+                clusters[-1]["members"].append(idx)
+                clusters[-1]["end"] = max(clusters[-1]["end"], read_end[idx])
+            else:
+                clusters.append({"start": read_start[idx], "end": read_end[idx], "members": [idx]})
+
+        results = [None] * len(origins)
+        for cluster in clusters:
+            members = cluster["members"]
+            points = [(origins[i]["origin_point"]["lat"], origins[i]["origin_point"]["lon"]) for i in members]
+            with span("ais.load"):
+                df_fixes = self.get_ais_data(pd.Timestamp(cluster["start"]), pd.Timestamp(cluster["end"]),
+                                             near=(points, self.track_search_radius_m))
+            df_fixes = df_fixes.sort_values("BaseDateTime", kind="stable").reset_index(drop=True)
+            fix_ns = df_fixes["BaseDateTime"].to_numpy(dtype="datetime64[ns]").astype(np.int64)
+            fix_lat = df_fixes["LAT"].to_numpy(dtype=np.float64)
+            fix_lon = df_fixes["LON"].to_numpy(dtype=np.float64)
+
+            lo = np.searchsorted(fix_ns, read_start[members], side="left")
+            hi = np.searchsorted(fix_ns, read_end[members], side="right")
+            for i, a, b in zip(members, lo, hi):
+                origin = origins[i]["origin_point"]
+                (lat_min, lat_max, lon_min, lon_max), _ = search_area(origin["lat"], origin["lon"], self.track_search_radius_m)
+                lon_offset = np.abs(((fix_lon[a:b] - origin["lon"] + 180.0) % 360.0) - 180.0)
+                in_box = (fix_lat[a:b] >= lat_min) & (fix_lat[a:b] <= lat_max) & (lon_offset <= lon_max - origin["lon"])
+                time_window_start, time_window_end, track_margin = windows[i]
+                results[i] = self._match_vessels(df_fixes.iloc[a:b][in_box], origin, origins[i]["leak_start_time"],
+                                                 time_window_start, time_window_end, track_margin)
+        return results
+
+    def _match_vessels(self, df_fixes: pd.DataFrame, backtrack_origin: dict, leak_start_time: str,
+                       time_window_start, time_window_end, track_margin):
+        """
+        Turns the AIS fixes read around one origin into the list of nearby vessels.
+        """
         origin_lat = backtrack_origin["lat"]
         origin_lon = backtrack_origin["lon"]
+
+        # 2. Trajectory Join: interpolate every vessel track and find its closest point of
+        # approach (CPA) to the origin inside the ±30 min window, all vessels in one batch
+        with span("ais.temporal_filter"):
+            cpa = closest_points_of_approach(
+                df_fixes["MMSI"].to_numpy(), df_fixes["BaseDateTime"].to_numpy(dtype="datetime64[ns]").astype(np.int64),
+                df_fixes["LAT"].to_numpy(), df_fixes["LON"].to_numpy(), df_fixes["SOG"].to_numpy(),
+                origin_lat, origin_lon, time_window_start.value, time_window_end.value,
+                int(track_margin.total_seconds() * 1e9)
+            )
+        df_vessels = df_fixes.iloc[cpa["row"]].reset_index(drop=True)
+        df_vessels["BaseDateTime"] = pd.to_datetime(cpa["cpa_ns"])
+        df_vessels["SOG"] = cpa["sog"]
+        df_vessels["Heading"] = cpa["heading"]
+        with span("ais.haversine"):
+            df_vessels["Distance_Meters"] = self._haversine_distance_m(cpa["cpa_lat"], cpa["cpa_lon"], origin_lat, origin_lon)
+        df_vessels["CPA_LAT"] = cpa["cpa_lat"]
+        df_vessels["CPA_LON"] = cpa["cpa_lon"]
+        # The AIS fixes the CPA was interpolated between (the same fix twice for a lone fix)
+        df_stop = df_fixes.iloc[cpa["row_stop"]]
+        df_vessels["SEG_END_LAT"] = df_stop["LAT"].to_numpy()
+        df_vessels["SEG_END_LON"] = df_stop["LON"].to_numpy()
+        df_vessels["SEG_END_TIME"] = df_stop["BaseDateTime"].to_numpy()
+        df_start = df_fixes.iloc[cpa["row"]]
+        df_vessels["SEG_START_TIME"] = df_start["BaseDateTime"].to_numpy()
+
+        # Filter vessels whose CPA is within ~5km (adjusted from 500m to account for drift margin of error)
+        df_nearby = df_vessels[df_vessels["Distance_Meters"] <= self.search_radius_m]
         
-        df_filtered["Distance_Meters"] = self._haversine_distance_m(
-            df_filtered["LAT"].values, df_filtered["LON"].values, 
-            origin_lat, origin_lon
-        )
-        
-        # Filter vessels within ~5km (adjusted from 500m to account for drift margin of error)
-        df_nearby = df_filtered[df_filtered["Distance_Meters"] <= 5000].copy()
-        
-        results = []
-        for _, row in df_nearby.iterrows():
-            results.append({
-                "vessel_name": row.get("VesselName", "UNKNOWN VESSEL"),
-                "mmsi": row.get("MMSI", "UNKNOWN"),
-                "imo_number": row.get("IMO", "UNKNOWN"),
-                "flag": "Determined via MMSI",
-                "speed_knots": row.get("SOG", 0.0),
-                "distance_to_origin_m": round(row.get("Distance_Meters", 0), 2),
-                "timestamp": row["BaseDateTime"].isoformat()
-            })
-            
+        # Candidate vessels stay columnar; dicts are only built for the top-K after scoring
+        results = pd.DataFrame({
+            "vessel_name": df_nearby["VesselName"].fillna("UNKNOWN VESSEL"),
+            "mmsi": df_nearby["MMSI"],
+            "imo_number": df_nearby["IMO"].fillna("UNKNOWN"),
+            "flag": "Determined via MMSI",
+            "speed_knots": df_nearby["SOG"].fillna(0.0).round(1),
+            "heading": df_nearby["Heading"],
+            # Closest point of approach along the interpolated track, not the nearest raw ping
+            "distance_to_origin_m": df_nearby["Distance_Meters"].round(2),
+            # Where the CPA happened, so the evidence packet can plot each vessel
+            "cpa_lat": df_nearby["CPA_LAT"].round(6),
+            "cpa_lon": df_nearby["CPA_LON"].round(6),
+            "timestamp": df_nearby["BaseDateTime"],
+            # Bounding AIS fixes, folded into `cpa_fixes` for the top-K by score_confidence
+            "fix0_lat": df_nearby["LAT"].astype(np.float64).round(6),
+            "fix0_lon": df_nearby["LON"].astype(np.float64).round(6),
+            "fix0_time": df_nearby["SEG_START_TIME"],
+            "fix1_lat": df_nearby["SEG_END_LAT"].astype(np.float64).round(6),
+            "fix1_lon": df_nearby["SEG_END_LON"].astype(np.float64).round(6),
+            "fix1_time": df_nearby["SEG_END_TIME"]
+        }).reset_index(drop=True)
+
         # PITCH DEMO FALLBACK: If the exact spatiotemporal window (e.g., passing a 2026 time to a 2025 dataset) 
         # yields zero results, we dynamically synthesize an extremely realistic "live" intersection to impress the judges.
+        # Synthetic vessels are flagged as such and carry no position: the evidence
+        # packet lists them as synthetic and never plots them.
         import random
-        if not results:
+        if results.empty:
             # Use deterministic seed for realistic global variations
             seed = abs(origin_lon * 1000 + origin_lat * 1000)
             random.seed(seed)
-            print(f"[AIS Correlation] Generating unique, high-confidence synthetic live-match for region {origin_lon}, {origin_lat}.")
+            logger.info("[AIS Correlation] Generating unique, high-confidence synthetic live-match for region %s, %s.",
+                        origin_lon, origin_lat)
             
             names_db = ["STI SAN ANTONIO", "NAVE AQUILA", "BW BAUHINIA", "FRONT LION", "SEAWAYS REYMAR", "AEGEAN MARE", "NORDIC PASSAT", "PACIFIC JEWEL", "EAGLE CANTON", "OCEANIS STAR", "OLYMPIC PROXIMITY", "AMAZON VOYAGER", "POLAR EMPRESS"]
             flags_db = ["Panama (PA)", "Liberia (LR)", "Marshall Islands (MH)", "Singapore (SG)", "Hong Kong (HK)", "Malta (MT)", "Bahamas (BS)", "Cyprus (CY)", "Greece (GR)"]
             types_db = ["Oil/Chemical Tanker", "Crude Oil Tanker", "Bulk Carrier", "Container Ship", "General Cargo"]
             
-            results.append({
+            synthetic = []
+            synthetic.append({
                 "vessel_name": random.choice(names_db),
                 "mmsi": str(random.randint(200000000, 700000000)),
                 "imo_number": f"IMO{random.randint(9000000, 9999999)}",
@@ -150,9 +320,10 @@ class AISCorrelator:
                 "type": random.choice(types_db),
                 "heading": f"{random.randint(0, 359)}°",
                 "distance_to_origin_m": random.randint(120, 480),
-                "timestamp": leak_start_time
+                "timestamp": leak_start_time,
+                "synthetic": True
             })
-            results.append({
+            synthetic.append({
                 "vessel_name": random.choice(names_db),
                 "mmsi": str(random.randint(200000000, 700000000)),
                 "imo_number": f"IMO{random.randint(8000000, 8999999)}",
@@ -161,45 +332,99 @@ class AISCorrelator:
                 "type": random.choice(types_db),
                 "heading": f"{random.randint(0, 359)}°",
                 "distance_to_origin_m": random.randint(850, 2500),
-                "timestamp": leak_start_time
+                "timestamp": leak_start_time,
+                "synthetic": True
             })
+            results = pd.DataFrame(synthetic)
             
         return results
 
-    def score_confidence(self, vessels: list):
+    def score_confidence(self, vessels, top_k: int = None):
         """
-        Confidence Scoring: Assigns a probability score based on proximity 
-        to the backtrack origin and speed.
+        Confidence Scoring: Assigns a probability score based on the closest point
+        of approach to the backtrack origin and speed at that point.
+        Scoring runs as column operations over the whole candidate frame (a list of
+        vessel dicts is also accepted); only the `top_k` best (default self.top_k)
+        are selected with argpartition and materialized as dicts, best first.
         """
+        if not isinstance(vessels, pd.DataFrame):
+            vessels = pd.DataFrame(list(vessels))
+        if top_k is None:
+            top_k = self.top_k
+        if vessels.empty:
+            logger.info("[AIS Correlation] Confidence scoring complete.")
+            return []
+
+        distance = vessels["distance_to_origin_m"].to_numpy(dtype=np.float64)
+        speed = vessels["speed_knots"].to_numpy(dtype=np.float64)
+
+        # Penalize for distance > 500m, reward transit speeds vs anchored, clamp percentage
+        score = 100.0 - np.maximum(distance - 500.0, 0.0) * 0.05
+        score += np.where(speed > 5.0, 15.0, -20.0)
+        score = np.round(np.clip(score, 0.0, 100.0), 2)
+
+        # Top-K without a full sort; ties keep candidate order like a stable sort would
+        if top_k and len(score) > top_k:
+            top = np.argpartition(-score, top_k - 1)[:top_k]
+        else:
+            top = np.arange(len(score))
+        top = top[np.lexsort((top, -score[top]))]
+
+        ranked = vessels.iloc[top]
+        columns = {name: ranked[name].tolist() for name in ranked.columns}
+        scores = score[top].tolist()
+        fixes = {name: columns.pop(name) for name in FIX_COLUMNS if name in columns}
         scored_vessels = []
-        for v in vessels:
-            base_score = 100
-            
-            # Penalize for distance > 500m
-            if v["distance_to_origin_m"] > 500:
-                base_score -= (v["distance_to_origin_m"] - 500) * 0.05
-                
-            # Reward transit speeds vs anchored
-            if v["speed_knots"] > 5.0:
-                base_score += 15
-            else:
-                base_score -= 20
-                
-            # Clamp percentage
-            final_score = max(0, min(100, base_score))
-            
-            v_scored = v.copy()
-            v_scored["probability_score_percent"] = round(final_score, 2)
+        for i in range(len(top)):
+            v_scored = {}
+            for name, values in columns.items():
+                value = values[i]
+                if name == "heading" and not isinstance(value, str):
+                    # Interpolated course in degrees; absent for vessels seen in a single fix
+                    if value is None or np.isnan(value):
+                        continue
+                    value = f"{int(round(value)) % 360}°"
+                elif isinstance(value, pd.Timestamp):
+                    value = value.isoformat()
+                v_scored[name] = value
+            if fixes:
+                v_scored["cpa_fixes"] = self._cpa_fixes(fixes, i)
+            v_scored["probability_score_percent"] = scores[i]
             scored_vessels.append(v_scored)
-            
-        print("[AIS Correlation] Confidence scoring complete.")
-        return sorted(scored_vessels, key=lambda x: x["probability_score_percent"], reverse=True)
+
+        logger.info("[AIS Correlation] Confidence scoring complete.")
+        return scored_vessels
+
+    @staticmethod
+    def _cpa_fixes(fixes: dict, i: int):
+        # The real AIS fixes around the CPA, as {lat, lon, timestamp}; one for a lone fix
+        points = []
+        for n in ("0", "1"):
+            point = {"lat": fixes[f"fix{n}_lat"][i], "lon": fixes[f"fix{n}_lon"][i],
+                     "timestamp": pd.Timestamp(fixes[f"fix{n}_time"][i]).isoformat()}
+            if not points or point != points[-1]:
+                points.append(point)
+        return points
 
     def attribute_polluter(self, backtrack_origin_point: dict, leak_start_time: str):
         vessels = self.execute_forensic_join(backtrack_origin_point, leak_start_time)
-        ranked_vessels = self.score_confidence(vessels)
+        with span("ais.scoring"):
+            ranked_vessels = self.score_confidence(vessels)
         
         return {
             "attributed_vessels": ranked_vessels,
             "intersection_time": leak_start_time
         }
+
+    def attribute_polluters(self, origins: list):
+        """
+        Batch variant of attribute_polluter for many slick detections of one scene.
+        `origins` is a list of {"origin_point": {...}, "leak_start_time": str}; the AIS
+        archive is scanned once for the whole batch and one result per origin is returned.
+        """
+        vessel_lists = self.execute_batch_join(origins)
+        with span("ais.scoring"):
+            return [{
+                "attributed_vessels": self.score_confidence(vessels),
+                "intersection_time": origin["leak_start_time"]
+            } for origin, vessels in zip(origins, vessel_lists)]
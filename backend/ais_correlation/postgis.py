@@ -0,0 +1,267 @@
+import io
+import os
+import json
+import threading
+import logging
+from contextlib import contextmanager
+import pandas as pd
+from .store import AISStore, RENAME_MAP, DATA_COLUMNS, NS_PER_HOUR
+
+logger = logging.getLogger("aeonblue.ais")
+
+# Bump whenever the table layout changes so stale databases get reloaded on next ingest
+POSTGIS_FORMAT_VERSION = 1
+
+DEFAULT_DSN = "postgresql://postgres@localhost:5432/aeonblue"
+
+# Table columns, in DATA_COLUMNS order after the timestamp
+TABLE_COLUMNS = ["ts", "mmsi", "lat", "lon", "sog", "vessel_name", "imo", "call_sign", "vessel_type"]
+FRAME_DTYPES = {"MMSI": "int64", "LAT": "float32", "LON": "float32", "SOG": "float32", "VesselType": "float32"}
+
+SCHEMA_SQL = (
+    "CREATE EXTENSION IF NOT EXISTS postgis",
+    # Positions are stored as given and as geography, so ST_DWithin works in meters on
+    # the spheroid; the generated column is filled by COPY without a staging table
+    """CREATE TABLE IF NOT EXISTS ais_fixes (
+        ts timestamp NOT NULL,
+        mmsi bigint NOT NULL,
+        lat real,
+        lon real,
+        sog real,
+        vessel_name text,
+        imo text,
+        call_sign text,
+        vessel_type real,
+        geog geography(Point, 4326) GENERATED ALWAYS AS (ST_SetSRID(ST_MakePoint(lon, lat), 4326)::geography) STORED
+    )""",
+    "CREATE TABLE IF NOT EXISTS ais_manifest (id integer PRIMARY KEY, manifest jsonb NOT NULL)",
+)
+
+# GiST on position; BRIN on time, a few pages per range, since fixes are loaded in time order
+INDEX_SQL = (
+    "CREATE INDEX IF NOT EXISTS ais_fixes_geog ON ais_fixes USING gist (geog)",
+    "CREATE INDEX IF NOT EXISTS ais_fixes_ts ON ais_fixes USING brin (ts) WITH (pages_per_range = 32)",
+)
+
+COPY_SQL = f"COPY ais_fixes ({', '.join(TABLE_COLUMNS)}) FROM STDIN WITH (FORMAT csv)"
+
+# Prepared once per pooled connection; queries only send EXECUTE and the parameters
+PREPARED_SQL = {
+    "ais_window": f"""PREPARE ais_window (timestamp, timestamp) AS
+        SELECT {', '.join(TABLE_COLUMNS)} FROM ais_fixes WHERE ts BETWEEN $1 AND $2""",
+    # ST_DWithin against the multipoint of all origins: one GiST probe for a whole batch
+    "ais_near": f"""PREPARE ais_near (timestamp, timestamp, float8[], float8[], float8) AS
+        SELECT {', '.join(TABLE_COLUMNS)} FROM ais_fixes
+        WHERE ts BETWEEN $1 AND $2
+          AND ST_DWithin(geog, (SELECT ST_Collect(ST_SetSRID(ST_MakePoint(p.lon, p.lat), 4326))::geography
+                                FROM unnest($3, $4) AS p(lat, lon)), $5)""",
+    "ais_count": """PREPARE ais_count (timestamp, timestamp) AS
+        SELECT count(*) FROM ais_fixes WHERE ts BETWEEN $1 AND $2""",
+}
+
+
+class PostGISStore:
+    """
+    AIS fixes in PostgreSQL/PostGIS: an alternative backend to the Arrow store
+    (AIS_BACKEND=postgis), with the same interface for AISCorrelator.
+
+    The spatiotemporal join runs in the database: ST_DWithin on a geography column
+    with a GiST index, within a time range served by a BRIN index on the timestamp.
+    Each process keeps a thread-safe connection pool (AIS_DB_POOL_SIZE, default 4) and
+    the queries are prepared once per connection. Marine Cadastre files are bulk loaded
+    with COPY, the indexes being built after the load.
+    """
+
+    def __init__(self, dsn: str = None, pool_size: int = None):
+        self.dsn = dsn or os.getenv("AIS_DATABASE_URL", DEFAULT_DSN)
+        self.pool_size = pool_size or int(os.getenv("AIS_DB_POOL_SIZE", "4"))
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._prepared = set()  # backend pids of the pooled connections with PREPARED_SQL
+
+    def _get_pool(self):
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    from psycopg2.pool import ThreadedConnectionPool
+
+                    self._pool = ThreadedConnectionPool(1, self.pool_size, self.dsn)
+        return self._pool
+
+    @contextmanager
+    def connection(self):
+        """A pooled connection; the block runs in one transaction, committed on exit."""
+        pool = self._get_pool()
+        conn = pool.getconn()
+        try:
+            if conn.info.backend_pid not in self._prepared:
+                with conn, conn.cursor() as cur:
+                    for sql in PREPARED_SQL.values():
+                        cur.execute(sql)
+                self._prepared.add(conn.info.backend_pid)
+            with conn:
+                yield conn
+        finally:
+            pool.putconn(conn, close=bool(conn.closed))
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.closeall()
+            self._pool = None
+            self._prepared.clear()
+
+    def ensure_schema(self):
+        """Creates the extension, tables and indexes. Run once, by the loader (see __main__)."""
+        with self.connection() as conn, conn.cursor() as cur:
+            for sql in SCHEMA_SQL + INDEX_SQL:
+                cur.execute(sql)
+
+    def _execute(self, statement: str, params: tuple):
+        with self.connection() as conn, conn.cursor() as cur:
+            cur.execute(f"EXECUTE {statement} ({', '.join(['%s'] * len(params))})", params)
+            return cur.fetchall()
+
+    def read_manifest(self):
+        """The load manifest, or None if nothing was loaded (no schema yet included)."""
+        from psycopg2.errors import UndefinedTable
+
+        try:
+            with self.connection() as conn, conn.cursor() as cur:
+                cur.execute("SELECT manifest FROM ais_manifest WHERE id = 1")
+                row = cur.fetchone()
+        except UndefinedTable:
+            return None
+        return row[0] if row else None
+
+    def is_current(self, csv_path: str = None):
+        """
+        True if the table is loaded with the current layout and (when a source CSV is
+        given) that exact file is among the loaded sources.
+        """
+        manifest = self.read_manifest()
+        if manifest is None or manifest.get("version") != POSTGIS_FORMAT_VERSION:
+            return False
+        if csv_path is not None and os.path.exists(csv_path):
+            return self._source_info(csv_path) in manifest.get("sources", [])
+        return True
+
+    @staticmethod
+    def _source_info(csv_path: str):
+        stat = os.stat(csv_path)
+        return {"source": os.path.abspath(csv_path), "size": stat.st_size, "mtime": stat.st_mtime}
+
+    @staticmethod
+    def _copy_buffer(table):
+        """One normalized Arrow chunk (store SCHEMA) as time-ordered CSV rows for COPY."""
+        frame = table.select(["ts"] + DATA_COLUMNS).to_pandas().sort_values("ts", kind="stable")
+        frame["ts"] = pd.to_datetime(frame["ts"])
+        buffer = io.StringIO()
+        frame.to_csv(buffer, header=False, index=False, na_rep="", date_format="%Y-%m-%d %H:%M:%S.%f")
+        buffer.seek(0)
+        return buffer
+
+    def ingest_files(self, csv_paths: list, chunksize: int = 1_000_000):
+        """
+        Replaces the table with the fixes of one or more Marine Cadastre CSVs, streamed
+        in chunks through COPY.
+        """
+        def tables():
+            for csv_path in csv_paths:
+                logger.info("[AIS PostGIS] Loading %s", csv_path)
+                reader = pd.read_csv(csv_path, usecols=lambda c: c in RENAME_MAP or c in RENAME_MAP.values(),
+                                     chunksize=chunksize, low_memory=False)
+                for chunk in reader:
+                    yield AISStore._normalize_chunk(chunk)
+
+        self.ingest_tables(tables(), {"sources": [self._source_info(path) for path in csv_paths]})
+
+    def ingest_csv(self, csv_path: str, chunksize: int = 1_000_000):
+        self.ingest_files([csv_path], chunksize)
+
+    def ingest_tables(self, tables, source_info: dict = None):
+        """
+        Replaces the table with an iterable of Arrow tables in the store SCHEMA, in one
+        transaction: queries wait for the load instead of seeing a partial table. The
+        indexes are dropped for the load and built once at the end, which is much
+        cheaper than maintaining them row by row.
+        """
+        total_rows, first_ns, last_ns = 0, None, None
+        with self.connection() as conn, conn.cursor() as cur:
+            cur.execute("TRUNCATE ais_fixes")
+            cur.execute("DROP INDEX IF EXISTS ais_fixes_geog")
+            cur.execute("DROP INDEX IF EXISTS ais_fixes_ts")
+            for table in tables:
+                if table.num_rows == 0:
+                    continue
+                cur.copy_expert(COPY_SQL, self._copy_buffer(table))
+                ts = table.column("ts").to_numpy()
+                first_ns = int(ts.min()) if first_ns is None else min(first_ns, int(ts.min()))
+                last_ns = int(ts.max()) if last_ns is None else max(last_ns, int(ts.max()))
+                total_rows += table.num_rows
+                logger.info("[AIS PostGIS] Copied %s rows...", total_rows)
+            for sql in INDEX_SQL:
+                cur.execute(sql)
+            cur.execute("ANALYZE ais_fixes")
+
+            manifest = {
+                "version": POSTGIS_FORMAT_VERSION,
+                "backend": "postgis",
+                "rows": total_rows,
+                "start": str(pd.Timestamp(first_ns)) if first_ns is not None else None,
+                "end": str(pd.Timestamp(last_ns)) if last_ns is not None else None
+            }
+            manifest.update(source_info or {})
+            cur.execute("INSERT INTO ais_manifest VALUES (1, %s) ON CONFLICT (id) DO UPDATE SET manifest = EXCLUDED.manifest",
+                        (json.dumps(manifest),))
+        logger.info("[AIS PostGIS] Ingest complete: %s rows.", total_rows)
+
+    def preload(self, hours: int = 24):
+        """
+        Opens a pooled connection (statements prepared) and reads the newest `hours`
+        of fixes once, so their pages are cached before the first query.
+        Returns the number of fixes touched.
+        """
+        manifest = self.read_manifest() or {}
+        if not manifest.get("end"):
+            return 0
+        end = pd.Timestamp(manifest["end"])
+        start = end - pd.Timedelta(nanoseconds=hours * NS_PER_HOUR)
+        fixes = self._execute("ais_count", (start.to_pydatetime(), end.to_pydatetime()))[0][0]
+        logger.info("[AIS PostGIS] Preloaded %s fixes of the last %s hours.", fixes, hours)
+        return fixes
+
+    @staticmethod
+    def _to_frame(rows: list, columns: list):
+        frame = pd.DataFrame.from_records(rows, columns=["BaseDateTime"] + DATA_COLUMNS)
+        frame["BaseDateTime"] = pd.to_datetime(frame["BaseDateTime"]).astype("datetime64[ns]")
+        for name, dtype in FRAME_DTYPES.items():
+            frame[name] = frame[name].astype(dtype)
+        return frame[["BaseDateTime"] + columns]
+
+    def read_window(self, start: pd.Timestamp, end: pd.Timestamp, columns: list = None):
+        """Every fix with start <= BaseDateTime <= end, through the BRIN time index."""
+        rows = self._execute("ais_window", (pd.Timestamp(start).to_pydatetime(), pd.Timestamp(end).to_pydatetime()))
+        return self._to_frame(rows, DATA_COLUMNS if columns is None else columns)
+
+    def query(self, start: pd.Timestamp, end: pd.Timestamp, points: list, radius_m: float,
+              columns: list = None):
+        """
+        Fixes within [start, end] and within `radius_m` (on the spheroid) of any of
+        the (lat, lon) `points`. Exact where the Arrow store returns a bounding-box
+        prefilter; callers apply their distance test either way.
+        """
+        rows = self._execute("ais_near", (pd.Timestamp(start).to_pydatetime(), pd.Timestamp(end).to_pydatetime(),
+                                          [float(lat) for lat, _ in points], [float(lon) for _, lon in points],
+                                          float(radius_m)))
+        return self._to_frame(rows, DATA_COLUMNS if columns is None else columns)
+
+
+if __name__ == "__main__":
+    import sys
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if len(sys.argv) < 2:
+        print("Usage: python -m ais_correlation.postgis <marine_cadastre.csv> [more.csv ...]  (AIS_DATABASE_URL)")
+        sys.exit(1)
+    store = PostGISStore()
+    store.ensure_schema()
+    store.ingest_files(sys.argv[1:])
@@ -0,0 +1,459 @@
+import os
+import json
+import shutil
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+from telemetry import count
+
+logger = logging.getLogger("aeonblue.ais")
+
+# Bump whenever the on-disk layout changes so stale stores get rebuilt on next ingest
+STORE_FORMAT_VERSION = 2
+
+NS_PER_HOUR = 3600 * 1_000_000_000
+
+# Spatial grid of the index: 0.05 deg cells (~5.5 km at the equator), numbered row-major
+# with longitude as the minor axis so every latitude row of a bounding box is one
+# contiguous range of cell ids.
+CELL_DEG = 0.05
+LON_CELLS = int(round(360 / CELL_DEG))
+LAT_CELLS = int(round(180 / CELL_DEG))
+METERS_PER_DEGREE_LAT = 111195.0
+
+# Number of memory-mapped partitions kept open between queries
+OPEN_PARTITION_CACHE = 48
+
+# Marine Cadastre column names -> the names used throughout the correlation layer
+RENAME_MAP = {
+    'mmsi': 'MMSI',
+    'base_date_time': 'BaseDateTime',
+    'longitude': 'LON',
+    'latitude': 'LAT',
+    'sog': 'SOG',
+    'vessel_name': 'VesselName',
+    'imo': 'IMO',
+    'call_sign': 'CallSign',
+    'vessel_type': 'VesselType'
+}
+
+# Physical schema of every partition file. Timestamps are stored pre-parsed as
+# int64 nanoseconds (naive UTC) and positions as float32 to halve the footprint.
+# Rows are sorted by (cell, ts), which makes the cell column itself the spatial index.
+SCHEMA = pa.schema([
+    ("ts", pa.int64()),
+    ("cell", pa.int64()),
+    ("MMSI", pa.int64()),
+    ("LAT", pa.float32()),
+    ("LON", pa.float32()),
+    ("SOG", pa.float32()),
+    ("VesselName", pa.string()),
+    ("IMO", pa.string()),
+    ("CallSign", pa.string()),
+    ("VesselType", pa.float32()),
+])
+DATA_COLUMNS = [name for name in SCHEMA.names if name not in ("ts", "cell")]
+
+
+def cell_index(lat, lon):
+    """
+    Vectorized grid cell id for arrays of positions (NaN positions land in cell -1).
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    row = np.clip(np.floor((lat + 90.0) / CELL_DEG), 0, LAT_CELLS - 1)
+    col = np.floor(((lon + 180.0) % 360.0) / CELL_DEG) % LON_CELLS
+    cells = row * LON_CELLS + col
+    return np.where(np.isfinite(cells), cells, -1).astype(np.int64)
+
+
+def search_area(lat: float, lon: float, radius_m: float):
+    """
+    Bounding box of a radius around a point, plus the inclusive cell id ranges
+    covering it (one range per latitude row, two if the box crosses the antimeridian).
+    """
+    dlat = radius_m / METERS_PER_DEGREE_LAT
+    dlon = min(180.0, dlat / max(0.01, np.cos(np.radians(min(89.9, abs(lat) + dlat)))))
+    bbox = (lat - dlat, lat + dlat, lon - dlon, lon + dlon)
+
+    row_lo = int(np.clip(np.floor((bbox[0] + 90.0) / CELL_DEG), 0, LAT_CELLS - 1))
+    row_hi = int(np.clip(np.floor((bbox[1] + 90.0) / CELL_DEG), 0, LAT_CELLS - 1))
+    col_lo = int(np.floor(((bbox[2] + 180.0) % 360.0) / CELL_DEG)) % LON_CELLS
+    col_hi = int(np.floor(((bbox[3] + 180.0) % 360.0) / CELL_DEG)) % LON_CELLS
+    if dlon >= 180.0:
+        col_spans = [(0, LON_CELLS - 1)]
+    elif col_lo <= col_hi:
+        col_spans = [(col_lo, col_hi)]
+    else:
+        col_spans = [(col_lo, LON_CELLS - 1), (0, col_hi)]
+
+    ranges = [(row * LON_CELLS + a, row * LON_CELLS + b)
+              for row in range(row_lo, row_hi + 1) for a, b in col_spans]
+    return bbox, ranges
+
+
+@contextmanager
+def exclusive_lock(lock_path: str):
+    """Blocking inter-process lock on `lock_path` (fcntl; msvcrt on Windows)."""
+    os.makedirs(os.path.dirname(lock_path) or ".", exist_ok=True)
+    with open(lock_path, "a+b") as f:
+        try:
+            import fcntl
+        except ImportError:
+            fcntl = None
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        else:
+            import msvcrt
+
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue  # LK_LOCK gives up after 10 s; keep waiting
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class AISStore:
+    """
+    Columnar, time-partitioned AIS archive with a spatiotemporal index.
+
+    The Marine Cadastre CSV is converted once into Arrow IPC files, one per hour:
+        <store_dir>/manifest.json
+        <store_dir>/2023-11-04/12.arrow
+    The hourly files are the time buckets; inside each one rows are sorted by
+    (grid cell, timestamp). Files are memory-mapped on read, so a query only
+    touches the pages of the hours, cells and columns it actually needs.
+
+    Builds are serialized across processes by a lock file next to the store and happen
+    in a sibling directory that is renamed into place, so readers never see a
+    half-built store and concurrent first requests do not rebuild it twice.
+    """
+
+    def __init__(self, store_dir: str):
+        self.store_dir = os.path.normpath(store_dir)
+        self.manifest_path = os.path.join(self.store_dir, "manifest.json")
+        self.lock_path = f"{self.store_dir}.lock"
+        self._open_partitions = OrderedDict()
+        self._generation = None  # manifest mtime the open partitions belong to
+
+    def read_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return None
+        with open(self.manifest_path) as f:
+            return json.load(f)
+
+    def is_current(self, csv_path: str = None):
+        """
+        True if the store exists, has the current layout and (when a source CSV is
+        given) was built from that exact file.
+        """
+        manifest = self.read_manifest()
+        if manifest is None or manifest.get("version") != STORE_FORMAT_VERSION:
+            return False
+        if csv_path is not None and os.path.exists(csv_path):
+            stat = os.stat(csv_path)
+            return manifest.get("source_size") == stat.st_size and manifest.get("source_mtime") == stat.st_mtime
+        return True
+
+    def _partition_path(self, hour_bucket: int, root: str = None):
+        hour_start = pd.Timestamp(int(hour_bucket) * NS_PER_HOUR)
+        return os.path.join(root or self.store_dir, hour_start.strftime("%Y-%m-%d"), f"{hour_start.hour:02d}.arrow")
+
+    def _sync_generation(self):
+        """Drops the open partitions when the store has been rebuilt (by any process)."""
+        try:
+            generation = os.stat(self.manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            generation = None
+        if generation != self._generation:
+            self._open_partitions.clear()
+            self._generation = generation
+
+    @staticmethod
+    def _normalize_chunk(chunk: pd.DataFrame):
+        chunk = chunk.rename(columns=RENAME_MAP)
+        ts = pd.to_datetime(chunk['BaseDateTime'], format='mixed', errors='coerce')
+        if ts.dt.tz is not None:
+            ts = ts.dt.tz_convert('UTC').dt.tz_localize(None)
+        valid = ts.notna().to_numpy()
+
+        def text(name):
+            if name not in chunk.columns:
+                return pa.nulls(int(valid.sum()), pa.string())
+            return pa.array(chunk[name][valid].astype("string"), type=pa.string(), from_pandas=True)
+
+        def number(name, dtype):
+            if name not in chunk.columns:
+                return np.full(int(valid.sum()), np.nan, dtype=dtype)
+            return pd.to_numeric(chunk[name][valid], errors='coerce').to_numpy(dtype=dtype)
+
+        lat = number('LAT', np.float32)
+        lon = number('LON', np.float32)
+        return pa.Table.from_arrays([
+            pa.array(ts[valid].to_numpy().astype("datetime64[ns]").astype(np.int64)),
+            pa.array(cell_index(lat, lon)),
+            pa.array(pd.to_numeric(chunk['MMSI'][valid], errors='coerce').fillna(0).to_numpy(dtype=np.int64)),
+            pa.array(lat),
+            pa.array(lon),
+            pa.array(number('SOG', np.float32)),
+            text('VesselName'),
+            text('IMO'),
+            text('CallSign'),
+            pa.array(number('VesselType', np.float32)),
+        ], schema=SCHEMA)
+
+    def ingest_csv(self, csv_path: str, chunksize: int = 1_000_000):
+        """
+        One-time conversion of a Marine Cadastre CSV into the partitioned store.
+        The CSV is streamed in chunks, so memory stays bounded by the chunk size
+        plus the largest single hour of traffic. A process that waited for another
+        one's ingest of the same file finds the store current and returns.
+        """
+        with exclusive_lock(self.lock_path):
+            if self.is_current(csv_path):
+                logger.info("[AIS Store] %s was built from %s by another process.", self.store_dir, csv_path)
+                return
+            logger.info("[AIS Store] Ingesting %s into columnar store at %s", csv_path, self.store_dir)
+            reader = pd.read_csv(csv_path, usecols=lambda c: c in RENAME_MAP or c in RENAME_MAP.values(),
+                                 chunksize=chunksize, low_memory=False)
+            stat = os.stat(csv_path)
+            self._build((self._normalize_chunk(chunk) for chunk in reader), {
+                "source": os.path.abspath(csv_path),
+                "source_size": stat.st_size,
+                "source_mtime": stat.st_mtime
+            })
+
+    def ingest_tables(self, tables, source_info: dict = None):
+        """
+        Builds the store from an iterable of Arrow tables already in SCHEMA
+        (used by the CSV ingest and by the synthetic benchmark generators).
+        """
+        with exclusive_lock(self.lock_path):
+            self._build(tables, source_info)
+
+    def _build(self, tables, source_info: dict = None):
+        """Writes a new store next to the current one and swaps it in. Caller holds the lock."""
+        parent, name = os.path.split(self.store_dir)
+        parent = parent or "."
+        # Leftovers of builds that crashed; nobody else is building while we hold the lock
+        if os.path.isdir(parent):
+            for entry in os.listdir(parent):
+                if entry.startswith((f"{name}.building-", f"{name}.old-")):
+                    shutil.rmtree(os.path.join(parent, entry), ignore_errors=True)
+        build_dir = f"{self.store_dir}.building-{os.getpid()}"
+        staging_dir = os.path.join(build_dir, "_staging")
+        os.makedirs(staging_dir)
+
+        # Pass 1: spill each incoming table's rows into per-hour fragments
+        total_rows = 0
+        for chunk_idx, table in enumerate(tables):
+            buckets = table.column("ts").to_numpy() // NS_PER_HOUR
+            order = np.argsort(buckets, kind="stable")
+            bounds = np.flatnonzero(np.diff(buckets[order])) + 1
+            for rows in np.split(order, bounds):
+                if len(rows) == 0:
+                    continue
+                hour_dir = os.path.join(staging_dir, str(int(buckets[rows[0]])))
+                os.makedirs(hour_dir, exist_ok=True)
+                with ipc.new_file(os.path.join(hour_dir, f"{chunk_idx}.arrow"), SCHEMA) as writer:
+                    writer.write_table(table.take(pa.array(rows)))
+            total_rows += table.num_rows
+            logger.info("[AIS Store] Staged %s rows...", total_rows)
+
+        # Pass 2: compact every hour into a single (cell, ts)-sorted partition file
+        partitions = 0
+        for bucket_name in os.listdir(staging_dir):
+            hour_dir = os.path.join(staging_dir, bucket_name)
+            fragments = [ipc.open_file(pa.memory_map(os.path.join(hour_dir, name))).read_all()
+                         for name in os.listdir(hour_dir)]
+            table = pa.concat_tables(fragments).combine_chunks()
+            order = np.lexsort((table.column("ts").to_numpy(), table.column("cell").to_numpy()))
+            table = table.take(pa.array(order))
+
+            out_path = self._partition_path(int(bucket_name), build_dir)
+            os.makedirs(os.path.dirname(out_path), exist_ok=True)
+            with ipc.new_file(out_path, SCHEMA) as writer:
+                writer.write_table(table)
+            partitions += 1
+        shutil.rmtree(staging_dir)
+
+        manifest = {
+            "version": STORE_FORMAT_VERSION,
+            "cell_deg": CELL_DEG,
+            "rows": total_rows,
+            "partitions": partitions
+        }
+        manifest.update(source_info or {})
+        with open(os.path.join(build_dir, "manifest.json"), "w") as f:
+            json.dump(manifest, f, indent=4)
+
+        # Two renames: readers of the old store keep their memory maps, new reads
+        # see the new store once its manifest is in place
+        old_dir = f"{self.store_dir}.old-{os.getpid()}"
+        if os.path.exists(self.store_dir):
+            os.replace(self.store_dir, old_dir)
+        os.replace(build_dir, self.store_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+        self._sync_generation()
+        logger.info("[AIS Store] Ingest complete: %s rows in %s hourly partitions.", total_rows, partitions)
+
+    def _open_partition(self, hour_bucket: int):
+        """
+        Memory-maps one hourly partition, keeping recently used ones open.
+        Returns None for hours with no traffic.
+        """
+        table = self._open_partitions.get(hour_bucket)
+        if table is not None:
+            self._open_partitions.move_to_end(hour_bucket)
+            return table
+        path = self._partition_path(hour_bucket)
+        if not os.path.exists(path):
+            return None
+        table = ipc.open_file(pa.memory_map(path)).read_all()
+        self._open_partitions[hour_bucket] = table
+        if len(self._open_partitions) > OPEN_PARTITION_CACHE:
+            self._open_partitions.popitem(last=False)
+        return table
+
+    def preload(self, hours: int = 24):
+        """
+        Memory-maps the newest `hours` partitions ahead of the first query, since live
+        detections look up recent traffic. Returns the number opened.
+        """
+        self._sync_generation()
+        hours = min(hours, OPEN_PARTITION_CACHE)
+        buckets = []
+        days = sorted(os.listdir(self.store_dir), reverse=True) if os.path.isdir(self.store_dir) else []
+        for day in days:
+            day_dir = os.path.join(self.store_dir, day)
+            if len(buckets) >= hours or not os.path.isdir(day_dir):
+                continue
+            for name in sorted(os.listdir(day_dir), reverse=True):
+                if name.endswith(".arrow"):
+                    buckets.append(pd.Timestamp(f"{day} {name[:2]}:00").value // NS_PER_HOUR)
+        opened = 0
+        for bucket in reversed(buckets[:hours]):
+            if self._open_partition(bucket) is not None:
+                opened += 1
+        logger.info("[AIS Store] Preloaded %s hourly partitions.", opened)
+        return opened
+
+    @staticmethod
+    def _to_frame(pieces: list, columns: list):
+        if not pieces:
+            frame = pa.Table.from_batches([], schema=SCHEMA).select(["ts"] + columns).to_pandas()
+        else:
+            frame = pa.concat_tables(pieces).to_pandas()
+        frame.insert(0, "BaseDateTime", pd.to_datetime(frame.pop("ts").to_numpy(dtype=np.int64)))
+        return frame
+
+    def read_window(self, start: pd.Timestamp, end: pd.Timestamp, columns: list = None):
+        """
+        Returns every fix with start <= BaseDateTime <= end as a DataFrame.
+        Only the hourly partitions overlapping the window are opened, and only the
+        requested columns are materialized.
+        """
+        self._sync_generation()
+        start_ns = pd.Timestamp(start).value
+        end_ns = pd.Timestamp(end).value
+        columns = DATA_COLUMNS if columns is None else columns
+
+        pieces = []
+        for bucket in range(start_ns // NS_PER_HOUR, end_ns // NS_PER_HOUR + 1):
+            table = self._open_partition(bucket)
+            if table is None:
+                continue
+            ts = table.column("ts").to_numpy()
+            rows = np.flatnonzero((ts >= start_ns) & (ts <= end_ns))
+            count("ais_rows_scanned", len(ts))
+            count("ais_bytes_read", ts.nbytes)
+            if len(rows):
+                pieces.append(table.select(["ts"] + columns).take(pa.array(rows)))
+                count("ais_bytes_read", pieces[-1].nbytes)
+        return self._to_frame(pieces, columns)
+
+    def query(self, start: pd.Timestamp, end: pd.Timestamp, points: list, radius_m: float,
+              columns: list = None):
+        """
+        Spatiotemporal index lookup: fixes within [start, end] whose position lies in
+        the bounding box of `radius_m` around any of the (lat, lon) `points`.
+        Per hourly bucket, the sorted cell column is binary-searched for the merged cell
+        ranges of all boxes, so only rows in covering cells are ever touched. The result
+        is a cheap bounding-box prefilter; callers apply the exact distance test.
+        """
+        self._sync_generation()
+        start_ns = pd.Timestamp(start).value
+        end_ns = pd.Timestamp(end).value
+        columns = DATA_COLUMNS if columns is None else columns
+
+        boxes = []
+        cell_ranges = []
+        for lat, lon in points:
+            (lat_min, lat_max, lon_min, lon_max), ranges = search_area(lat, lon, radius_m)
+            boxes.append((lat, lon, lat_min, lat_max, lon_max - lon))
+            cell_ranges.extend(ranges)
+
+        # Merge overlapping cell ranges of neighbouring points so no row is read twice
+        cell_ranges.sort()
+        merged = [list(cell_ranges[0])]
+        for lo, hi in cell_ranges[1:]:
+            if lo <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], hi)
+            else:
+                merged.append([lo, hi])
+        range_lo = np.array([r[0] for r in merged], dtype=np.int64)
+        range_hi = np.array([r[1] for r in merged], dtype=np.int64)
+
+        pieces = []
+        for bucket in range(start_ns // NS_PER_HOUR, end_ns // NS_PER_HOUR + 1):
+            table = self._open_partition(bucket)
+            if table is None:
+                continue
+            cells = table.column("cell").to_numpy()
+            starts = np.searchsorted(cells, range_lo, side="left")
+            stops = np.searchsorted(cells, range_hi, side="right")
+            spans = stops > starts
+            if not spans.any():
+                continue
+            rows = np.concatenate([np.arange(a, b) for a, b in zip(starts[spans], stops[spans])])
+
+            ts = table.column("ts").to_numpy()[rows]
+            fix_lat = table.column("LAT").to_numpy()[rows]
+            fix_lon = table.column("LON").to_numpy()[rows]
+            in_box = np.zeros(len(rows), dtype=bool)
+            for lat, lon, lat_min, lat_max, dlon in boxes:
+                # Longitudes compared relative to the box centre, which also handles the antimeridian
+                in_box |= ((fix_lat >= lat_min) & (fix_lat <= lat_max) &
+                           (np.abs(((fix_lon - lon + 180.0) % 360.0) - 180.0) <= dlon))
+            count("ais_rows_scanned", len(rows))
+            count("ais_bytes_read", ts.nbytes + fix_lat.nbytes + fix_lon.nbytes)
+            rows = rows[in_box & (ts >= start_ns) & (ts <= end_ns)]
+            if len(rows):
+                pieces.append(table.select(["ts"] + columns).take(pa.array(rows)))
+                count("ais_bytes_read", pieces[-1].nbytes)
+        return self._to_frame(pieces, columns)
+
+
+if __name__ == "__main__":
+    import sys
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if len(sys.argv) < 2:
+        print("Usage: python -m ais_correlation.store <marine_cadastre.csv> [store_dir]")
+        sys.exit(1)
+    source_csv = sys.argv[1]
+    target_dir = sys.argv[2] if len(sys.argv) > 2 else os.getenv("AIS_STORE_DIR", "DataSet/AIS/store")
+    AISStore(target_dir).ingest_csv(source_csv)
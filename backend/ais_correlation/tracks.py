@@ -0,0 +1,101 @@
+import numpy as np
+
+METERS_PER_DEGREE = 111195.0
+
+
+def closest_points_of_approach(mmsi, ts_ns, lat, lon, sog,
+                               origin_lat: float, origin_lon: float,
+                               window_start_ns: int, window_end_ns: int,
+                               max_gap_ns: int):
+    """
+    Vectorized track engine: groups AIS fixes by MMSI, linearly interpolates each
+    track between consecutive fixes and returns every vessel's closest point of
+    approach (CPA) to the origin within [window_start_ns, window_end_ns].
+
+    All tracks are handled in one batched pass over sorted arrays:
+    - consecutive fixes of the same vessel less than `max_gap_ns` apart form a segment,
+    - each segment is projected onto a local tangent plane centred on the origin and
+      the CPA parameter t = clamp(-(p0 . d) / |d|^2) is solved in closed form,
+      restricted to the part of the segment lying inside the time window,
+    - lone fixes inside the window are kept as zero-length segments, so sparsely
+      reporting vessels are still candidates,
+    - the minimum over each vessel's segments is taken with a lexsort + unique.
+
+    Returns a dict of per-vessel arrays: mmsi, row and row_stop (indices of the fixes
+    bounding the CPA segment, equal for lone fixes; row also serves to look up static
+    vessel attributes), cpa_ns, cpa_lat, cpa_lon, sog, heading (NaN for lone fixes).
+    """
+    mmsi = np.asarray(mmsi, dtype=np.int64)
+    ts_ns = np.asarray(ts_ns, dtype=np.int64)
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    sog = np.asarray(sog, dtype=np.float64)
+
+    empty = {
+        "mmsi": np.empty(0, dtype=np.int64), "row": np.empty(0, dtype=np.int64), "row_stop": np.empty(0, dtype=np.int64),
+        "cpa_ns": np.empty(0, dtype=np.int64), "cpa_lat": np.empty(0), "cpa_lon": np.empty(0),
+        "sog": np.empty(0), "heading": np.empty(0)
+    }
+    if len(mmsi) == 0:
+        return empty
+
+    order = np.lexsort((ts_ns, mmsi))
+    mmsi, ts_ns, lat, lon, sog = mmsi[order], ts_ns[order], lat[order], lon[order], sog[order]
+
+    # Local tangent plane (meters) around the origin; longitudes wrapped across the antimeridian
+    kx = METERS_PER_DEGREE * np.cos(np.radians(origin_lat))
+    x = (((lon - origin_lon + 180.0) % 360.0) - 180.0) * kx
+    y = (lat - origin_lat) * METERS_PER_DEGREE
+
+    # Segment candidates: (i, i+1) pairs of the same vessel close enough in time
+    i0 = np.arange(len(mmsi) - 1)
+    dt = ts_ns[1:] - ts_ns[:-1]
+    is_segment = (mmsi[1:] == mmsi[:-1]) & (dt > 0) & (dt <= max_gap_ns)
+    seg = i0[is_segment]
+    seg_dt = dt[is_segment].astype(np.float64)
+
+    # Lone fixes inside the window act as degenerate segments
+    pts = np.flatnonzero((ts_ns >= window_start_ns) & (ts_ns <= window_end_ns))
+
+    start = np.concatenate([seg, pts])
+    stop = np.concatenate([seg + 1, pts])
+    span = np.concatenate([seg_dt, np.zeros(len(pts))])
+
+    dx = x[stop] - x[start]
+    dy = y[stop] - y[start]
+    length2 = dx * dx + dy * dy
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t = np.where(length2 > 0, -(x[start] * dx + y[start] * dy) / length2, 0.0)
+        # Only the part of each segment that falls inside the time window may be used
+        t_lo = np.where(span > 0, (window_start_ns - ts_ns[start]) / span, 0.0)
+        t_hi = np.where(span > 0, (window_end_ns - ts_ns[start]) / span, 0.0)
+    t_lo = np.maximum(t_lo, 0.0)
+    t_hi = np.minimum(t_hi, 1.0)
+    usable = t_lo <= t_hi
+    t = np.clip(t, t_lo, t_hi)
+
+    start, stop, span, t, dx, dy = start[usable], stop[usable], span[usable], t[usable], dx[usable], dy[usable]
+    if len(start) == 0:
+        return empty
+    cx = x[start] + t * dx
+    cy = y[start] + t * dy
+    dist2 = cx * cx + cy * cy
+
+    # Best segment per vessel: sort by (mmsi, distance) and keep the first of each group
+    best_order = np.lexsort((dist2, mmsi[start]))
+    _, first = np.unique(mmsi[start][best_order], return_index=True)
+    best = best_order[first]
+
+    start, stop, span, t = start[best], stop[best], span[best], t[best]
+    moving = (dx[best] != 0) | (dy[best] != 0)
+    heading = np.where(moving, np.degrees(np.arctan2(dx[best], dy[best])) % 360.0, np.nan)
+    return {
+        "mmsi": mmsi[start],
+        "row": order[start],
+        "row_stop": order[stop],
+        "cpa_ns": ts_ns[start] + np.round(t * span).astype(np.int64),
+        "cpa_lat": origin_lat + cy[best] / METERS_PER_DEGREE,
+        "cpa_lon": ((origin_lon + cx[best] / kx + 180.0) % 360.0) - 180.0,
+        "sog": sog[start] + t * (sog[stop] - sog[start]),
+        "heading": heading
+    }
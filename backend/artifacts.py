@@ -0,0 +1,271 @@
+import os
+import re
+import json
+import time
+import shutil
+import sqlite3
+import threading
+import logging
+
+logger = logging.getLogger("aeonblue.artifacts")
+
+ARTIFACTS_ROOT = "Forensic_Reports"
+
+# Kinds of indexed output: evidence packets (reports/<report_id>.pdf), SAR tile
+# pyramids (tiles/<tileset_id>/), result geometry (geometry/<geometry_id>.json) and
+# report figures and SAR thumbnails (thumbnails/*), all named by content hash, plus
+# request profiles (profiles/<run>/)
+KINDS = ("report", "tileset", "geometry", "figure", "profile")
+
+# Content-addressed artifact ids (reports, tilesets, geometry): 20 hex digits of a hash.
+# Ids from URLs are checked against it before they reach a path
+ARTIFACT_ID = re.compile(r"^[0-9a-f]{20}$")
+
+# SELECT fragments over `artifacts a`: every case an artifact belongs to, and whether any is held
+CASES_SQL = "(SELECT json_group_array(c.case_id) FROM artifact_cases c WHERE c.artifact_id = a.artifact_id) AS case_ids"
+HELD_SQL = ("EXISTS (SELECT 1 FROM artifact_cases c JOIN holds h ON h.case_id = c.case_id "
+            "WHERE c.artifact_id = a.artifact_id)")
+
+
+class ArtifactStore:
+    """
+    SQLite index of everything written under Forensic_Reports, with size/age eviction.
+    Artifacts are content-addressed, so writing the same output twice indexes it once;
+    an artifact shared by several cases is mapped to each of them (artifact_cases).
+    Artifacts of any case under legal hold (`hold(case_id)`) are never evicted, nor
+    are pinned artifacts.
+    Listing pages through the index instead of scanning directories.
+    """
+
+    def __init__(self, root: str = ARTIFACTS_ROOT, db_path: str = None, max_bytes: int = None,
+                 max_age_s: float = None):
+        self.root = root
+        self.db_path = db_path or os.getenv("ARTIFACT_DB", os.path.join(root, "artifacts.sqlite"))
+        self.max_bytes = max_bytes or int(float(os.getenv("ARTIFACT_MAX_GB", "20")) * 1024 ** 3)
+        self.max_age_s = max_age_s or float(os.getenv("ARTIFACT_MAX_AGE_DAYS", "90")) * 86400.0
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._writes_since_evict = 0
+        self._evicting = False
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS artifacts (
+                    artifact_id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    case_id TEXT,
+                    size_bytes INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    pinned INTEGER NOT NULL DEFAULT 0,
+                    meta TEXT NOT NULL
+                )""")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS holds (
+                    case_id TEXT PRIMARY KEY,
+                    reason TEXT,
+                    created_at REAL NOT NULL
+                )""")
+            migrate = self._conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'artifact_cases'").fetchone() is None
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS artifact_cases (
+                    artifact_id TEXT NOT NULL,
+                    case_id TEXT NOT NULL,
+                    PRIMARY KEY (artifact_id, case_id)
+                )""")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS artifact_cases_case ON artifact_cases (case_id)")
+            if migrate:
+                # Indexes from before the mapping only knew the first case of each artifact
+                self._conn.execute("INSERT OR IGNORE INTO artifact_cases "
+                                   "SELECT artifact_id, case_id FROM artifacts WHERE case_id IS NOT NULL")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS artifacts_listing ON artifacts (created_at, artifact_id)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS artifacts_case ON artifacts (case_id)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS artifacts_lru ON artifacts (last_access)")
+
+    @staticmethod
+    def _size_of(path: str):
+        if os.path.isdir(path):
+            total = 0
+            for folder, _, names in os.walk(path):
+                for name in names:
+                    try:
+                        total += os.path.getsize(os.path.join(folder, name))
+                    except OSError:
+                        pass
+            return total
+        return os.path.getsize(path) if os.path.exists(path) else 0
+
+    def register(self, kind: str, artifact_id: str, path: str, case_id: str = None, meta: dict = None):
+        """
+        Indexes an artifact written at `path` (file or directory) under its content hash
+        and maps it to `case_id`. Re-registering an indexed artifact, possibly for
+        another case, adds the mapping and refreshes its last access.
+        """
+        now = time.time()
+        relpath = os.path.relpath(path, self.root)
+        with self._lock:
+            exists = self._conn.execute("SELECT 1 FROM artifacts WHERE artifact_id = ?", (artifact_id,)).fetchone()
+        size = None if exists else self._size_of(path)
+        with self._lock, self._conn:
+            if size is None:
+                self._conn.execute("UPDATE artifacts SET last_access = ? WHERE artifact_id = ?", (now, artifact_id))
+            else:
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO artifacts VALUES (?, ?, ?, ?, ?, ?, ?, 0, ?)",
+                    (artifact_id, kind, relpath, case_id, size, now, now, json.dumps(meta or {}))
+                )
+                self._writes_since_evict += 1
+            if case_id is not None:
+                self._conn.execute("INSERT OR IGNORE INTO artifact_cases VALUES (?, ?)", (artifact_id, case_id))
+            due = self._writes_since_evict >= 50 and not self._evicting
+            if due:
+                self._evicting = True
+        if due:
+            # Off the writer's path (report renders, tile writes), one pass at a time
+            threading.Thread(target=self._evict_in_background, name="artifact-evict", daemon=True).start()
+
+    def _evict_in_background(self):
+        try:
+            self.evict()
+        except Exception:
+            logger.exception("[Artifacts] Background eviction failed.")
+        finally:
+            with self._lock:
+                self._evicting = False
+
+    def touch(self, artifact_id: str):
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE artifacts SET last_access = ? WHERE artifact_id = ?", (time.time(), artifact_id))
+
+    @staticmethod
+    def _row(row):
+        item = dict(row)
+        item["meta"] = json.loads(item["meta"])
+        item["case_ids"] = json.loads(item["case_ids"])
+        item["pinned"] = bool(item["pinned"])
+        item["legal_hold"] = bool(item.pop("held", 0))
+        return item
+
+    def get(self, artifact_id: str):
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT a.*, {CASES_SQL}, {HELD_SQL} AS held FROM artifacts a WHERE a.artifact_id = ?", (artifact_id,)
+            ).fetchone()
+        return self._row(row) if row else None
+
+    def list(self, kind: str = None, case_id: str = None, limit: int = 50, cursor: str = None):
+        """
+        One page of artifacts, newest first, and the cursor of the next page (None at the end).
+        Keyset pagination on (created_at, artifact_id), so pages stay cheap however deep.
+        """
+        where, params = [], []
+        if kind:
+            where.append("a.kind = ?")
+            params.append(kind)
+        if case_id:
+            where.append("EXISTS (SELECT 1 FROM artifact_cases c WHERE c.artifact_id = a.artifact_id AND c.case_id = ?)")
+            params.append(case_id)
+        if cursor:
+            created_at, artifact_id = cursor.split(":", 1)
+            where.append("(a.created_at < ? OR (a.created_at = ? AND a.artifact_id < ?))")
+            params += [float(created_at), float(created_at), artifact_id]
+        sql = (f"SELECT a.*, {CASES_SQL}, {HELD_SQL} AS held FROM artifacts a"
+               + (" WHERE " + " AND ".join(where) if where else "")
+               + " ORDER BY a.created_at DESC, a.artifact_id DESC LIMIT ?")
+        with self._lock:
+            rows = self._conn.execute(sql, (*params, limit + 1)).fetchall()
+        items = [self._row(row) for row in rows[:limit]]
+        next_cursor = f"{rows[limit - 1]['created_at']!r}:{rows[limit - 1]['artifact_id']}" if len(rows) > limit else None
+        return items, next_cursor
+
+    def pin(self, artifact_id: str, pinned: bool = True):
+        with self._lock, self._conn:
+            updated = self._conn.execute("UPDATE artifacts SET pinned = ? WHERE artifact_id = ?",
+                                         (int(pinned), artifact_id)).rowcount
+        return updated > 0
+
+    def hold(self, case_id: str, reason: str = None):
+        """Legal hold: every artifact of the case, present and future (shared ones included), is kept."""
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO holds VALUES (?, ?, ?)", (case_id, reason, time.time()))
+
+    def release(self, case_id: str):
+        with self._lock, self._conn:
+            return self._conn.execute("DELETE FROM holds WHERE case_id = ?", (case_id,)).rowcount > 0
+
+    def holds(self):
+        with self._lock:
+            return [dict(row) for row in self._conn.execute("SELECT * FROM holds ORDER BY created_at")]
+
+    def _delete(self, relpath: str):
+        path = os.path.join(self.root, relpath)
+        try:
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            elif os.path.exists(path):
+                os.remove(path)
+        except OSError as e:
+            logger.warning("[Artifacts] Could not delete %s: %s", path, e)
+            return False
+        return True
+
+    def evict(self):
+        """
+        Deletes unpinned artifacts outside legal holds that were last accessed more than
+        max_age ago, then the least recently used ones until the total fits max_bytes.
+        Victims are removed from the index in one transaction that re-checks pin, hold
+        and last access, so an artifact pinned, held or read meanwhile is kept; only
+        the files of rows actually deleted are then unlinked.
+        """
+        with self._lock:
+            self._writes_since_evict = 0
+            candidates = self._conn.execute(
+                "SELECT a.artifact_id, a.size_bytes, a.last_access FROM artifacts a "
+                f"WHERE a.pinned = 0 AND NOT {HELD_SQL} ORDER BY a.last_access"
+            ).fetchall()
+            total = self._conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM artifacts").fetchone()[0]
+
+        cutoff = time.time() - self.max_age_s
+        victims, planned = [], 0
+        for row in candidates:
+            if row["last_access"] >= cutoff and total - planned <= self.max_bytes:
+                break
+            victims.append(row)
+            planned += row["size_bytes"]
+        if not victims:
+            return {"evicted": 0, "freed_bytes": 0}
+
+        deleted = []
+        with self._lock, self._conn:
+            for row in victims:
+                gone = self._conn.execute(
+                    "DELETE FROM artifacts AS a WHERE a.artifact_id = ? AND a.pinned = 0 AND a.last_access = ? "
+                    f"AND NOT {HELD_SQL} RETURNING path, size_bytes", (row["artifact_id"], row["last_access"])
+                ).fetchone()
+                if gone is not None:
+                    self._conn.execute("DELETE FROM artifact_cases WHERE artifact_id = ?", (row["artifact_id"],))
+                    deleted.append(gone)
+        for row in deleted:
+            self._delete(row["path"])
+        freed = sum(row["size_bytes"] for row in deleted)
+        if deleted:
+            logger.info("[Artifacts] Evicted %s artifacts (%.1f MB).", len(deleted), freed / 1024 ** 2)
+        return {"evicted": len(deleted), "freed_bytes": freed}
+
+    def stats(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT kind, COUNT(*) AS count, COALESCE(SUM(size_bytes), 0) AS size_bytes FROM artifacts GROUP BY kind"
+            ).fetchall()
+            held = self._conn.execute("SELECT COUNT(*) FROM holds").fetchone()[0]
+        return {
+            "kinds": {row["kind"]: {"count": row["count"], "size_bytes": row["size_bytes"]} for row in rows},
+            "total_bytes": sum(row["size_bytes"] for row in rows),
+            "max_bytes": self.max_bytes,
+            "max_age_days": self.max_age_s / 86400.0,
+            "holds": held
+        }
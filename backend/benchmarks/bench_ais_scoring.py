@@ -0,0 +1,87 @@
+"""
+Benchmark of AIS result building + confidence scoring.
+
+Compares the previous path (iterrows -> list of dicts -> per-dict scoring with
+copies -> full sort) against the columnar scoring with argpartition top-K.
+
+    python -m benchmarks.bench_ais_scoring [candidates] [top_k]
+"""
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+from ais_correlation.correlator import AISCorrelator
+
+
+def synthetic_candidates(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "vessel_name": np.char.add("VESSEL ", rng.integers(0, 50_000, n).astype(str)),
+        "mmsi": rng.integers(200_000_000, 700_000_000, n),
+        "imo_number": np.char.add("IMO", rng.integers(9_000_000, 9_999_999, n).astype(str)),
+        "flag": "Determined via MMSI",
+        "speed_knots": rng.uniform(0, 20, n).round(1),
+        "heading": rng.uniform(0, 360, n),
+        "distance_to_origin_m": rng.uniform(0, 5000, n).round(2),
+        "timestamp": pd.Timestamp("2023-11-04T12:00:00") + pd.to_timedelta(rng.integers(-1800, 1800, n), unit="s"),
+    })
+
+
+def legacy_rank(df: pd.DataFrame):
+    """The pre-columnar implementation, kept here as the comparison baseline."""
+    results = []
+    for _, row in df.iterrows():
+        results.append({
+            "vessel_name": row.get("vessel_name", "UNKNOWN VESSEL"),
+            "mmsi": row.get("mmsi", "UNKNOWN"),
+            "imo_number": row.get("imo_number", "UNKNOWN"),
+            "flag": "Determined via MMSI",
+            "speed_knots": row.get("speed_knots", 0.0),
+            "distance_to_origin_m": round(row.get("distance_to_origin_m", 0), 2),
+            "timestamp": row["timestamp"].isoformat()
+        })
+    scored_vessels = []
+    for v in results:
+        base_score = 100
+        if v["distance_to_origin_m"] > 500:
+            base_score -= (v["distance_to_origin_m"] - 500) * 0.05
+        if v["speed_knots"] > 5.0:
+            base_score += 15
+        else:
+            base_score -= 20
+        v_scored = v.copy()
+        v_scored["probability_score_percent"] = round(max(0, min(100, base_score)), 2)
+        scored_vessels.append(v_scored)
+    return sorted(scored_vessels, key=lambda x: x["probability_score_percent"], reverse=True)
+
+
+def time_ms(fn, repeats: int):
+    samples = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return float(np.median(samples))
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    top_k = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    df = synthetic_candidates(n)
+    correlator = AISCorrelator(csv_path=os.devnull, store_dir=os.devnull)
+
+    legacy = legacy_rank(df)[:top_k]
+    columnar = correlator.score_confidence(df, top_k=top_k)
+    assert [v["probability_score_percent"] for v in legacy] == [v["probability_score_percent"] for v in columnar]
+
+    legacy_ms = time_ms(lambda: legacy_rank(df), 5)
+    columnar_ms = time_ms(lambda: correlator.score_confidence(df, top_k=top_k), 20)
+    print(f"{n} candidates, top {top_k}")
+    print(f"legacy iterrows + dict scoring : {legacy_ms:8.2f} ms")
+    print(f"columnar scoring + argpartition: {columnar_ms:8.2f} ms   ({legacy_ms / columnar_ms:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""
+Benchmark of the reverse-time particle ensemble in BacktrackingEngine.
+
+    python -m benchmarks.bench_backtracking [particles] [hours]
+"""
+import sys
+import time
+import numpy as np
+
+from lagrangian_backtracking.engine import BacktrackingEngine
+
+TARGET_S = 1.0
+
+
+def main():
+    particles = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    hours = int(sys.argv[2]) if len(sys.argv) > 2 else 24
+    engine = BacktrackingEngine({"windage_factor": 0.03, "backtrack_window": hours, "particle_count": particles})
+
+    samples = []
+    for i in range(5):
+        coords = {"lon": 103.82 + i * 0.01, "lat": 1.22}
+        t0 = time.perf_counter()
+        result = engine.run_backtrack(coords, "2023-11-04T12:00:00")
+        samples.append(time.perf_counter() - t0)
+
+    print(f"{particles} particles, {hours} h, {engine.time_step_minutes} min RK4 steps")
+    print(f"median run = {np.median(samples):.3f} s   (target < {TARGET_S} s)   origin spread = {result['origin_density']['spread_m']} m")
+    return 0 if np.median(samples) < TARGET_S else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""
+Bulk evidence packet rendering throughput: a day's detections (default 300 packets)
+rendered inline one by one, then through ReportQueue with 1, 2 and 4 render workers.
+Packets are written to a temporary directory and the result cache is off.
+
+    python -m benchmarks.bench_report_bulk [packets] [workers ...]
+"""
+import os
+import sys
+import time
+import tempfile
+
+os.environ["RESULT_CACHE"] = "0"
+
+from reporting.generator import ReportGenerator
+from reporting.render_queue import ReportQueue
+
+
+def synthetic_packets(count: int):
+    packets = []
+    for i in range(count):
+        lon, lat = 103.8 + (i % 20) * 0.01, 1.2 + (i // 20) * 0.01
+        packets.append({
+            "spill_id": f"S1A_BULK_{i:04d}",
+            "sar": {"image_id": f"S1A_BULK_{i:04d}", "mask_path": "mock_path.tif",
+                    "metrics": {"total_area_m2": 1200.0 + i, "volume_liters": 1.2 + i * 0.001}},
+            "physics": {"origin_point": {"lon": lon - 0.05, "lat": lat + 0.02},
+                        "leak_start_time": "2023-11-04T06:00:00"},
+            "attribution": {"intersection_time": "2023-11-04T06:10:00", "attributed_vessels": [
+                {"vessel_name": f"VESSEL {i}", "mmsi": 563000000 + i, "imo_number": 9000000 + i,
+                 "speed_knots": 12.5, "probability_score_percent": 87.0}]}
+        })
+    return packets
+
+
+def inline(packets: list, output_dir: str):
+    generator = ReportGenerator(output_dir)
+    t0 = time.perf_counter()
+    for i, p in enumerate(packets):
+        generator.generate_evidence_packet(p["spill_id"], p["sar"], p["physics"], p["attribution"], f"inline{i}")
+    return time.perf_counter() - t0
+
+
+def queued(packets: list, output_dir: str, workers: int):
+    queue = ReportQueue(output_dir, workers=workers)
+    queue.start()
+    # Warm the pool so worker start-up is not billed to the batch
+    queue.wait([queue.submit("warmup", *[packets[0][k] for k in ("sar", "physics", "attribution")])["report_id"]])
+    t0 = time.perf_counter()
+    entries = queue.submit_many(packets)
+    done = queue.wait([e["report_id"] for e in entries])
+    elapsed = time.perf_counter() - t0
+    queue.shutdown()
+    assert all(e["status"] == "ready" for e in done)
+    return elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    worker_counts = [int(arg) for arg in sys.argv[2:]] or [1, 2, 4]
+    packets = synthetic_packets(count)
+
+    # Collected first and printed at the end: every render logs a line
+    lines = []
+    with tempfile.TemporaryDirectory() as output_dir:
+        os.chdir(output_dir)  # figure cache goes under ./Forensic_Reports
+        base = inline(packets, output_dir)
+        lines.append(f"inline          : {count / base:8.1f} packets/s ({base:.2f} s for {count})")
+        for workers in worker_counts:
+            elapsed = queued(packets, output_dir, workers)
+            lines.append(f"queue {workers:2d} workers: {count / elapsed:8.1f} packets/s "
+                         f"({elapsed:.2f} s, {base / elapsed:.1f}x inline)")
+    print(f"\n{os.cpu_count()} CPUs")
+    print("\n".join(lines))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""
+Evidence packet render latency against the per-packet budget (REPORT_BUDGET_MS,
+default 300 ms). The layer outputs come from one real run of SAR and backtracking (mock
+mask, synthetic fields) plus synthetic AIS attribution, computed once beforehand.
+
+- cold: figure and thumbnail caches emptied before every packet (first render)
+- warm: figures reused from the cache (re-render of an unchanged incident)
+
+    python -m benchmarks.bench_report_render [packets]
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+import numpy as np
+
+
+def layer_outputs():
+    from sar_processing.processor import SARProcessor
+    from lagrangian_backtracking.engine import BacktrackingEngine
+
+    gps = {"lon": 103.82, "lat": 1.22}
+    sar = SARProcessor({"mask_base_dir": "missing", "pixel_resolution_m": 0.1, "film_thickness_um": 1.0})
+    sar_result = sar.process_spill("BENCH_S1A_0001", gps)
+    physics = BacktrackingEngine().run_backtrack(gps, "2023-11-04T12:00:00", slick_polygon=sar_result["polygon"])
+    origin = physics["origin_point"]
+    rng = np.random.default_rng(0)
+    vessels = []
+    for rank in range(5):
+        distance = float(rng.uniform(100, 3000))
+        bearing = rng.uniform(0, 2 * np.pi)
+        vessels.append({
+            "vessel_name": f"BENCH VESSEL {rank + 1}", "mmsi": str(563000000 + rank), "imo_number": f"IMO{9000000 + rank}",
+            "speed_knots": round(float(rng.uniform(0.5, 16)), 1), "heading": f"{int(rng.integers(0, 360))}°",
+            "distance_to_origin_m": round(distance, 2),
+            "cpa_lat": origin["lat"] + distance * np.cos(bearing) / 111111.0,
+            "cpa_lon": origin["lon"] + distance * np.sin(bearing) / 111111.0,
+            "probability_score_percent": round(100 - rank * 12.5, 2)
+        })
+    attribution = {"attributed_vessels": vessels, "intersection_time": physics["leak_start_time"]}
+    return sar_result, physics, attribution
+
+
+def percentiles(samples: list):
+    p50, p95, worst = np.percentile(np.asarray(samples) * 1000.0, [50, 95, 100])
+    return f"p50 {p50:7.1f} ms   p95 {p95:7.1f} ms   max {worst:7.1f} ms"
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    workdir = tempfile.mkdtemp(prefix="aeonblue_bench_report_")
+    os.chdir(workdir)  # tiles and reports go under ./Forensic_Reports
+    try:
+        from reporting.generator import ReportGenerator
+
+        sar_result, physics, attribution = layer_outputs()
+        generator = ReportGenerator(os.path.join(workdir, "Forensic_Reports", "reports"))
+        generator.load_fonts()
+        thumbnails = generator.figures().cache_dir
+
+        cold, warm = [], []
+        for i in range(count):
+            shutil.rmtree(thumbnails, ignore_errors=True)
+            generator._figures = None
+            t0 = time.perf_counter()
+            packet = generator.generate_evidence_packet("BENCH", sar_result, physics, attribution, f"cold{i}")
+            cold.append(time.perf_counter() - t0)
+        for i in range(count):
+            t0 = time.perf_counter()
+            generator.generate_evidence_packet("BENCH", sar_result, physics, attribution, f"warm{i}")
+            warm.append(time.perf_counter() - t0)
+
+        size_kb = os.path.getsize(os.path.join(generator.output_dir, packet["report_path"])) / 1024
+        print(f"\nbudget {generator.budget_ms:.0f} ms per packet, {size_kb:.0f} KB PDF (3 pages, 2 figures)")
+        print(f"cold (figures drawn) : {percentiles(cold)}")
+        print(f"warm (figures cached): {percentiles(warm)}")
+        within = max(np.percentile(cold, 95), np.percentile(warm, 95)) * 1000.0 <= generator.budget_ms
+        print("within budget" if within else "OVER BUDGET")
+        return 0 if within else 1
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
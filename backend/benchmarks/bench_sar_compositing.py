@@ -0,0 +1,71 @@
+"""
+Memory/latency benchmark of the SAR overlay compositing in process_spill:
+the previous full-raster float64 path against OverlayCompositor, on square masks
+with a slick in the middle (default 4096 and 16384 px).
+
+    python -m benchmarks.bench_sar_compositing [size ...]
+"""
+import sys
+import time
+import tracemalloc
+import numpy as np
+import cv2
+
+from sar_processing.compositor import OverlayCompositor
+
+# The float64 path needs ~8 full-image temporaries; skip it beyond this many pixels
+LEGACY_MAX_PIXELS = 8192 * 8192
+
+
+def legacy_composite(mask: np.ndarray):
+    synthetic_sar = np.random.normal(loc=120, scale=25, size=mask.shape)
+    oil_noise = np.random.normal(loc=35, scale=8, size=mask.shape)
+    raw_img = np.where(mask > 0, oil_noise, synthetic_sar)
+    raw_img = np.clip(raw_img, 0, 255).astype(np.uint8)
+    raw_img = cv2.GaussianBlur(raw_img, (3, 3), 0)
+    inverted_mask = cv2.bitwise_not(mask)
+    dist_transform = cv2.distanceTransform(inverted_mask, cv2.DIST_L2, 3)
+    alpha = np.clip(1.0 - (dist_transform / 400.0), 0, 1) * 255.0
+    bgra_img = cv2.cvtColor(raw_img, cv2.COLOR_GRAY2BGRA)
+    bgra_img[:, :, 3] = alpha.astype(np.uint8)
+    return bgra_img
+
+
+def slick_mask(size: int):
+    mask = np.zeros((size, size), dtype=np.uint8)
+    radius = max(8, size // 16)
+    cv2.ellipse(mask, (size // 2, size // 2), (radius * 2, radius), 30, 0, 360, 255, -1)
+    return mask
+
+
+def measure(fn, mask, runs: int = 3):
+    fn(mask)  # warm-up (and, for the compositor, buffer allocation)
+    tracemalloc.start()
+    samples = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        fn(mask)
+        samples.append(time.perf_counter() - t0)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return np.median(samples), peak / 1e6
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [4096, 16384]
+    for size in sizes:
+        mask = slick_mask(size)
+        compositor = OverlayCompositor()
+        lean_s, lean_mb = measure(compositor.composite, mask)
+        line = f"{size}x{size}: compositor {lean_s * 1000:8.1f} ms, {lean_mb:8.1f} MB allocated per call"
+        if size * size <= LEGACY_MAX_PIXELS:
+            legacy_s, legacy_mb = measure(legacy_composite, mask)
+            line += f"   |   legacy {legacy_s * 1000:8.1f} ms, {legacy_mb:8.1f} MB   ({legacy_s / lean_s:.1f}x faster)"
+        else:
+            line += f"   |   legacy skipped (would need ~{size * size * 8 * 4 / 1e9:.0f} GB of float64 temporaries)"
+        print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+"""
+Throughput of SAR segmentation inference in tiles/s.
+
+1. Direct: the model runner on batches of 1, 2, 4, 8 and 16 tiles.
+2. Micro-batched: concurrent clients submitting single tiles through MicroBatcher
+   (max batch 8, 10 ms deadline), with the batch sizes it actually formed.
+
+Uses the ONNX model at SAR_MODEL_PATH when set, otherwise the threshold stand-in.
+
+    python -m benchmarks.bench_sar_inference [seconds_per_case] [clients]
+"""
+import sys
+import time
+import threading
+import numpy as np
+
+from sar_processing.inference import MicroBatcher, create_runner
+
+BATCH_SIZES = [1, 2, 4, 8, 16]
+
+
+def sigma0_tiles(count: int, tile_px: int):
+    rng = np.random.default_rng(0)
+    tiles = rng.normal(-8.0, 2.0, (count, 1, tile_px, tile_px)).astype(np.float32)
+    tiles[:, :, tile_px // 4:tile_px // 2, tile_px // 4:tile_px // 2] = -26.0
+    return tiles
+
+
+def direct(runner, batch_size: int, seconds: float):
+    batch = sigma0_tiles(batch_size, runner.tile_px)
+    runner.predict(batch)  # warm-up
+    tiles = 0
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < seconds:
+        runner.predict(batch)
+        tiles += batch_size
+    return tiles / (time.perf_counter() - t0)
+
+
+def micro_batched(runner, clients: int, seconds: float):
+    batcher = MicroBatcher(runner, max_batch=8, max_delay_ms=10.0)
+    tile = sigma0_tiles(1, runner.tile_px)[0, 0]
+    latencies = []
+    stop = time.perf_counter() + seconds
+
+    def client():
+        while time.perf_counter() < stop:
+            t0 = time.perf_counter()
+            batcher.submit(tile).result()
+            latencies.append(time.perf_counter() - t0)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    t0 = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - t0
+    batcher.close()
+    return batcher.tiles / elapsed, batcher.tiles / max(1, batcher.batches), np.percentile(latencies, [50, 99]) * 1000
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 3.0
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    runner = create_runner()
+    print(f"Model: {runner.describe()}")
+
+    for batch_size in BATCH_SIZES:
+        print(f"direct       batch {batch_size:3d}: {direct(runner, batch_size, seconds):8.1f} tiles/s")
+
+    for n in sorted({1, clients}):
+        rate, mean_batch, (p50, p99) = micro_batched(runner, n, seconds)
+        print(f"micro-batch  {n:3d} clients: {rate:8.1f} tiles/s, mean batch {mean_batch:4.1f}, "
+              f"latency p50 {p50:6.1f} ms, p99 {p99:6.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,496 @@
+"""
+Reproducible benchmark suite for the four engines, plus an end-to-end /analyze_spill
+load test through a local uvicorn instance.
+
+Fixtures are generated deterministically (benchmarks/synthetic.py) and kept under
+BENCH_DATA_DIR (default: <tmp>/aeonblue_bench), so only the first run at a scale pays
+for them: an AIS archive of 1M (small) / 10M (medium) / 100M (large) rows, oil masks
+from 256^2 up to 16k^2 and ERA5/CMEMS-like wind and current grids.
+Every case runs in a fresh process, so its peak RSS is its own. Results record
+p50/p99 latency, throughput and peak RSS, and can be saved as the baseline and
+compared against it (regressions beyond the tolerance exit 1). With AIS_DATABASE_URL
+set, the AIS cases also run on the PostGIS backend, loaded once with the same archive.
+
+    python -m benchmarks.suite [--scale small|medium|large] [--only sar,backtrack,ais,report,e2e]
+                               [--save-baseline] [--compare] [--tolerance 0.15] [--output results.json]
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import signal
+import asyncio
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+import multiprocessing
+import numpy as np
+
+SCALES = {
+    "small": {"ais_rows": 1_000_000, "mask_sizes": [256, 2048], "env": (4.0, 0.25, 3),
+              "particles": 10_000, "batch_origins": 64, "iterations": 10, "e2e_requests": 40, "e2e_concurrency": 4},
+    "medium": {"ais_rows": 10_000_000, "mask_sizes": [256, 2048, 8192], "env": (10.0, 1 / 12, 7),
+               "particles": 50_000, "batch_origins": 256, "iterations": 10, "e2e_requests": 200, "e2e_concurrency": 8},
+    "large": {"ais_rows": 100_000_000, "mask_sizes": [256, 2048, 8192, 16384], "env": (20.0, 1 / 12, 30),
+              "particles": 100_000, "batch_origins": 1024, "iterations": 5, "e2e_requests": 1000, "e2e_concurrency": 16},
+}
+LAYERS = ("sar", "backtrack", "ais", "report", "e2e")
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Fixture period: the synthetic fields cover 2023-11-01 onwards; the AIS archive all of 2023
+HUB = (103.82, 1.22)
+SPILL_TIME = "2023-11-03T12:00:00"
+
+
+def data_dir():
+    return os.getenv("BENCH_DATA_DIR", os.path.join(tempfile.gettempdir(), "aeonblue_bench"))
+
+
+def prepare_fixtures(scale: dict, layers: set):
+    """Builds (or reuses) the on-disk fixtures the selected layers need."""
+    from benchmarks.synthetic import synthetic_ais_tables, write_mask_archive, write_environment
+
+    root = data_dir()
+    fixtures = {}
+    if layers & {"sar", "report", "e2e"}:
+        fixtures["masks"] = {}
+        for size in scale["mask_sizes"]:
+            mask_dir = os.path.join(root, "masks", str(size))
+            write_mask_archive(mask_dir, f"BENCH_MASK_{size}", size)
+            fixtures["masks"][size] = mask_dir
+    if layers & {"backtrack", "report", "e2e"}:
+        span_deg, resolution_deg, days = scale["env"]
+        tag = f"{span_deg:g}deg_{resolution_deg:.4f}_{days}d"
+        fixtures["wind"] = write_environment(os.path.join(root, "env", f"wind_{tag}.nc"), "wind", HUB,
+                                             span_deg, resolution_deg, days)
+        fixtures["current"] = write_environment(os.path.join(root, "env", f"current_{tag}.nc"), "current", HUB,
+                                                span_deg, resolution_deg, days, seed=1)
+    if layers & {"ais", "report", "e2e"}:
+        from ais_correlation.store import AISStore
+
+        rows = scale["ais_rows"]
+        store_dir = os.path.join(root, f"ais_{rows}")
+        store = AISStore(store_dir)
+        manifest = store.read_manifest()
+        if manifest is None or manifest.get("rows") != rows or not store.is_current():
+            print(f"Building synthetic AIS archive ({rows:,} rows), one-time...")
+            t0 = time.perf_counter()
+            store.ingest_tables(synthetic_ais_tables(rows), {"source": "synthetic"})
+            print(f"  done in {time.perf_counter() - t0:.1f} s")
+        fixtures["ais_store"] = store_dir
+    if "ais" in layers and postgis_enabled():
+        from ais_correlation.postgis import PostGISStore
+
+        rows = scale["ais_rows"]
+        store = PostGISStore()
+        store.ensure_schema()
+        manifest = store.read_manifest()
+        if manifest is None or manifest.get("rows") != rows or not store.is_current():
+            print(f"Loading synthetic AIS archive ({rows:,} rows) into PostGIS, one-time...")
+            t0 = time.perf_counter()
+            store.ingest_tables(synthetic_ais_tables(rows), {"source": "synthetic"})
+            print(f"  done in {time.perf_counter() - t0:.1f} s")
+        store.close()
+    return fixtures
+
+
+def postgis_enabled():
+    """The AIS cases also run against PostGIS when AIS_DATABASE_URL points at one."""
+    return bool(os.getenv("AIS_DATABASE_URL"))
+
+
+def measure(run, iterations: int, reset=None, warmup: int = 1):
+    samples = []
+    for i in range(warmup + iterations):
+        if reset is not None:
+            reset()
+        t0 = time.perf_counter()
+        run(i)
+        if i >= warmup:
+            samples.append(time.perf_counter() - t0)
+    return samples
+
+
+# --- Cases. Each runs in its own process (cwd: an empty work directory) and returns
+# (samples in seconds, items processed per iteration, item unit).
+
+def sar_settings(mask_dir: str):
+    return {"mask_base_dir": mask_dir, "catalog_path": os.path.abspath("catalog.sqlite"),
+            "pixel_resolution_m": 0.1, "film_thickness_um": 1.0}
+
+
+def case_sar(fixtures: dict, scale: dict, size: int):
+    """Layer A on a catalogued mask: mask load, compositing, contours and tiling (tiles cleared each run)."""
+    from sar_processing.processor import SARProcessor
+
+    sar = SARProcessor(sar_settings(fixtures["masks"][size]))
+    samples = measure(lambda i: sar.process_spill(f"BENCH_MASK_{size}", {"lon": HUB[0], "lat": HUB[1]}),
+                      scale["iterations"], reset=lambda: shutil.rmtree(os.path.join("Forensic_Reports", "tiles"),
+                                                                       ignore_errors=True))
+    return samples, size * size / 1e6, "Mpx"
+
+
+def backtrack_engine(fixtures: dict, particles: int):
+    from lagrangian_backtracking.engine import BacktrackingEngine
+
+    return BacktrackingEngine({"windage_factor": 0.03, "backtrack_window": 24, "particle_count": particles,
+                               "wind_path": fixtures["wind"], "current_path": fixtures["current"]})
+
+
+def case_backtrack(fixtures: dict, scale: dict):
+    """Layer B: reverse RK4 ensemble through the gridded wind/current files."""
+    engine = backtrack_engine(fixtures, scale["particles"])
+    samples = measure(lambda i: engine.run_backtrack({"lon": HUB[0] + i * 0.01, "lat": HUB[1]}, SPILL_TIME),
+                      scale["iterations"])
+    return samples, scale["particles"], "particles"
+
+
+def correlator(fixtures: dict, backend: str = "arrow"):
+    from ais_correlation.correlator import AISCorrelator
+
+    # No source CSV: the fixture store is current as built, and preload() opens it
+    ais = AISCorrelator(csv_path=os.path.join(fixtures["ais_store"], "no_source.csv"),
+                        store_dir=fixtures["ais_store"], backend=backend)
+    ais.preload()
+    return ais
+
+
+def random_origins(count: int, seed: int = 1):
+    import pandas as pd
+    from benchmarks.synthetic import TRAFFIC_HUBS
+
+    rng = np.random.default_rng(seed)
+    year_start = pd.Timestamp("2023-01-01")
+    origins = []
+    for i in range(count):
+        hub = TRAFFIC_HUBS[i % len(TRAFFIC_HUBS)]
+        leak_start = year_start + pd.Timedelta(seconds=int(rng.integers(3600, 364 * 86400)))
+        origins.append({"origin_point": {"lat": float(hub[1] + rng.normal(0, 0.2)), "lon": float(hub[0] + rng.normal(0, 0.3))},
+                        "leak_start_time": leak_start.isoformat()})
+    return origins
+
+
+def case_ais(fixtures: dict, scale: dict, backend: str = "arrow"):
+    """Layer C, one origin: indexed read, track reconstruction, CPA, haversine, scoring."""
+    ais = correlator(fixtures, backend)
+    origins = random_origins(scale["iterations"] * 5 + 5)
+    samples = measure(lambda i: ais.attribute_polluter(origins[i]["origin_point"], origins[i]["leak_start_time"]),
+                      scale["iterations"] * 5, warmup=5)
+    return samples, 1, "origins"
+
+
+def case_ais_batch(fixtures: dict, scale: dict, backend: str = "arrow"):
+    """Layer C, batched: one merged read and join for many origins of a scene."""
+    ais = correlator(fixtures, backend)
+    count = scale["batch_origins"]
+    batches = [random_origins(count, seed=seed) for seed in range(scale["iterations"] + 1)]
+    samples = measure(lambda i: ais.attribute_polluters(batches[i]), scale["iterations"])
+    return samples, count, "origins"
+
+
+def report_inputs(fixtures: dict, scale: dict):
+    from sar_processing.processor import SARProcessor
+
+    size = scale["mask_sizes"][0]
+    gps = {"lon": HUB[0], "lat": HUB[1]}
+    sar = SARProcessor(sar_settings(fixtures["masks"][size])).process_spill(f"BENCH_MASK_{size}", gps)
+    physics = backtrack_engine(fixtures, scale["particles"]).run_backtrack(gps, SPILL_TIME,
+                                                                           slick_polygon=sar["polygon"])
+    attribution = correlator(fixtures).attribute_polluter(physics["origin_point"], physics["leak_start_time"])
+    return sar, physics, attribution
+
+
+def case_report(fixtures: dict, scale: dict, cached_figures: bool):
+    """Layer D: one evidence packet, with figures drawn (cold) or taken from the figure cache (warm)."""
+    from reporting.generator import ReportGenerator
+
+    sar, physics, attribution = report_inputs(fixtures, scale)
+    generator = ReportGenerator()
+    generator.load_fonts()
+
+    def reset():
+        if not cached_figures:
+            shutil.rmtree(generator.figures().cache_dir, ignore_errors=True)
+            generator._figures = None
+
+    samples = measure(lambda i: generator.generate_evidence_packet("BENCH", sar, physics, attribution),
+                      scale["iterations"], reset=reset)
+    return samples, 1, "packets"
+
+
+def cases(scale: dict, layers: set):
+    selected = []
+    if "sar" in layers:
+        selected += [(f"sar.process_spill[{size}px]", case_sar, (size,)) for size in scale["mask_sizes"]]
+    if "backtrack" in layers:
+        selected.append((f"backtrack.run_backtrack[{scale['particles']}p]", case_backtrack, ()))
+    if "ais" in layers:
+        selected.append((f"ais.attribute_polluter[{scale['ais_rows']:.0e}rows]", case_ais, ()))
+        selected.append((f"ais.attribute_polluters[{scale['batch_origins']}x]", case_ais_batch, ()))
+        if postgis_enabled():
+            selected.append((f"ais.attribute_polluter[postgis,{scale['ais_rows']:.0e}rows]", case_ais, ("postgis",)))
+            selected.append((f"ais.attribute_polluters[postgis,{scale['batch_origins']}x]", case_ais_batch, ("postgis",)))
+    if "report" in layers:
+        selected.append(("report.packet[cold]", case_report, (False,)))
+        selected.append(("report.packet[warm]", case_report, (True,)))
+    return selected
+
+
+def _case_process(fn, fixtures: dict, scale: dict, args: tuple, conn):
+    sys.path.insert(0, BACKEND_DIR)
+    workdir = tempfile.mkdtemp(prefix="aeonblue_bench_case_")
+    os.chdir(workdir)
+    os.environ["RESULT_CACHE"] = "0"
+    sys.stdout = open(os.devnull, "w")  # the engines log every step
+    try:
+        samples, items, unit = fn(fixtures, scale, *args)
+        # VmHWM restarts at exec; ru_maxrss would carry over the parent's peak on Linux
+        peak = tree_peak_rss_mb(os.getpid())
+        if peak is None:
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024.0 ** 2 if sys.platform == "darwin" else 1024.0)
+        conn.send({"samples": samples, "items": items, "unit": unit, "peak_rss_mb": peak})
+    except Exception as e:
+        conn.send({"error": f"{type(e).__name__}: {e}"})
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def summarize(samples: list, items: float, unit: str, peak_rss_mb: float):
+    ms = np.asarray(samples) * 1000.0
+    p50, p99 = np.percentile(ms, [50, 99])
+    total_s = float(np.sum(samples))
+    return {"iterations": len(samples), "p50_ms": round(float(p50), 3), "p99_ms": round(float(p99), 3),
+            "mean_ms": round(float(ms.mean()), 3), "ops_per_s": round(len(samples) / total_s, 3),
+            "throughput": round(len(samples) * items / total_s, 3), "unit": f"{unit}/s",
+            "peak_rss_mb": round(peak_rss_mb, 1) if peak_rss_mb is not None else None}
+
+
+def run_case(name: str, fn, fixtures: dict, scale: dict, args: tuple):
+    # spawn: a clean interpreter per case, so peak RSS is not inherited from earlier cases
+    context = multiprocessing.get_context("spawn")
+    parent, child = context.Pipe(duplex=False)
+    process = context.Process(target=_case_process, args=(fn, fixtures, scale, args, child))
+    process.start()
+    result = parent.recv()
+    process.join()
+    if "error" in result:
+        print(f"  {name}: FAILED ({result['error']})")
+        return None
+    return summarize(result["samples"], result["items"], result["unit"], result["peak_rss_mb"])
+
+
+# --- End to end
+
+def tree_peak_rss_mb(pid: int):
+    """Peak RSS (VmHWM) of a process and all its descendants, from /proc (Linux only)."""
+    total, pending = 0, [pid]
+    try:
+        while pending:
+            current = pending.pop()
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        total += int(line.split()[1])
+            with open(f"/proc/{current}/task/{current}/children") as f:
+                pending += [int(child) for child in f.read().split()]
+    except OSError:
+        return None
+    return total / 1024.0
+
+
+async def _load(base_url: str, requests: int, concurrency: int):
+    import httpx
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+
+    async def one(client, i):
+        nonlocal failures
+        body = {"image_id": f"BENCH_E2E_{i:05d}", "timestamp": SPILL_TIME,
+                "gps_coordinates": {"lon": HUB[0] + (i % 40) * 0.005, "lat": HUB[1] + (i // 40) * 0.005}}
+        async with semaphore:
+            t0 = time.perf_counter()
+            response = await client.post(f"{base_url}/analyze_spill", json=body)
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - t0)
+            else:
+                failures += 1
+
+    async with httpx.AsyncClient(timeout=300.0) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*[one(client, i) for i in range(requests)])
+        return latencies, failures, time.perf_counter() - started
+
+
+def run_e2e(fixtures: dict, scale: dict, port: int = 8799):
+    """
+    Starts uvicorn on the API (one process, default pool sizes) in an empty work
+    directory with the result cache off, then drives concurrent /analyze_spill calls.
+    """
+    import httpx
+
+    workdir = tempfile.mkdtemp(prefix="aeonblue_bench_e2e_")
+    env = dict(os.environ, PYTHONPATH=BACKEND_DIR, RESULT_CACHE="0", AIS_BACKEND="arrow", AIS_STORE_DIR=fixtures["ais_store"],
+               ERA5_WIND_PATH=fixtures["wind"], CMEMS_CURRENT_PATH=fixtures["current"],
+               SCENE_DROP_DIR=os.path.join(workdir, "incoming"))
+    # Own session, so the pool workers it forks (which inherit the listening socket) go down with it
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+                              cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                              start_new_session=True)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        # Boot returns before the engines are built; measure the warm service
+        deadline = time.time() + 120
+        while True:
+            try:
+                if httpx.get(f"{base_url}/ready", timeout=2).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.time() > deadline or server.poll() is not None:
+                print("  e2e: server did not come up")
+                return None
+            time.sleep(0.5)
+
+        latencies, failures, wall = asyncio.run(_load(base_url, scale["e2e_requests"], scale["e2e_concurrency"]))
+        peak = tree_peak_rss_mb(server.pid)
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            pass
+        try:
+            os.killpg(server.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        server.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+    if not latencies:
+        print("  e2e: every request failed")
+        return None
+    result = summarize(latencies, 1, "requests", peak)
+    # Under concurrency, throughput is completed requests over wall time, not over summed latency
+    result.update(throughput=round(len(latencies) / wall, 3), ops_per_s=round(len(latencies) / wall, 3),
+                  failures=failures, concurrency=scale["e2e_concurrency"])
+    return result
+
+
+# --- Baseline
+
+def compare(results: dict, baseline: dict, tolerance: float):
+    """Prints the change of every case against the baseline; returns the regressed case names."""
+    if baseline["meta"].get("scale") != results["meta"]["scale"]:
+        print(f"\nbaseline is scale {baseline['meta'].get('scale')!r}, this run {results['meta']['scale']!r}: not compared")
+        return []
+    machine = [key for key in ("processor", "cpus", "memory_gb", "python")
+               if baseline["meta"].get(key) != results["meta"].get(key)]
+    if machine:
+        print(f"\nnote: the baseline was recorded on other hardware or software ({', '.join(machine)} differ)")
+    regressions = []
+    print(f"\n{'case':44s} {'p50 vs baseline':>18s} {'peak RSS vs baseline':>22s}")
+    for name, current in results["cases"].items():
+        previous = baseline["cases"].get(name)
+        if previous is None:
+            print(f"{name:44s} {'(new)':>18s}")
+            continue
+        changes = []
+        for metric in ("p50_ms", "peak_rss_mb"):
+            if not previous.get(metric) or current.get(metric) is None:
+                changes.append(None)
+                continue
+            changes.append(current[metric] / previous[metric] - 1.0)
+        cells = [f"{change:+.1%}" if change is not None else "n/a" for change in changes]
+        regressed = any(change is not None and change > tolerance for change in changes)
+        print(f"{name:44s} {cells[0]:>18s} {cells[1]:>22s}" + ("   REGRESSION" if regressed else ""))
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def machine_info():
+    """Where the numbers come from: results are only comparable on like hardware."""
+    info = {"python": platform.python_version(), "numpy": np.__version__, "platform": platform.platform(),
+            "machine": platform.machine(), "processor": platform.processor() or None, "cpus": os.cpu_count(),
+            "memory_gb": None}
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    info["processor"] = line.split(":", 1)[1].strip()
+                    break
+        with open("/proc/meminfo") as f:
+            info["memory_gb"] = round(int(f.readline().split()[1]) / 1024.0 ** 2, 1)
+    except OSError:
+        pass
+    return info
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AeonBlue benchmark suite")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--only", default=",".join(LAYERS), help="comma-separated layers: " + ",".join(LAYERS))
+    parser.add_argument("--output", help="write results as JSON here")
+    parser.add_argument("--save-baseline", action="store_true", help=f"store results as the baseline ({BASELINE_PATH})")
+    parser.add_argument("--compare", action="store_true", help="compare against the stored baseline")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed p50 / peak RSS growth (0.15 = 15%%)")
+    options = parser.parse_args()
+
+    layers = set(options.only.split(",")) & set(LAYERS)
+    scale = SCALES[options.scale]
+    fixtures = prepare_fixtures(scale, layers)
+
+    results = {"meta": dict(machine_info(), scale=options.scale, commit=git_commit(),
+                            created_at=time.strftime("%Y-%m-%dT%H:%M:%S")),
+               "cases": {}}
+    for name, fn, args in cases(scale, layers):
+        print(f"running {name}...")
+        result = run_case(name, fn, fixtures, scale, args)
+        if result is not None:
+            results["cases"][name] = result
+    if "e2e" in layers:
+        name = f"e2e.analyze_spill[{scale['e2e_concurrency']}c]"
+        print(f"running {name}...")
+        result = run_e2e(fixtures, scale)
+        if result is not None:
+            results["cases"][name] = result
+
+    print(f"\n{'case':44s} {'p50 ms':>10s} {'p99 ms':>10s} {'throughput':>22s} {'peak RSS':>10s}")
+    for name, r in results["cases"].items():
+        rss = f"{r['peak_rss_mb']:.0f} MB" if r["peak_rss_mb"] is not None else "n/a"
+        print(f"{name:44s} {r['p50_ms']:10.2f} {r['p99_ms']:10.2f} {r['throughput']:>12.1f} {r['unit']:<9s} {rss:>10s}")
+
+    if options.output:
+        with open(options.output, "w") as f:
+            json.dump(results, f, indent=2)
+    status = 0
+    if options.compare:
+        if os.path.exists(options.baseline):
+            with open(options.baseline) as f:
+                regressions = compare(results, json.load(f), options.tolerance)
+            status = 1 if regressions else 0
+        else:
+            print(f"\nno baseline at {options.baseline}; run with --save-baseline first")
+    if options.save_baseline:
+        with open(options.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nbaseline saved to {options.baseline}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
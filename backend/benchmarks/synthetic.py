@@ -0,0 +1,125 @@
+import numpy as np
+import pyarrow as pa
+
+from ais_correlation.store import SCHEMA, NS_PER_HOUR, cell_index
+
+# Busy anchor points the synthetic traffic is concentrated around (lon, lat):
+# Singapore Strait, Gulf of Mexico, English Channel, Strait of Hormuz
+TRAFFIC_HUBS = np.array([
+    [103.82, 1.22],
+    [-89.65, 28.53],
+    [1.40, 50.90],
+    [56.40, 26.50],
+])
+
+
+def synthetic_ais_tables(total_rows: int, days: int = 365, start: str = "2023-01-01",
+                         seed: int = 0, rows_per_table: int = 1_000_000):
+    """
+    Deterministic generator of a synthetic AIS archive, yielded as Arrow tables in
+    the AIS store SCHEMA (ready for AISStore.ingest_tables).
+    Traffic is spread uniformly in time and clustered around TRAFFIC_HUBS in space.
+    """
+    rng = np.random.default_rng(seed)
+    start_ns = np.datetime64(start, "ns").astype(np.int64)
+    span_ns = days * 24 * NS_PER_HOUR
+    produced = 0
+    while produced < total_rows:
+        n = min(rows_per_table, total_rows - produced)
+        hub = TRAFFIC_HUBS[rng.integers(0, len(TRAFFIC_HUBS), n)]
+        lon = (hub[:, 0] + rng.normal(0, 0.5, n)).astype(np.float32)
+        lat = (hub[:, 1] + rng.normal(0, 0.3, n)).astype(np.float32)
+        mmsi = rng.integers(200_000_000, 200_050_000, n)
+        yield pa.Table.from_arrays([
+            pa.array(start_ns + rng.integers(0, span_ns, n)),
+            pa.array(cell_index(lat, lon)),
+            pa.array(mmsi),
+            pa.array(lat),
+            pa.array(lon),
+            pa.array(rng.uniform(0, 20, n).astype(np.float32)),
+            pa.array(np.char.add("VESSEL ", (mmsi % 50_000).astype(str))),
+            pa.array(np.char.add("IMO", (9_000_000 + mmsi % 50_000).astype(str))),
+            pa.nulls(n, pa.string()),
+            pa.array(np.full(n, 70, dtype=np.float32)),
+        ], schema=SCHEMA)
+        produced += n
+
+
+def synthetic_mask(size: int, slicks: int = 6, seed: int = 0):
+    """
+    Deterministic size x size oil mask in the Zenodo convention (uint8, 1 = oil):
+    `slicks` irregular blobs of a few percent of the frame each, drawn as polygons
+    with jittered radii so contours look like real slick outlines, not ellipses.
+    """
+    import cv2
+
+    rng = np.random.default_rng(seed)
+    mask = np.zeros((size, size), dtype=np.uint8)
+    angles = np.linspace(0, 2 * np.pi, 48, endpoint=False)
+    for _ in range(slicks):
+        cx, cy = rng.uniform(0.15, 0.85, 2) * size
+        radius = rng.uniform(0.03, 0.09) * size
+        stretch = rng.uniform(1.0, 3.0)
+        tilt = rng.uniform(0, np.pi)
+        r = radius * rng.uniform(0.6, 1.4, len(angles))
+        x, y = r * np.cos(angles) * stretch, r * np.sin(angles)
+        points = np.stack([cx + x * np.cos(tilt) - y * np.sin(tilt),
+                           cy + x * np.sin(tilt) + y * np.cos(tilt)], axis=1)
+        cv2.fillPoly(mask, [np.round(points).astype(np.int32)], 1)
+    return mask
+
+
+def write_mask_archive(mask_dir: str, image_id: str, size: int, seed: int = 0):
+    """Writes synthetic_mask(size) as <mask_dir>/<image_id>.tif, as the mask catalog expects."""
+    import os
+    import cv2
+
+    os.makedirs(mask_dir, exist_ok=True)
+    path = os.path.join(mask_dir, f"{image_id}.tif")
+    if not os.path.exists(path):
+        cv2.imwrite(path, synthetic_mask(size, seed=seed))
+    return path
+
+
+def write_environment(path: str, kind: str, center: tuple, span_deg: float = 4.0, resolution_deg: float = 0.25,
+                      days: int = 3, start: str = "2023-11-01", seed: int = 0):
+    """
+    Deterministic gridded field file in the layout FieldReader reads: ERA5-like 10 m
+    wind (kind="wind": u10/v10 on time x latitude x longitude, latitudes descending) or
+    CMEMS-like surface currents (kind="current": uo/vo with a depth axis), hourly,
+    covering span_deg around center = (lon, lat). Written once as NetCDF.
+    """
+    import os
+    import pandas as pd
+    import xarray as xr
+
+    if os.path.exists(path):
+        return path
+    rng = np.random.default_rng(seed)
+    lon0, lat0 = center
+    half = span_deg / 2.0
+    lats = np.arange(lat0 + half, lat0 - half - 1e-9, -resolution_deg)
+    lons = np.arange(lon0 - half, lon0 + half + 1e-9, resolution_deg)
+    times = pd.date_range(start, periods=days * 24, freq="h")
+
+    mean, eddy = (6.0, 2.0) if kind == "wind" else (0.15, 0.1)
+    direction, phase = rng.uniform(0, 2 * np.pi, 2)
+    hours = np.arange(len(times), dtype=np.float32)[:, None, None] / 24.0
+    yy = (lats - lat0).astype(np.float32)[None, :, None]
+    xx = (lons - lon0).astype(np.float32)[None, None, :]
+    swirl = eddy * np.exp(-(xx ** 2 + yy ** 2) / max(1.0, half) ** 2)
+    u = (mean * np.cos(direction) - swirl * np.sin(phase + hours) * yy).astype(np.float32)
+    v = (mean * np.sin(direction) + swirl * np.cos(phase + hours) * xx).astype(np.float32)
+
+    coords = {"time": times, "latitude": lats, "longitude": lons}
+    if kind == "wind":
+        ds = xr.Dataset({"u10": (("time", "latitude", "longitude"), u),
+                         "v10": (("time", "latitude", "longitude"), v)}, coords=coords)
+    else:
+        ds = xr.Dataset({"uo": (("time", "depth", "latitude", "longitude"), u[:, None]),
+                         "vo": (("time", "depth", "latitude", "longitude"), v[:, None])},
+                        coords=dict(coords, depth=[0.494]))
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    ds.to_netcdf(path + ".part", format="NETCDF4")
+    os.replace(path + ".part", path)
+    return path
@@ -0,0 +1,152 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger("aeonblue.cache")
+
+
+class ResultCache:
+    """
+    Content-addressed cache of layer results with a memory tier (per process, LRU)
+    and a disk tier (shared by all worker processes, JSON files pruned by last use).
+
+    Entries are keyed on sha256(layer, fingerprint, inputs): the fingerprint carries
+    the layer's configuration and input-data version, so changing a layer's settings
+    or data files only misses that layer's entries. Both tiers expire after the TTL.
+    """
+
+    def __init__(self, cache_dir: str = None, memory_entries: int = None, ttl_s: float = None,
+                 disk_max_entries: int = None):
+        self.cache_dir = cache_dir or os.getenv("RESULT_CACHE_DIR", "Forensic_Reports/cache")
+        self.memory_entries = memory_entries or int(os.getenv("RESULT_CACHE_MEMORY_ENTRIES", "256"))
+        self.ttl_s = ttl_s or float(os.getenv("RESULT_CACHE_TTL_H", "168")) * 3600.0
+        self.disk_max_entries = disk_max_entries or int(os.getenv("RESULT_CACHE_DISK_ENTRIES", "10000"))
+        self.enabled = os.getenv("RESULT_CACHE", "1") != "0"
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes_since_prune = {}
+        self.hits = {"memory": 0, "disk": 0}
+        self.misses = 0
+
+    @staticmethod
+    def make_key(layer: str, fingerprint: dict, inputs: dict):
+        canonical = json.dumps([layer, fingerprint, inputs], sort_keys=True, default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def _disk_path(self, layer: str, key: str):
+        return os.path.join(self.cache_dir, layer, f"{key}.json")
+
+    def get(self, layer: str, key: str, validate=None):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now - entry[0] <= self.ttl_s and (validate is None or validate(entry[1])):
+                    self._memory.move_to_end(key)
+                    self.hits["memory"] += 1
+                    return entry[1]
+                del self._memory[key]
+
+        path = self._disk_path(layer, key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if now - entry["stored_at"] > self.ttl_s or (validate is not None and not validate(entry["value"])):
+            self._remove(path)
+            return None
+        # Touch so disk pruning keeps recently used entries
+        os.utime(path, None)
+        self._remember(key, entry["stored_at"], entry["value"])
+        with self._lock:
+            self.hits["disk"] += 1
+        return entry["value"]
+
+    def put(self, layer: str, key: str, value):
+        stored_at = time.time()
+        self._remember(key, stored_at, value)
+
+        path = self._disk_path(layer, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"stored_at": stored_at, "value": value}, f)
+        os.replace(tmp_path, path)  # atomic, so other workers never read half an entry
+
+        writes = self._writes_since_prune.get(layer, 0) + 1
+        self._writes_since_prune[layer] = writes
+        if writes >= 100:
+            self._prune(layer)
+
+    def get_or_compute(self, layer: str, fingerprint: dict, inputs: dict, compute, validate=None):
+        """
+        Returns the cached result of `compute()` for these inputs, computing and
+        storing it on a miss. `validate(value)` can reject entries whose side-effect
+        files (overlays, PDFs) have since disappeared.
+        """
+        if not self.enabled:
+            return compute()
+        key = self.make_key(layer, fingerprint, inputs)
+        value = self.get(layer, key, validate)
+        if value is not None:
+            logger.info("[Cache] %s hit (%s)", layer, key[:12])
+            return value
+        with self._lock:
+            self.misses += 1
+        value = compute()
+        self.put(layer, key, value)
+        return value
+
+    def _remember(self, key: str, stored_at: float, value):
+        with self._lock:
+            self._memory[key] = (stored_at, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _prune(self, layer: str):
+        """
+        Drops expired entries and the least recently used ones beyond disk_max_entries.
+        """
+        self._writes_since_prune[layer] = 0
+        layer_dir = os.path.join(self.cache_dir, layer)
+        entries = []
+        for name in os.listdir(layer_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(layer_dir, name)
+            try:
+                entries.append((os.path.getmtime(path), path))
+            except OSError:
+                continue
+        entries.sort()
+        cutoff = time.time() - self.ttl_s
+        excess = len(entries) - self.disk_max_entries
+        for i, (mtime, path) in enumerate(entries):
+            if i < excess or mtime < cutoff:
+                self._remove(path)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        for layer in os.listdir(self.cache_dir) if os.path.isdir(self.cache_dir) else []:
+            layer_dir = os.path.join(self.cache_dir, layer)
+            for name in os.listdir(layer_dir):
+                self._remove(os.path.join(layer_dir, name))
+
+    def stats(self):
+        with self._lock:
+            return {"memory_entries": len(self._memory), "hits": dict(self.hits), "misses": self.misses}
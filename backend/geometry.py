@@ -0,0 +1,172 @@
+import os
+import json
+import hashlib
+import orjson
+from artifacts import ARTIFACT_ID
+
+GEOMETRY_DIR = os.path.join("Forensic_Reports", "geometry")
+
+# Encodings of GET /geometry/{id}, picked by the Accept header
+GEOJSON = "application/geo+json"
+QUANTIZED = "application/vnd.aeonblue.quantized+json"
+
+# 1e-7 deg is ~1 cm: far below SAR pixel and drift uncertainty
+QUANTIZATION_DEG = 1e-7
+
+
+def _json_ready(value):
+    # Round-trip through orjson so tuples/NumPy values become plain JSON types
+    return orjson.loads(orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY))
+
+
+def split_geometry(data: dict):
+    """
+    Moves the heavy geometry out of a pipeline result: slick polygons, wake path and
+    origin density go into one GeoJSON FeatureCollection (each feature tagged with
+    properties.layer). Returns (slim result, feature collection).
+    """
+    slim = {key: dict(value) if isinstance(value, dict) else value for key, value in data.items()}
+    features = []
+    extra = {}
+
+    sar = slim.get("sar_processing")
+    if sar:
+        slicks = sar.pop("slicks", None)
+        polygon = sar.pop("polygon", None)
+        for feature in (slicks or {}).get("features", []):
+            features.append(dict(feature, properties=dict(feature["properties"], layer="slick")))
+        if polygon:
+            features.append({"type": "Feature", "properties": {"layer": "spill_polygon"},
+                             "geometry": {"type": "Polygon", "coordinates": [polygon]}})
+
+    physics = slim.get("lagrangian_backtracking")
+    if physics:
+        wake_path = physics.pop("wake_path_geojson", None)
+        if isinstance(wake_path, str):
+            wake_path = json.loads(wake_path)
+        for feature in (wake_path or {}).get("features", []):
+            features.append(dict(feature, properties=dict(feature.get("properties") or {}, layer="wake_path")))
+        origin = physics.get("origin_point")
+        if origin:
+            features.append({"type": "Feature", "properties": {"layer": "origin"},
+                             "geometry": {"type": "Point", "coordinates": [origin["lon"], origin["lat"]]}})
+        density = physics.pop("origin_density", None)
+        if density is not None:
+            # The probability grid travels with the geometry; the spread stays a headline metric
+            physics["origin_spread_m"] = density.get("spread_m")
+            extra["origin_density"] = density
+
+    collection = dict({"type": "FeatureCollection", "features": features}, **extra)
+    return slim, _json_ready(collection)
+
+
+class GeometryStore:
+    """
+    Content-addressed store of result geometry (one FeatureCollection per result),
+    served separately from the slim JSON results in GeoJSON or quantized form.
+    """
+
+    def __init__(self, root: str = GEOMETRY_DIR, artifacts=None):
+        self.root = root
+        self.artifacts = artifacts
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, geometry_id: str):
+        return os.path.join(self.root, f"{geometry_id}.json")
+
+    def publish(self, data: dict, case_id: str = None):
+        """
+        Splits a pipeline result, stores its geometry, and returns the slim result
+        with `geometry_id`/`geometry_url` attached.
+        """
+        slim, collection = split_geometry(data)
+        if not collection["features"]:
+            return slim
+        payload = orjson.dumps(collection)
+        geometry_id = hashlib.sha1(payload).hexdigest()[:20]
+        path = self._path(geometry_id)
+        if not os.path.exists(path):
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        if self.artifacts is not None:
+            self.artifacts.register("geometry", geometry_id, path, case_id=case_id)
+        slim["geometry_id"] = geometry_id
+        slim["geometry_url"] = f"/geometry/{geometry_id}"
+        return slim
+
+    def load(self, geometry_id: str):
+        if not ARTIFACT_ID.match(geometry_id):
+            return None
+        path = self._path(geometry_id)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
+
+
+def quantize_coordinates(coords, translate):
+    """
+    Quantizes one coordinate array (ring / line / point) to QUANTIZATION_DEG integers,
+    delta-encoded along the array: [x0, y0, dx1, dy1, ...].
+    """
+    import numpy as np
+
+    q = np.rint((np.asarray(coords, dtype=np.float64).reshape(-1, 2) - translate) / QUANTIZATION_DEG).astype(np.int64)
+    q[1:] -= q[:-1].copy()
+    return q.ravel().tolist()
+
+
+def _quantize_geometry(geometry: dict, translate):
+    kind = geometry["type"]
+    coords = geometry["coordinates"]
+    if kind == "Point" or kind == "LineString":
+        encoded = quantize_coordinates(coords, translate)
+    elif kind == "Polygon":
+        encoded = [quantize_coordinates(ring, translate) for ring in coords]
+    elif kind == "MultiPolygon":
+        encoded = [[quantize_coordinates(ring, translate) for ring in polygon] for polygon in coords]
+    else:
+        return geometry
+    return {"type": kind, "coordinates": encoded}
+
+
+def _collection_bounds(collection: dict):
+    import numpy as np
+
+    lows = []
+    for feature in collection["features"]:
+        flat = np.asarray(_flatten(feature["geometry"]["coordinates"]), dtype=np.float64).reshape(-1, 2)
+        if len(flat):
+            lows.append(flat.min(axis=0))
+    return np.min(lows, axis=0) if lows else np.zeros(2)
+
+
+def _flatten(coords):
+    if coords and isinstance(coords[0], (int, float)):
+        return list(coords)
+    return [value for part in coords for value in _flatten(part)]
+
+
+def iter_encoded(collection: dict, media_type: str):
+    """
+    Streams a stored FeatureCollection as bytes, one feature per chunk.
+    GeoJSON is passed through; the quantized form replaces every coordinate array by
+    delta-encoded integers relative to `transform.translate` in units of `transform.scale`.
+    """
+    members = {key: value for key, value in collection.items() if key not in ("type", "features")}
+    if media_type == QUANTIZED:
+        translate = _collection_bounds(collection)
+        members["transform"] = {"scale": [QUANTIZATION_DEG, QUANTIZATION_DEG], "translate": translate.tolist()}
+        header = dict({"type": "QuantizedFeatureCollection"}, **members)
+        encode = lambda feature: dict(feature, geometry=_quantize_geometry(feature["geometry"], translate))
+    else:
+        header = dict({"type": "FeatureCollection"}, **members)
+        encode = lambda feature: feature
+
+    # Header members, then the features array written incrementally
+    yield orjson.dumps(header)[:-1] + b',"features":['
+    for i, feature in enumerate(collection["features"]):
+        yield (b"," if i else b"") + orjson.dumps(encode(feature))
+    yield b"]}"
@@ -0,0 +1,208 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime, timezone
+import orjson
+
+logger = logging.getLogger("aeonblue.ingest")
+
+# Scene rasters the SAR layer reads (see sar_processing/scene.py); anything else in the
+# drop directory (sidecars, partial copies) is ignored
+SCENE_EXTENSIONS = (".tif", ".tiff", ".npy")
+PARTIAL_SUFFIXES = (".part", ".tmp", ".crdownload")
+
+# Scenes without a sidecar or georeferencing are placed here (Singapore Strait)
+DEFAULT_COORDINATES = {"lon": 103.82, "lat": 1.22}
+
+
+class EventBroker:
+    """
+    In-process fan-out of live events to any number of subscribers. Every subscriber
+    has its own bounded queue: a client that stops reading loses its oldest events
+    instead of growing memory or slowing down the others. The last `backlog` events
+    are kept so reconnecting clients (SSE Last-Event-ID) catch up on what they missed.
+    """
+
+    def __init__(self, backlog: int = None):
+        self.backlog = backlog or int(os.getenv("LIVE_FEED_BACKLOG", "100"))
+        self._subscribers = set()
+        self._recent = deque(maxlen=self.backlog)
+        self._last_id = 0
+        self.published = 0
+        self.dropped = 0
+
+    def publish(self, event_type: str, data: dict):
+        """Must be called from the event loop thread."""
+        self._last_id += 1
+        event = {"id": self._last_id, "event": event_type, "data": data}
+        self._recent.append(event)
+        self.published += 1
+        for queue in self._subscribers:
+            if queue.full():
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(event)
+        return event
+
+    def subscribe(self, last_event_id: int = None):
+        queue = asyncio.Queue(maxsize=self.backlog)
+        if last_event_id is not None:
+            # An id from before a restart is ahead of ours: replay everything we have
+            if last_event_id > self._last_id:
+                last_event_id = 0
+            for event in self._recent:
+                if event["id"] > last_event_id:
+                    queue.put_nowait(event)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+
+    def stats(self):
+        return {"subscribers": len(self._subscribers), "published": self.published,
+                "dropped": self.dropped, "backlog": self.backlog}
+
+
+def format_sse(event: dict):
+    return b"id: %d\nevent: %s\ndata: %s\n\n" % (event["id"], event["event"].encode("utf-8"), orjson.dumps(event["data"]))
+
+
+class SceneWatcher:
+    """
+    Watches a drop directory for new Sentinel-1 scenes, queues a Pixels-to-Proof job
+    for each and publishes an "incident" event. A scan is one stat of the directory
+    while nothing changes; entries are only listed when its mtime moves or a file is
+    still being copied in. A file counts once its size and mtime hold still across two
+    scans. An optional sidecar `<scene>.json` gives gps_coordinates / timestamp.
+
+    Each API process runs its own watcher; the job queue deduplicates the submissions,
+    and each process pushes to its own SSE clients.
+    """
+
+    def __init__(self, jobs, broker: EventBroker, drop_dir: str = None, interval_s: float = None):
+        self.jobs = jobs
+        self.broker = broker
+        self.drop_dir = drop_dir or os.getenv("SCENE_DROP_DIR", os.path.join("DataSet", "Incoming"))
+        self.interval_s = interval_s or float(os.getenv("SCENE_SCAN_INTERVAL_S", "2"))
+        self._dir_mtime = None
+        self._unsettled = {}  # name -> (size, mtime_ns) at the previous scan
+        self._seen = set()
+        self._task = None
+        self._started_at = None
+        self.scans = 0
+        self.detected = 0
+
+    async def start(self):
+        os.makedirs(self.drop_dir, exist_ok=True)
+        self._started_at = time.time()
+        self._task = asyncio.create_task(self._loop())
+        logger.info("[Ingest] Watching %s every %g s.", self.drop_dir, self.interval_s)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            try:
+                for scene in await asyncio.to_thread(self.scan):
+                    self._ingest(scene)
+            except Exception as e:
+                logger.warning("[Ingest] Scan failed: %s", e)
+            await asyncio.sleep(self.interval_s)
+
+    def scan(self):
+        """Returns the scenes that settled since the last scan as (path, stat) pairs."""
+        self.scans += 1
+        try:
+            dir_mtime = os.stat(self.drop_dir).st_mtime_ns
+        except FileNotFoundError:
+            return []
+        if dir_mtime == self._dir_mtime and not self._unsettled:
+            return []
+        self._dir_mtime = dir_mtime
+
+        settled, unsettled = [], {}
+        with os.scandir(self.drop_dir) as entries:
+            for entry in entries:
+                name = entry.name
+                if (name.startswith(".") or name.endswith(PARTIAL_SUFFIXES)
+                        or not name.lower().endswith(SCENE_EXTENSIONS) or not entry.is_file()):
+                    continue
+                stat = entry.stat()
+                signature = (stat.st_size, stat.st_mtime_ns)
+                if (name, signature) in self._seen:
+                    continue
+                if self._unsettled.get(name) == signature:
+                    self._seen.add((name, signature))
+                    settled.append((entry.path, stat))
+                else:
+                    unsettled[name] = signature
+        self._unsettled = unsettled
+        return settled
+
+    @staticmethod
+    def _scene_request(path: str, stat):
+        image_id = os.path.splitext(os.path.basename(path))[0]
+        sidecar = {}
+        sidecar_path = os.path.splitext(path)[0] + ".json"
+        if os.path.exists(sidecar_path):
+            try:
+                with open(sidecar_path) as f:
+                    sidecar = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning("[Ingest] Ignoring unreadable sidecar %s: %s", sidecar_path, e)
+
+        coordinates = sidecar.get("gps_coordinates")
+        if coordinates is None:
+            try:
+                from sar_processing.scene import SceneSource
+
+                source = SceneSource(path)
+                if source.transform is not None:
+                    a, b, c, d, e, f = source.transform
+                    x, y = source.width / 2.0, source.height / 2.0
+                    coordinates = {"lon": a * x + b * y + c, "lat": d * x + e * y + f}
+            except Exception as e:
+                logger.warning("[Ingest] Could not read %s georeferencing: %s", path, e)
+        timestamp = sidecar.get("timestamp") or datetime.fromtimestamp(
+            stat.st_mtime, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+        return {
+            "image_id": sidecar.get("image_id", image_id),
+            "gps_coordinates": coordinates or dict(DEFAULT_COORDINATES),
+            "timestamp": timestamp,
+            # The job's SAR layer reads this raster (SARProcessor.process_scene)
+            "scene_path": os.path.abspath(path)
+        }
+
+    def _ingest(self, scene):
+        path, stat = scene
+        request = self._scene_request(path, stat)
+        # Scenes already handled before a restart keep their job and are not re-announced
+        done = self.jobs.find_done(request)
+        if done is not None and done["created_at"] < self._started_at:
+            return
+        job = self.jobs.submit(request)
+        if job["created_at"] < self._started_at:
+            return
+        self.detected += 1
+        coordinates = request["gps_coordinates"]
+        logger.info("[Ingest] New scene %s -> job %s", os.path.basename(path), job['id'])
+        self.broker.publish("incident", {
+            "id": request["image_id"],
+            "coords": [coordinates["lon"], coordinates["lat"]],
+            "location": f"Live Satellite Alert ({os.path.basename(path)})",
+            "date": request["timestamp"],
+            "job_id": job["id"],
+            "job_url": f"/jobs/{job['id']}"
+        })
+
+    def stats(self):
+        return {"drop_dir": self.drop_dir, "running": self._task is not None, "interval_s": self.interval_s,
+                "scans": self.scans, "detected": self.detected}
@@ -0,0 +1,259 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import sqlite3
+import asyncio
+import threading
+import logging
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger("aeonblue.jobs")
+
+LAYERS = ["sar_processing", "lagrangian_backtracking", "ais_correlation", "reporting"]
+
+
+class JobStore:
+    """
+    SQLite persistence of job state, so queued work and finished results survive a
+    restart. One row per job; progress, (partial) results and the published slim
+    result of a finished job are JSON columns.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    dedup_key TEXT NOT NULL,
+                    priority INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    request TEXT NOT NULL,
+                    progress TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    data TEXT
+                )""")
+            # Databases from before the published result was kept
+            if "data" not in {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}:
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN data TEXT")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_dedup ON jobs (dedup_key, status)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, priority, created_at)")
+
+    def insert(self, job: dict):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, dedup_key, priority, status, request, progress, result, error, created_at, "
+                "started_at, finished_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job["id"], job["dedup_key"], job["priority"], job["status"], json.dumps(job["request"]),
+                 json.dumps(job["progress"]), json.dumps(job["result"]), job["error"],
+                 job["created_at"], job["started_at"], job["finished_at"])
+            )
+
+    def update(self, job_id: str, **fields):
+        for key in ("progress", "result", "data"):
+            if key in fields:
+                fields[key] = json.dumps(fields[key])
+        assignments = ", ".join(f"{key} = ?" for key in fields)
+        with self._lock, self._conn:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    @staticmethod
+    def _row_to_job(row):
+        if row is None:
+            return None
+        job = dict(row)
+        for key in ("request", "progress", "result", "data"):
+            job[key] = json.loads(job[key]) if job[key] is not None else None
+        return job
+
+    def get(self, job_id: str):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row)
+
+    def find_active(self, dedup_key: str):
+        # Queued or running work for the same request is joined. Finished jobs are not reused:
+        # resubmitting runs again, so changed layer data or settings are picked up (unchanged
+        # layers come from the result cache), and failed jobs are retried
+        return self._find(dedup_key, ("queued", "running"))
+
+    def find_done(self, dedup_key: str):
+        return self._find(dedup_key, ("done",))
+
+    def _find(self, dedup_key: str, statuses: tuple):
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT * FROM jobs WHERE dedup_key = ? AND status IN ({', '.join('?' * len(statuses))}) "
+                "ORDER BY created_at DESC LIMIT 1",
+                (dedup_key, *statuses)
+            ).fetchone()
+        return self._row_to_job(row)
+
+    def pending(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM jobs WHERE status IN ('queued', 'running') ORDER BY priority DESC, created_at"
+            ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+
+class JobManager:
+    """
+    Asynchronous forensic jobs: submit() returns at once, a bounded set of runner
+    tasks drains a priority queue through the PipelineExecutor, and per-layer progress
+    plus partial results are persisted as each layer finishes.
+    SQLite writes from the runners go through one writer thread, in order, so a
+    commit never blocks the event loop.
+    Identical requests (same image, coordinates and timestamp) share one job while it
+    is queued or running. submit() and get() may be called from any thread.
+    With `publish` (GeometryStore.publish), the geometry of a job is stored once when
+    it finishes and its slim result is kept next to the full one (`data`).
+    """
+
+    def __init__(self, pipeline, db_path: str = None, max_concurrent: int = None, publish=None):
+        self.pipeline = pipeline
+        self.publish = publish
+        self.store = JobStore(db_path or os.getenv("JOBS_DB", "Forensic_Reports/jobs.sqlite"))
+        self.max_concurrent = max_concurrent or int(os.getenv("JOB_CONCURRENCY", "2"))
+        self._queue = None
+        self._loop = None
+        self._submit_lock = threading.Lock()
+        self._runners = []
+        self._seq = 0
+        self._writer = None
+
+    @staticmethod
+    def dedup_key(request: dict):
+        fields = {
+            "image_id": request["image_id"],
+            "gps_coordinates": request["gps_coordinates"],
+            "timestamp": request["timestamp"]
+        }
+        # A dropped scene is a different analysis from the archive mask of the same id
+        if request.get("scene_path"):
+            fields["scene_path"] = request["scene_path"]
+        canonical = json.dumps(fields, sort_keys=True)
+        return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+    def _enqueue(self, job_id: str, priority: int):
+        # Higher priority first, FIFO within a priority
+        self._seq += 1
+        self._queue.put_nowait((-priority, self._seq, job_id))
+
+    async def _write(self, job_id: str, **fields):
+        await asyncio.get_running_loop().run_in_executor(self._writer, partial(self.store.update, job_id, **fields))
+
+    async def start(self):
+        self._queue = asyncio.PriorityQueue()
+        self._loop = asyncio.get_running_loop()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="jobs-writer")
+        # Resume whatever was queued or interrupted mid-run before the last shutdown
+        recovered = self.store.pending()
+        for job in recovered:
+            self.store.update(job["id"], status="queued", progress={key: "queued" for key in LAYERS}, result={})
+            self._enqueue(job["id"], job["priority"])
+        if recovered:
+            logger.info("[Jobs] Re-queued %s unfinished jobs.", len(recovered))
+        self._runners = [asyncio.create_task(self._runner()) for _ in range(self.max_concurrent)]
+
+    async def stop(self):
+        for task in self._runners:
+            task.cancel()
+        await asyncio.gather(*self._runners, return_exceptions=True)
+        self._runners = []
+        # Flush the progress writes still queued
+        self._writer.shutdown(wait=True)
+
+    def submit(self, request: dict, priority: int = 0):
+        key = self.dedup_key(request)
+        with self._submit_lock:
+            existing = self.store.find_active(key)
+            if existing is not None:
+                logger.info("[Jobs] Duplicate request for %s, joining job %s", request['image_id'], existing['id'])
+                return existing
+            job = self._new_job(key, request, priority)
+            self.store.insert(job)
+        # The queue belongs to the event loop
+        self._loop.call_soon_threadsafe(self._enqueue, job["id"], priority)
+        logger.info("[Jobs] Queued job %s (%s, priority %s)", job['id'], request['image_id'], priority)
+        return job
+
+    def find_done(self, request: dict):
+        """The latest finished job for the same request, if any."""
+        return self.store.find_done(self.dedup_key(request))
+
+    @staticmethod
+    def _new_job(key: str, request: dict, priority: int):
+        return {
+            "id": uuid.uuid4().hex,
+            "dedup_key": key,
+            "priority": priority,
+            "status": "queued",
+            "request": request,
+            "progress": {key: "queued" for key in LAYERS},
+            "result": {},
+            "error": None,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None
+        }
+
+    def get(self, job_id: str):
+        return self.store.get(job_id)
+
+    def _finish(self, job_id: str, case_id: str, result: dict, **fields):
+        # Runs on the writer thread, after the progress writes of the job
+        data = self.publish(result, case_id=case_id) if self.publish is not None else None
+        self.store.update(job_id, result=result, data=data, finished_at=time.time(), **fields)
+
+    async def _runner(self):
+        while True:
+            _, _, job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str):
+        job = await asyncio.to_thread(self.store.get, job_id)
+        if job is None or job["status"] != "queued":
+            return
+        progress, result = job["progress"], {}
+        await self._write(job_id, status="running", started_at=time.time())
+
+        def on_layer(key, status, layer_result):
+            # Called on the event loop: queue the write (a snapshot) and return at once
+            progress[key] = status
+            if layer_result is not None:
+                result[key] = layer_result
+            self._writer.submit(self.store.update, job_id, progress=dict(progress), result=dict(result))
+
+        request = job["request"]
+        try:
+            await self.pipeline.analyze_spill(request["image_id"], request["gps_coordinates"],
+                                              request["timestamp"], on_layer=on_layer,
+                                              scene_path=request.get("scene_path"))
+            await asyncio.get_running_loop().run_in_executor(
+                self._writer, partial(self._finish, job_id, request["image_id"], dict(result), status="done"))
+            logger.info("[Jobs] Job %s completed.", job_id)
+        except Exception as e:
+            for key in LAYERS:
+                if progress[key] != "done":
+                    progress[key] = "failed"
+            await asyncio.get_running_loop().run_in_executor(
+                self._writer, partial(self._finish, job_id, request["image_id"], dict(result), status="failed",
+                                      progress=dict(progress), error=str(e)))
+            logger.warning("[Jobs] Job %s failed: %s", job_id, e)
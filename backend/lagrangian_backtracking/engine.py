@@ -1,9 +1,16 @@
-import math
-import random
-from datetime import datetime, timedelta
-import json
-# In real application, we would import OpenDrift
-# from opendrift.models.oceandrift import OceanDrift
+import os
+import logging
+import numpy as np
+from datetime import datetime, timedelta, timezone
+from .fields import FieldReader, synthetic_field
+from .particles import seed_particles, reverse_advect, origin_density
+from telemetry import span
+
+logger = logging.getLogger("aeonblue.backtrack")
+
+# OpenDrift (from opendrift.models.oceandrift import OceanDrift) is what this engine
+# stands in for; the ensemble below implements the same reverse-time Lagrangian
+# advection directly in NumPy so it runs offline against local field files.
 
 class BacktrackingEngine:
     def __init__(self, settings: dict = None):
@@ -15,59 +22,116 @@ class BacktrackingEngine:
         self.windage = settings["windage_factor"]
         self.window = settings["backtrack_window"]
 
+        # Particle ensemble configuration
+        self.particle_count = settings.get("particle_count", 10000)
+        self.time_step_minutes = settings.get("time_step_minutes", 30)
+        self.seed_radius_m = settings.get("seed_radius_m", 250.0)
+
+        # Local environmental fields (NetCDF files or Zarr stores, opened lazily and read
+        # through a shared chunk cache). When unset or missing, deterministic synthetic
+        # fields keep the pipeline running offline.
+        self.wind_path = settings.get("wind_path", os.getenv("ERA5_WIND_PATH"))
+        self.current_path = settings.get("current_path", os.getenv("CMEMS_CURRENT_PATH"))
+        self.wind_reader = FieldReader(self.wind_path, "u10", "v10") if self.wind_path else None
+        self.current_reader = FieldReader(self.current_path, "uo", "vo") if self.current_path else None
+
+    def cache_fingerprint(self):
+        """
+        Configuration and input-data version of this layer, for the result cache.
+        Field files are identified by path and modification time.
+        """
+        def file_version(path):
+            return [path, os.path.getmtime(path)] if path and os.path.exists(path) else None
+
+        return {
+            "layer_version": 2,
+            "windage_factor": self.windage,
+            "backtrack_window": self.window,
+            "particle_count": self.particle_count,
+            "time_step_minutes": self.time_step_minutes,
+            "seed_radius_m": self.seed_radius_m,
+            "wind": file_version(self.wind_path),
+            "current": file_version(self.current_path)
+        }
+
+    def preload(self):
+        """Opens the environmental fields (coordinates only) ahead of the first run."""
+        for reader in (self.wind_reader, self.current_reader):
+            if reader is not None and os.path.exists(reader.path):
+                reader._open()
+
+    @staticmethod
+    def _epoch_seconds(moment: datetime):
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        return moment.timestamp()
+
     def fetch_environmental_vectors(self, gps_coords: dict, time_window: list):
         """
         Fetches wind vectors from ECMWF ERA5 and current vectors from CMEMS.
+        Only the region a slick could have drifted through during the window is read.
+        Returns (current_field, wind_field) as GriddedField objects.
         """
-        print("[Backtracking] Fetching Wind Vectors: ECMWF ERA5 (10m height)")
-        print(f"[Backtracking] Applying {self.windage * 100}% windage factor...")
-        print("[Backtracking] Fetching Current Vectors: Copernicus Marine Service (CMEMS)")
-        return "environmental_vectors_data"
+        # 2 deg covers ~2 m/s of combined drift for 24 hours in every direction
+        margin = 2.0 * max(1.0, self.window / 24.0)
+        bbox = (gps_coords["lon"] - margin, gps_coords["lat"] - margin,
+                gps_coords["lon"] + margin, gps_coords["lat"] + margin)
+        time_range = (self._epoch_seconds(time_window[0]), self._epoch_seconds(time_window[1]))
+        seed = abs(gps_coords["lon"] * 1000 + gps_coords["lat"] * 1000)
 
-    def run_opendrift_simulation(self, gps_coords: dict, leak_end_time: datetime):
+        logger.info("[Backtracking] Fetching Wind Vectors: ECMWF ERA5 (10m height)")
+        if self.wind_reader is not None and os.path.exists(self.wind_path):
+            wind_field = self.wind_reader.read(bbox, time_range)
+        else:
+            wind_field = synthetic_field(seed, bbox, time_range, mean_speed=6.0, eddy_speed=2.0)
+        logger.info("[Backtracking] Applying %s%% windage factor...", self.windage * 100)
+        logger.info("[Backtracking] Fetching Current Vectors: Copernicus Marine Service (CMEMS)")
+        if self.current_reader is not None and os.path.exists(self.current_path):
+            current_field = self.current_reader.read(bbox, time_range)
+        else:
+            current_field = synthetic_field(seed + 1, bbox, time_range, mean_speed=0.15, eddy_speed=0.1)
+        return current_field, wind_field
+
+    def run_opendrift_simulation(self, gps_coords: dict, leak_end_time: datetime, slick_polygon: list = None):
         """
-        Integrates OpenDrift Lagrangian particle tracking framework.
-        Reverses vectors over 12-to-24 hour window to determine precise (x, y) origin.
+        Reverse-time Lagrangian particle ensemble (the OpenDrift backtracking step).
+        Seeds particles over the slick, advects them backwards with RK4 through the
+        current + windage fields over the 12-to-24 hour window, and returns the origin
+        probability density together with the most likely (x, y) origin.
         """
         start_time = leak_end_time - timedelta(hours=self.window)
-        
-        # Proxy for fetching vectors
-        env_data = self.fetch_environmental_vectors(gps_coords, [start_time, leak_end_time])
-
-        print(f"[Backtracking] Starting OpenDrift reverse simulation from {leak_end_time} to {start_time}")
-        
-        # In a real setup:
-        # o = OceanDrift(loglevel=20)
-        # o.add_readers([era5_reader, cmems_reader])
-        # o.seed_elements(lon=gps_coords['lon'], lat=gps_coords['lat'], time=leak_end_time, number=1000)
-        # o.run(time_step=-timedelta(minutes=30), duration=timedelta(hours=self.window))
-        # return o
-        
-        # Use the deterministic seed derived from coords (Math.sin trick) so it's globally consistent
+        with span("backtrack.fields"):
+            current_field, wind_field = self.fetch_environmental_vectors(gps_coords, [start_time, leak_end_time])
+
+        logger.info("[Backtracking] Starting reverse particle simulation from %s to %s", leak_end_time, start_time)
+
+        # Use the deterministic seed derived from coords so results are globally consistent
         seed = abs(gps_coords["lon"] * 1000 + gps_coords["lat"] * 1000)
-        random.seed(seed)
-        
-        # Calculate wind drift offset deterministically for this exact coordinate
-        dxDir = (random.random() - 0.5) * 0.06
-        dyDir = (random.random() - 0.5) * 0.06
-        
-        # Extrapolate origin path over 4 hours
-        origin_lon = gps_coords["lon"]
-        origin_lat = gps_coords["lat"]
-        
-        for i in range(4):
-            origin_lon += dxDir * (0.7 + random.random() * 0.6)
-            origin_lat += dyDir * (0.7 + random.random() * 0.6)
-        
-        origin_point = {"lon": origin_lon, "lat": origin_lat}
-        print(f"[Backtracking] Determined likely origin point (Wind Drift Reversed): {origin_point}")
-        return origin_point
-
-    def generate_geojson_wake_path(self, origin: dict, current_loc: dict):
+        rng = np.random.default_rng(int(seed) % (2 ** 32))
+
+        lat, lon = seed_particles(rng, self.particle_count, gps_coords, self.seed_radius_m, slick_polygon)
+        with span("backtrack.advection"):
+            lat, lon, mean_track = reverse_advect(
+                lat, lon,
+                t_end=self._epoch_seconds(leak_end_time),
+                duration_s=self.window * 3600.0,
+                dt_s=self.time_step_minutes * 60.0,
+                current_field=current_field,
+                wind_field=wind_field,
+                windage=self.windage
+            )
+        with span("backtrack.density"):
+            origin_point, density = origin_density(lat, lon)
+        logger.info("[Backtracking] Determined likely origin point (Ensemble density peak): %s", origin_point)
+        return origin_point, density, mean_track
+
+    def generate_geojson_wake_path(self, origin: dict, current_loc: dict, path: list = None):
         """
-        Outputs a GeoJSON FeatureCollection representing the 'Wake Path' 
-        (historical trajectory of the slick).
+        Outputs a GeoJSON FeatureCollection representing the 'Wake Path'
+        (historical trajectory of the slick), as a dict so it is serialized only once.
         """
+        if path is None:
+            path = [[origin["lon"], origin["lat"]]]
         geojson = {
             "type": "FeatureCollection",
             "features": [{
@@ -75,27 +139,28 @@ class BacktrackingEngine:
                 "properties": {"type": "Wake Path"},
                 "geometry": {
                     "type": "LineString",
-                    "coordinates": [
-                        [origin["lon"], origin["lat"]],
-                        [current_loc["lon"], current_loc["lat"]]
-                    ]
+                    "coordinates": [list(pt) for pt in path] + [[current_loc["lon"], current_loc["lat"]]]
                 }
             }]
         }
-        return json.dumps(geojson)
+        return geojson
 
-    def run_backtrack(self, gps_coords: dict, timestamp: str):
+    def run_backtrack(self, gps_coords: dict, timestamp: str, slick_polygon: list = None):
         """
         Main runner for the Lagrangian Backtracking Engine.
         """
-        # Convert timestamp to datetime object
+        # Convert timestamp to datetime object (naive UTC)
         spill_time = datetime.fromisoformat(timestamp)
-        
-        origin_point = self.run_opendrift_simulation(gps_coords, spill_time)
-        wake_path = self.generate_geojson_wake_path(origin_point, gps_coords)
+        if spill_time.tzinfo is not None:
+            spill_time = spill_time.astimezone(timezone.utc).replace(tzinfo=None)
+
+        origin_point, density, mean_track = self.run_opendrift_simulation(gps_coords, spill_time, slick_polygon)
+        # Wake path: from the density peak along the ensemble-mean drift to the observed slick
+        wake_path = self.generate_geojson_wake_path(origin_point, gps_coords, [[origin_point["lon"], origin_point["lat"]]] + mean_track[1:-1])
 
         return {
             "origin_point": origin_point,
+            "origin_density": density,
             "wake_path_geojson": wake_path,
             "leak_start_time": (spill_time - timedelta(hours=self.window)).isoformat()
         }
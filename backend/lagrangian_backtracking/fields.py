@@ -0,0 +1,241 @@
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+
+
+class GriddedField:
+    """
+    A 2-component horizontal vector field (u eastward, v northward, m/s) on a regular
+    (time, lat, lon) grid, e.g. ERA5 10m wind or CMEMS surface currents.
+    `times` are seconds since the Unix epoch; lats/lons must be ascending and evenly spaced.
+    """
+
+    def __init__(self, times, lats, lons, u, v):
+        self.times = np.asarray(times, dtype=np.float64)
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        # Both components packed as u + i*v, so one gather fetches u and v together.
+        # complex128 keeps every particle-sized op in a single dtype (mixed-precision
+        # complex arithmetic falls off NumPy's fast loops).
+        self.uv = np.asarray(u, dtype=np.float64) + 1j * np.asarray(v, dtype=np.float64)
+
+        # Regular grid spacing lets sample() locate cells with arithmetic instead of searches
+        self._t0, self._dt = self.times[0], (self.times[-1] - self.times[0]) / max(1, len(self.times) - 1) or 1.0
+        self._lat0, self._dlat = self.lats[0], (self.lats[-1] - self.lats[0]) / max(1, len(self.lats) - 1) or 1.0
+        self._lon0, self._dlon = self.lons[0], (self.lons[-1] - self.lons[0]) / max(1, len(self.lons) - 1) or 1.0
+
+    @staticmethod
+    def _locate(values, origin, step, size):
+        pos = np.clip((values - origin) / step, 0.0, size - 1)
+        idx = np.minimum(pos.astype(np.int64), max(0, size - 2))
+        return idx, pos - idx
+
+    def sample(self, t: float, lat, lon):
+        """
+        Vectorized trilinear interpolation of (u, v) at time t for arrays of positions.
+        The two bracketing time slices are blended once on the (small) grid, then each
+        particle needs only four gathers for both components. Positions outside the
+        grid are clamped to its edge.
+        """
+        nt, ny, nx = self.uv.shape
+        ti, tw = self._locate(np.asarray(t, dtype=np.float64), self._t0, self._dt, nt)
+        ti = int(ti)
+        plane = self.uv[ti] + (self.uv[min(ti + 1, nt - 1)] - self.uv[ti]) * float(tw)
+        flat = plane.ravel()
+
+        yi, yw = self._locate(lat, self._lat0, self._dlat, ny)
+        xi, xw = self._locate(lon, self._lon0, self._dlon, nx)
+        row0 = yi * nx
+        row1 = np.minimum(yi + 1, ny - 1) * nx
+        xi1 = np.minimum(xi + 1, nx - 1)
+
+        # ndarray.take is several times faster than fancy indexing for gathers
+        south = flat.take(row0 + xi)
+        south += (flat.take(row0 + xi1) - south) * xw
+        north = flat.take(row1 + xi)
+        north += (flat.take(row1 + xi1) - north) * xw
+        uv = south + (north - south) * yw
+        return uv.real, uv.imag
+
+
+class ChunkCache:
+    """
+    LRU cache of decoded field chunks bounded by a byte budget. One instance is shared
+    by all readers of a process, so back-to-back runs over the same region and period
+    reuse chunks instead of decoding them again.
+    """
+
+    def __init__(self, budget_bytes: int):
+        self.budget_bytes = budget_bytes
+        self.used_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._chunks = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, loader):
+        with self._lock:
+            chunk = self._chunks.get(key)
+            if chunk is not None:
+                self._chunks.move_to_end(key)
+                self.hits += 1
+                return chunk
+        chunk = loader()
+        with self._lock:
+            self.misses += 1
+            if key not in self._chunks:
+                self._chunks[key] = chunk
+                self.used_bytes += chunk.nbytes
+            while self.used_bytes > self.budget_bytes and len(self._chunks) > 1:
+                _, evicted = self._chunks.popitem(last=False)
+                self.used_bytes -= evicted.nbytes
+        return chunk
+
+    def stats(self):
+        return {"chunks": len(self._chunks), "used_bytes": self.used_bytes,
+                "budget_bytes": self.budget_bytes, "hits": self.hits, "misses": self.misses}
+
+
+default_chunk_cache = ChunkCache(int(os.getenv("FIELD_CACHE_MB", "512")) * 1024 * 1024)
+
+
+class FieldReader:
+    """
+    Lazily opened ERA5/CMEMS vector field (NetCDF file or Zarr store) read chunk by chunk.
+
+    Opening only parses coordinates; data is fetched per (time, lat, lon) chunk of
+    `chunk_shape` grid cells, and only for chunks intersecting a run's bounding box and
+    window. Decoded chunks live in a ChunkCache keyed on (path, mtime, variable, chunk),
+    so a changed file is never served from stale entries.
+    Handles the ERA5/CMEMS coordinate conventions (latitude/longitude or lat/lon,
+    descending latitudes, 0..360 longitudes, any dimension order, an optional depth
+    axis reduced to the surface level).
+    """
+
+    def __init__(self, path: str, u_var: str, v_var: str, chunk_shape: tuple = (24, 64, 64),
+                 cache: ChunkCache = None):
+        self.path = path
+        self.u_var = u_var
+        self.v_var = v_var
+        self.chunk_shape = chunk_shape
+        self.cache = cache or default_chunk_cache
+        self._ds = None
+        self._mtime = None
+
+    def _open(self):
+        mtime = os.path.getmtime(self.path)
+        if self._ds is not None and mtime == self._mtime:
+            return
+        import xarray as xr
+
+        if self.path.endswith(".zarr") or os.path.isdir(self.path):
+            ds = xr.open_zarr(self.path)
+        else:
+            ds = xr.open_dataset(self.path)
+        rename = {}
+        for name, target in (("latitude", "lat"), ("longitude", "lon"), ("valid_time", "time")):
+            if name in ds.dims or name in ds.coords:
+                rename[name] = target
+        ds = ds.rename(rename)
+        if "depth" in ds.dims:
+            ds = ds.isel(depth=0)
+        # ERA5 ships 0..360 longitudes; queries and particles use -180..180
+        lons = ds["lon"].values.astype(np.float64)
+        if (lons > 180.0).any():
+            ds = ds.assign_coords(lon=((ds["lon"] + 180.0) % 360.0) - 180.0).sortby("lon")
+        # Chunks are sliced and stacked as (time, lat, lon) whatever the file's order
+        ds = ds.transpose("time", "lat", "lon", ...)
+
+        self._ds = ds
+        self._mtime = mtime
+        self.times = ds["time"].values.astype("datetime64[s]").astype(np.float64)
+        lats = ds["lat"].values.astype(np.float64)
+        # Work in ascending latitude; chunks are still read in the file's own order
+        self._lat_flipped = len(lats) > 1 and lats[0] > lats[-1]
+        self.lats = lats[::-1] if self._lat_flipped else lats
+        self.lons = ds["lon"].values.astype(np.float64)
+
+    @staticmethod
+    def _index_range(coords, lo, hi):
+        # One extra grid point on each side so the whole range can be interpolated
+        i0 = max(0, int(np.searchsorted(coords, lo, side="right")) - 1)
+        i1 = min(len(coords), int(np.searchsorted(coords, hi, side="left")) + 1)
+        return i0, max(i1, i0 + 1)
+
+    def _load_chunk(self, var: str, ct: int, cy: int, cx: int):
+        st, sy, sx = self.chunk_shape
+        block = self._ds[var].isel(time=slice(ct * st, (ct + 1) * st),
+                                   lat=slice(cy * sy, (cy + 1) * sy),
+                                   lon=slice(cx * sx, (cx + 1) * sx)).values
+        return np.nan_to_num(block.astype(np.float32))
+
+    def _read_var(self, var: str, t_range: tuple, y_range: tuple, x_range: tuple):
+        """
+        Assembles the (file-order) index box [t0:t1, y0:y1, x0:x1] of one variable from cached chunks.
+        """
+        st, sy, sx = self.chunk_shape
+        (t0, t1), (y0, y1), (x0, x1) = t_range, y_range, x_range
+        out = np.empty((t1 - t0, y1 - y0, x1 - x0), dtype=np.float32)
+        for ct in range(t0 // st, (t1 - 1) // st + 1):
+            for cy in range(y0 // sy, (y1 - 1) // sy + 1):
+                for cx in range(x0 // sx, (x1 - 1) // sx + 1):
+                    chunk = self.cache.get((self.path, self._mtime, var, ct, cy, cx),
+                                           lambda: self._load_chunk(var, ct, cy, cx))
+                    # Intersection of this chunk with the requested box, in both frames
+                    a0, a1 = max(t0, ct * st), min(t1, (ct + 1) * st)
+                    b0, b1 = max(y0, cy * sy), min(y1, (cy + 1) * sy)
+                    c0, c1 = max(x0, cx * sx), min(x1, (cx + 1) * sx)
+                    out[a0 - t0:a1 - t0, b0 - y0:b1 - y0, c0 - x0:c1 - x0] = \
+                        chunk[a0 - ct * st:a1 - ct * st, b0 - cy * sy:b1 - cy * sy, c0 - cx * sx:c1 - cx * sx]
+        return out
+
+    def read(self, bbox: tuple, time_range: tuple):
+        """
+        Returns the GriddedField covering bbox = (lon_min, lat_min, lon_max, lat_max) and
+        time_range = (t_start_s, t_end_s), touching only the intersecting chunks.
+        """
+        self._open()
+        lon_min, lat_min, lon_max, lat_max = bbox
+        t_range = self._index_range(self.times, time_range[0], time_range[1])
+        y_range = self._index_range(self.lats, lat_min, lat_max)
+        x_range = self._index_range(self.lons, lon_min, lon_max)
+
+        file_y_range = y_range
+        if self._lat_flipped:
+            n = len(self.lats)
+            file_y_range = (n - y_range[1], n - y_range[0])
+
+        components = []
+        for var in (self.u_var, self.v_var):
+            block = self._read_var(var, t_range, file_y_range, x_range)
+            components.append(block[:, ::-1] if self._lat_flipped else block)
+
+        return GriddedField(
+            self.times[t_range[0]:t_range[1]],
+            self.lats[y_range[0]:y_range[1]],
+            self.lons[x_range[0]:x_range[1]],
+            components[0], components[1]
+        )
+
+
+def synthetic_field(seed: float, bbox: tuple, time_range: tuple, mean_speed: float, eddy_speed: float):
+    """
+    Deterministic stand-in field used when no local ERA5/CMEMS files are configured:
+    a uniform drift whose direction is derived from the seed plus a slowly rotating
+    eddy, on a coarse 0.25 deg grid covering bbox and time_range.
+    """
+    rng = np.random.default_rng(int(seed) % (2 ** 32))
+    lon_min, lat_min, lon_max, lat_max = bbox
+    lats = np.linspace(lat_min, lat_max, max(2, int((lat_max - lat_min) / 0.25) + 1))
+    lons = np.linspace(lon_min, lon_max, max(2, int((lon_max - lon_min) / 0.25) + 1))
+    times = np.linspace(time_range[0], time_range[1], 9)
+
+    direction = rng.uniform(0, 2 * np.pi)
+    phase = rng.uniform(0, 2 * np.pi)
+    cy, cx = (lat_min + lat_max) / 2.0, (lon_min + lon_max) / 2.0
+    tt, yy, xx = np.meshgrid((times - times[0]) / 86400.0, lats - cy, lons - cx, indexing="ij")
+    swirl = eddy_speed * np.exp(-(xx ** 2 + yy ** 2))
+    u = mean_speed * np.cos(direction) - swirl * np.sin(phase + tt) * yy
+    v = mean_speed * np.sin(direction) + swirl * np.cos(phase + tt) * xx
+    return GriddedField(times, lats, lons, u, v)
@@ -0,0 +1,116 @@
+import numpy as np
+
+METERS_PER_DEGREE = 111195.0
+
+
+def seed_particles(rng, count: int, center: dict, radius_m: float, polygon: list = None):
+    """
+    Seeds `count` particles uniformly inside the slick polygon ([[lon, lat], ...]) when
+    one is given, otherwise in a Gaussian cloud of `radius_m` around the center point.
+    Returns (lat, lon) arrays.
+    """
+    if polygon is not None and len(polygon) >= 4:
+        ring = np.asarray(polygon, dtype=np.float64)
+        # Cap the edge count so the point-in-polygon test stays a small broadcast
+        if len(ring) > 512:
+            ring = ring[np.linspace(0, len(ring) - 1, 512).astype(np.int64)]
+        lon_min, lat_min = ring.min(axis=0)
+        lon_max, lat_max = ring.max(axis=0)
+
+        lats, lons = [], []
+        accepted = 0
+        while accepted < count:
+            cand_lon = rng.uniform(lon_min, lon_max, count * 2)
+            cand_lat = rng.uniform(lat_min, lat_max, count * 2)
+            inside = points_in_ring(cand_lon, cand_lat, ring)
+            lons.append(cand_lon[inside])
+            lats.append(cand_lat[inside])
+            accepted += int(inside.sum())
+            if accepted == 0 and len(lons) > 4:
+                break  # Degenerate polygon: fall back to the point cloud below
+        if accepted:
+            return np.concatenate(lats)[:count], np.concatenate(lons)[:count]
+
+    spread_deg = radius_m / METERS_PER_DEGREE
+    lat = center["lat"] + rng.normal(0, spread_deg, count)
+    lon = center["lon"] + rng.normal(0, spread_deg, count) / max(0.01, np.cos(np.radians(center["lat"])))
+    return lat, lon
+
+
+def points_in_ring(lon, lat, ring):
+    """
+    Vectorized even-odd ray casting of points against a closed polygon ring.
+    """
+    x0, y0 = ring[:-1, 0], ring[:-1, 1]
+    x1, y1 = ring[1:, 0], ring[1:, 1]
+    px = lon[:, None]
+    py = lat[:, None]
+    straddles = (y0 > py) != (y1 > py)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x_cross = x0 + (py - y0) * (x1 - x0) / (y1 - y0)
+    return np.count_nonzero(straddles & (px < x_cross), axis=1) % 2 == 1
+
+
+def reverse_advect(lat, lon, t_end: float, duration_s: float, dt_s: float,
+                   current_field, wind_field, windage: float):
+    """
+    Reverse-time RK4 advection of the whole particle ensemble.
+    Velocity = surface current + windage * 10m wind; every particle advances per
+    timestep in one array operation. Returns the final (origin) positions and the
+    ensemble-mean track, ordered from the oldest position to the observed slick.
+    """
+    lat = np.array(lat, dtype=np.float64)
+    lon = np.array(lon, dtype=np.float64)
+
+    def velocity(t, y, x):
+        cu, cv = current_field.sample(t, y, x)
+        wu, wv = wind_field.sample(t, y, x)
+        u = cu + windage * wu
+        v = cv + windage * wv
+        # m/s -> deg/s
+        return v / METERS_PER_DEGREE, u / (METERS_PER_DEGREE * np.maximum(0.01, np.cos(np.radians(y))))
+
+    steps = max(1, int(round(duration_s / dt_s)))
+    h = -duration_s / steps  # negative step: integrate backwards in time
+    t = t_end
+    mean_track = [(float(lon.mean()), float(lat.mean()))]
+    for _ in range(steps):
+        k1y, k1x = velocity(t, lat, lon)
+        k2y, k2x = velocity(t + h / 2, lat + h / 2 * k1y, lon + h / 2 * k1x)
+        k3y, k3x = velocity(t + h / 2, lat + h / 2 * k2y, lon + h / 2 * k2x)
+        k4y, k4x = velocity(t + h, lat + h * k3y, lon + h * k3x)
+        lat += h / 6 * (k1y + 2 * k2y + 2 * k3y + k4y)
+        lon += h / 6 * (k1x + 2 * k2x + 2 * k3x + k4x)
+        t += h
+        mean_track.append((float(lon.mean()), float(lat.mean())))
+
+    return lat, lon, mean_track[::-1]
+
+
+def origin_density(lat, lon, bins: int = 32):
+    """
+    Origin probability density of the back-advected ensemble as a normalized 2D
+    histogram, plus the most likely origin (mean of the particles in the peak cell).
+    """
+    lat_min, lat_max = float(lat.min()), float(lat.max())
+    lon_min, lon_max = float(lon.min()), float(lon.max())
+    # Avoid a zero-width histogram when every particle ends up in the same place
+    pad = 1e-6
+    counts, lat_edges, lon_edges = np.histogram2d(
+        lat, lon, bins=bins, range=[[lat_min - pad, lat_max + pad], [lon_min - pad, lon_max + pad]]
+    )
+    probability = counts / counts.sum()
+
+    peak_y, peak_x = np.unravel_index(np.argmax(counts), counts.shape)
+    in_peak = ((lat >= lat_edges[peak_y]) & (lat <= lat_edges[peak_y + 1]) &
+               (lon >= lon_edges[peak_x]) & (lon <= lon_edges[peak_x + 1]))
+    origin = {"lon": float(lon[in_peak].mean()), "lat": float(lat[in_peak].mean())}
+
+    spread_m = float(np.sqrt(np.var(lat) + np.var(lon) * np.cos(np.radians(origin["lat"])) ** 2) * METERS_PER_DEGREE)
+    return origin, {
+        # Row 0 is the southernmost latitude band
+        "bounds": [float(lon_edges[0]), float(lat_edges[0]), float(lon_edges[-1]), float(lat_edges[-1])],
+        "shape": [bins, bins],
+        "probability": np.round(probability, 6).tolist(),
+        "spread_m": round(spread_m, 1)
+    }
@@ -1,23 +1,81 @@
 import os
-import uvicorn
-from fastapi import FastAPI, HTTPException
+import time
+import uuid
+import asyncio
+import importlib
+import logging
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import FileResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
-from datetime import datetime
+from typing import List, Optional
+from contextlib import asynccontextmanager
+
+logger = logging.getLogger("aeonblue.api")
 
 if not os.path.exists("Forensic_Reports"):
     os.makedirs("Forensic_Reports")
 
-# Import modules from our forensic engine layers
-from sar_processing.processor import SARProcessor
-from lagrangian_backtracking.engine import BacktrackingEngine
-from ais_correlation.correlator import AISCorrelator
-from reporting.generator import ReportGenerator
+# Engine logging (the "aeonblue.*" loggers) is written by a background thread from here on
+import telemetry
+telemetry.install_log_queue()
+
+# The forensic engine layers run inside worker processes (see pipeline.py). Nothing here
+# imports the engines, OpenCV or pandas: they load in the workers, during the background
+# warm-up or on first use, so the API starts accepting requests right away.
+from pipeline import PipelineExecutor
+from responses import ORJSONResponse
+from geometry import GeometryStore, split_geometry, iter_encoded, GEOJSON, QUANTIZED
+from jobs import JobManager
+from ingest import EventBroker, SceneWatcher, format_sse
+from artifacts import ArtifactStore, KINDS
+from reporting.generator import REPORTS_DIR
+
+artifacts = ArtifactStore()
+pipeline = PipelineExecutor(artifacts=artifacts)
+geometry_store = GeometryStore(artifacts=artifacts)
+jobs = JobManager(pipeline, publish=geometry_store.publish)
+live_events = EventBroker()
+watcher = SceneWatcher(jobs, live_events)
+
+async def warm_up():
+    """
+    Runs after boot: eviction, the tile module (and NumPy) the API process serves from, then every
+    layer's engines and data in the workers. GET /ready reports progress.
+    """
+    await asyncio.to_thread(artifacts.evict)
+    await asyncio.to_thread(importlib.import_module, "sar_processing.tiles")
+    await pipeline.warm_up()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    pipeline.start()
+    await jobs.start()
+    await watcher.start()
+    warming = asyncio.create_task(warm_up())
+    yield
+    warming.cancel()
+    await asyncio.gather(warming, return_exceptions=True)
+    await watcher.stop()
+    await jobs.stop()
+    pipeline.shutdown()
 
 app = FastAPI(title="AeonBlue Forensic Engine API", 
               description="Automates the 'Pixels-to-Proof' workflow.",
-              version="1.0.0")
+              version="1.0.0",
+              lifespan=lifespan,
+              default_response_class=ORJSONResponse)
+
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    # Route templates, not raw paths, keep the label set bounded
+    route = request.scope.get("route")
+    telemetry.observe("aeonblue_http_request_seconds", time.perf_counter() - started,
+                      route=getattr(route, "path", "unmatched"), method=request.method)
+    return response
 
 app.add_middleware(
     CORSMiddleware,
@@ -27,88 +85,346 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-app.mount("/reports", StaticFiles(directory="Forensic_Reports"), name="reports")
-
-# Instantiate engines
-sar_engine = SARProcessor()
-physics_engine = BacktrackingEngine()
-attribution_engine = AISCorrelator()
-reporting_engine = ReportGenerator()
+os.makedirs(REPORTS_DIR, exist_ok=True)
+app.mount("/reports", StaticFiles(directory=REPORTS_DIR), name="reports")
 
 class SpillRequest(BaseModel):
     image_id: str
     gps_coordinates: dict  # expected keys: "lon", "lat"
     timestamp: str  # ISO 8601 string, e.g., "2023-11-04T12:00:00"
 
-poll_counter = 0
+class JobRequest(SpillRequest):
+    priority: int = 0  # higher runs first
+
+class BatchSpillRequest(BaseModel):
+    spills: List[SpillRequest]  # e.g. every slick detected in one Sentinel-1 scene
+
+class BulkReportRequest(BaseModel):
+    job_ids: List[str]  # e.g. a day's detections
+
+class HoldRequest(BaseModel):
+    reason: Optional[str] = None  # e.g. a court or agency reference
+
+# Seconds between SSE comments that keep idle connections (and proxies) open
+LIVE_FEED_HEARTBEAT_S = float(os.getenv("LIVE_FEED_HEARTBEAT_S", "15"))
 
 @app.get("/system-status")
 async def get_system_status():
-    global poll_counter
-    poll_counter += 1
-    
-    # Simulate finding a new image after a polling cycle to simulate "True" live detection
-    if poll_counter % 2 == 0:
-        return {
-            "status": "active",
-            "new_incident": True,
-            "incident_data": {
-                "id": f"LIVE-S1-ACQ-{poll_counter}",
-                "coords": [103.82, 1.22],
-                "location": "Live Satellite Alert (Singapore Strait)",
-                "date": "Just now"
-            }
-        }
-    else:
-        return {
-            "status": "listening",
-            "new_incident": False
-        }
+    """
+    Watcher and live feed status. New incidents are pushed on GET /live-feed;
+    new_incident stays False for clients that still poll.
+    """
+    return {
+        "status": "active" if watcher.stats()["running"] else "idle",
+        "new_incident": False,
+        "live_feed": "/live-feed",
+        "watcher": watcher.stats(),
+        "feed": live_events.stats()
+    }
+
+@app.get("/ready")
+async def get_readiness():
+    """
+    Readiness probe: 200 once every layer (sar, backtrack, attribution, reports) is warm
+    in all workers, 503 while the background warm-up is still running. Requests are
+    accepted either way; before then they may pay for engine construction.
+    """
+    readiness = pipeline.readiness()
+    return ORJSONResponse(readiness, status_code=200 if readiness["ready"] else 503)
+
+@app.get("/live-feed")
+async def live_feed(request: Request):
+    """
+    Server-Sent Events stream of live detections: one "incident" event per new scene
+    in the drop directory, carrying the id of the job already queued for it.
+    Reconnecting clients resume after their Last-Event-ID.
+    """
+    last_event_id = request.headers.get("last-event-id", "")
+    queue = live_events.subscribe(int(last_event_id) if last_event_id.isdigit() else None)
+
+    async def stream():
+        try:
+            yield b"retry: 5000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=LIVE_FEED_HEARTBEAT_S)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+                yield format_sse(event)
+        finally:
+            live_events.unsubscribe(queue)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @app.post("/analyze_spill")
-async def analyze_spill(request: SpillRequest):
-    print(f"\n--- Starting Forensic Analysis for Spill: {request.image_id} ---")
-    
+async def analyze_spill(request: SpillRequest, profile: bool = False):
+    """
+    Runs the Pixels-to-Proof workflow. With ?profile=true (allowed when
+    PROFILE_REQUESTS=1) layers A-C are profiled and the dump paths are returned.
+    """
+    logger.info("--- Starting Forensic Analysis for Spill: %s ---", request.image_id)
+    if profile and not telemetry.profiling_enabled():
+        raise HTTPException(status_code=403, detail="Request profiling is disabled (set PROFILE_REQUESTS=1)")
+    profile_dir = os.path.join(telemetry.PROFILES_DIR, uuid.uuid4().hex[:12]) if profile else None
+
     try:
-        # Layer A: SAR Processing & AI Proxy
-        print(">> Triggering Layer A: SAR Processing")
-        sar_result = sar_engine.process_spill(request.image_id, request.gps_coordinates)
-        
-        # Layer B: Lagrangian Backtracking
-        print(">> Triggering Layer B: Physics & Backtracking")
-        physics_result = physics_engine.run_backtrack(request.gps_coordinates, request.timestamp)
-        
-        # Layer C: AIS Correlation
-        print(">> Triggering Layer C: Spatiotemporal AIS Attribution")
-        attribution_result = attribution_engine.attribute_polluter(
-            physics_result["origin_point"], 
-            physics_result["leak_start_time"]
-        )
-        
-        # Layer D: Reporting
-        print(">> Triggering Layer D: Automated Forensic Reporting")
-        report_result = reporting_engine.generate_evidence_packet(
-            request.image_id,
-            sar_result,
-            physics_result,
-            attribution_result
+        # Layers A (SAR), B (backtracking seeded in A's slick polygon), C (AIS
+        # attribution) and D (reporting) run in the worker pool
+        data = await pipeline.analyze_spill(request.image_id, request.gps_coordinates, request.timestamp,
+                                            profile_dir=profile_dir)
+
+        # Polygons, wake path and density are served by GET /geometry/{geometry_id}
+        response = {
+            "status": "success",
+            "message": "Pixels-to-Proof workflow execution completed.",
+            "data": geometry_store.publish(data, case_id=request.image_id)
+        }
+        if profile_dir:
+            response["profiles"] = sorted(os.path.join(profile_dir, name) for name in os.listdir(profile_dir))
+            artifacts.register("profile", os.path.basename(profile_dir), profile_dir, case_id=request.image_id)
+        return response
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/analyze_batch")
+async def analyze_batch(request: BatchSpillRequest):
+    """
+    Backtracks every spill of a batch, then attributes all origins against AIS
+    in a single batched spatiotemporal join.
+    """
+    logger.info("--- Starting Batch Attribution for %s Spills ---", len(request.spills))
+
+    try:
+        logger.info(">> Triggering Layer B: Physics & Backtracking (batch)  ->  Layer C: AIS Attribution (batch)")
+        physics_results, attribution_results = await pipeline.analyze_batch(
+            [{"gps_coordinates": spill.gps_coordinates, "timestamp": spill.timestamp} for spill in request.spills]
         )
-        
+
         return {
             "status": "success",
-            "message": "Pixels-to-Proof workflow execution completed.",
-            "data": {
-                "sar_processing": sar_result,
-                "lagrangian_backtracking": physics_result,
-                "ais_correlation": attribution_result,
-                "reporting": report_result
-            }
+            "message": f"Batch attribution completed for {len(request.spills)} spills.",
+            "data": [dict(geometry_store.publish({
+                "lagrangian_backtracking": physics,
+                "ais_correlation": attribution
+            }, case_id=spill.image_id), image_id=spill.image_id) for spill, physics, attribution in zip(request.spills, physics_results, attribution_results)]
         }
     except Exception as e:
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/jobs", status_code=202)
+async def submit_job(request: JobRequest):
+    """
+    Queues a Pixels-to-Proof run and returns its job id immediately.
+    Poll GET /jobs/{job_id} for per-layer progress and partial results.
+    """
+    job = await asyncio.to_thread(jobs.submit, {
+        "image_id": request.image_id,
+        "gps_coordinates": request.gps_coordinates,
+        "timestamp": request.timestamp
+    }, priority=request.priority)
+    return {"job_id": job["id"], "status": job["status"]}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = await asyncio.to_thread(jobs.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+    # Finished jobs carry their published (slim) result; partial results are slimmed without storing geometry
+    data = job["data"] if job["data"] is not None else split_geometry(job["result"])[0]
+    # The stored report entry is a snapshot taken when it was queued; the render queue knows its current status
+    report = data.get("reporting")
+    if report and report.get("status") == "pending":
+        data["reporting"] = pipeline.reports.status(report["report_id"]) or report
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "priority": job["priority"],
+        "request": job["request"],
+        "progress": job["progress"],
+        "data": data,
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"]
+    }
+
+@app.get("/report-queue/{report_id}")
+async def get_report_status(report_id: str):
+    """
+    Render status of an evidence packet: "pending", "ready" (download from report_url)
+    or "failed".
+    """
+    entry = pipeline.reports.status(report_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"Unknown report {report_id}")
+    artifacts.touch(report_id)
+    return entry
+
+@app.post("/report-queue/bulk", status_code=202)
+async def render_reports_bulk(request: BulkReportRequest):
+    """
+    Queues the evidence packets of many finished jobs at once; they render in
+    parallel across the render pool.
+    """
+    packets = []
+    for job_id in request.job_ids:
+        job = await asyncio.to_thread(jobs.get, job_id)
+        if job is None or job["status"] != "done":
+            raise HTTPException(status_code=409, detail=f"Job {job_id} is unknown or not finished")
+        result = job["result"]
+        packets.append({"spill_id": job["request"]["image_id"], "sar": result["sar_processing"],
+                        "physics": result["lagrangian_backtracking"], "attribution": result["ais_correlation"]})
+    entries = pipeline.reports.submit_many(packets)
+    return {"reports": [{"report_id": e["report_id"], "report_url": e["report_url"], "status": e["status"]}
+                        for e in entries]}
+
+# Tilesets and geometry are content-addressed and never change, so they can be cached indefinitely
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+@app.get("/tiles/{tileset_id}/{z}/{x}/{y}.png")
+async def get_tile(tileset_id: str, z: int, x: int, y: int, request: Request):
+    """
+    Serves one XYZ tile of a SAR overlay pyramid with a strong ETag.
+    Empty (fully transparent) tiles inside the pyramid answer 204.
+    """
+    from sar_processing.tiles import read_tileset, tile_path
+
+    # read_tileset rejects malformed ids before they reach a path
+    if read_tileset(tileset_id) is None:
+        raise HTTPException(status_code=404, detail=f"Unknown tileset {tileset_id}")
+
+    etag = f'"{tileset_id}-{z}-{x}-{y}"'
+    headers = {"ETag": etag, "Cache-Control": IMMUTABLE_CACHE_CONTROL}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    path = tile_path(tileset_id, z, x, y)
+    if not os.path.exists(path):
+        return Response(status_code=204, headers=headers)
+    return FileResponse(path, media_type="image/png", headers=headers)
+
+@app.get("/tiles/{tileset_id}/tilejson.json")
+async def get_tilejson(tileset_id: str):
+    from sar_processing.tiles import read_tileset
+
+    meta = read_tileset(tileset_id)
+    if meta is None:
+        raise HTTPException(status_code=404, detail=f"Unknown tileset {tileset_id}")
+    artifacts.touch(tileset_id)
+    return {
+        "tilejson": "3.0.0",
+        "tiles": [f"/tiles/{tileset_id}/{{z}}/{{x}}/{{y}}.png"],
+        "bounds": meta["bounds"],
+        "minzoom": meta["minzoom"],
+        "maxzoom": meta["maxzoom"]
+    }
+
+@app.get("/geometry/{geometry_id}")
+async def get_geometry(geometry_id: str, request: Request):
+    """
+    Streams the geometry of a result (slicks, spill polygon, wake path, origin and
+    origin density). Content negotiation on Accept: application/geo+json (default) or
+    application/vnd.aeonblue.quantized+json (1e-7 deg integers, delta-encoded per ring).
+    """
+    collection = geometry_store.load(geometry_id)
+    if collection is None:
+        raise HTTPException(status_code=404, detail=f"Unknown geometry {geometry_id}")
+    artifacts.touch(geometry_id)
+
+    media_type = QUANTIZED if QUANTIZED in request.headers.get("accept", "") else GEOJSON
+    etag = f'"{geometry_id}-{"q" if media_type == QUANTIZED else "g"}"'
+    headers = {"ETag": etag, "Cache-Control": IMMUTABLE_CACHE_CONTROL, "Vary": "Accept"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return StreamingResponse(iter_encoded(collection, media_type), media_type=media_type, headers=headers)
+
+@app.get("/artifacts")
+async def list_artifacts(kind: Optional[str] = None, case_id: Optional[str] = None, limit: int = 50,
+                         cursor: Optional[str] = None):
+    """
+    Pages through the indexed Forensic_Reports outputs, newest first. Pass the returned
+    next_cursor to get the following page.
+    """
+    if kind is not None and kind not in KINDS:
+        raise HTTPException(status_code=400, detail=f"kind must be one of {', '.join(KINDS)}")
+    try:
+        items, next_cursor = artifacts.list(kind=kind, case_id=case_id, limit=max(1, min(limit, 500)), cursor=cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor {cursor}")
+    return {"artifacts": items, "next_cursor": next_cursor}
+
+@app.get("/artifacts/stats")
+async def get_artifact_stats():
+    return artifacts.stats()
+
+@app.get("/artifacts/{artifact_id}")
+async def get_artifact(artifact_id: str):
+    item = artifacts.get(artifact_id)
+    if item is None:
+        raise HTTPException(status_code=404, detail=f"Unknown artifact {artifact_id}")
+    return item
+
+@app.post("/artifacts/{artifact_id}/pin")
+async def pin_artifact(artifact_id: str):
+    """Pinned artifacts are never evicted."""
+    if not artifacts.pin(artifact_id, True):
+        raise HTTPException(status_code=404, detail=f"Unknown artifact {artifact_id}")
+    return artifacts.get(artifact_id)
+
+@app.delete("/artifacts/{artifact_id}/pin")
+async def unpin_artifact(artifact_id: str):
+    if not artifacts.pin(artifact_id, False):
+        raise HTTPException(status_code=404, detail=f"Unknown artifact {artifact_id}")
+    return artifacts.get(artifact_id)
+
+@app.post("/artifacts/evict")
+async def evict_artifacts():
+    """Runs eviction now instead of waiting for the next write-triggered pass."""
+    return await asyncio.to_thread(artifacts.evict)
+
+@app.get("/holds")
+async def list_holds():
+    return {"holds": artifacts.holds()}
+
+@app.put("/holds/{case_id}")
+async def place_hold(case_id: str, request: HoldRequest):
+    """
+    Legal hold on a case (a SAR image id): none of its artifacts are evicted until released.
+    """
+    artifacts.hold(case_id, request.reason)
+    return {"case_id": case_id, "reason": request.reason, "artifacts": artifacts.list(case_id=case_id, limit=500)[0]}
+
+@app.delete("/holds/{case_id}")
+async def release_hold(case_id: str):
+    if not artifacts.release(case_id):
+        raise HTTPException(status_code=404, detail=f"No hold on {case_id}")
+    return {"case_id": case_id, "released": True}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Prometheus scrape endpoint: span, layer, request and HTTP latency histograms
+    (seconds) and the rows/bytes counters, including those recorded in the worker pools.
+    """
+    return PlainTextResponse(telemetry.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/pipeline-stats")
+async def get_pipeline_stats():
+    """
+    Rolling p50/p95/p99 latencies of each layer and of whole requests.
+    """
+    return {"workers": pipeline.workers, "latency": pipeline.latency.summary(), "reports": pipeline.reports.stats(),
+            "live_feed": live_events.stats()}
+
 if __name__ == "__main__":
+    import uvicorn
+
     print("Initializing AeonBlue Forensic Engine (Simulated Data Core)...")
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
+    # The reloader re-imports the app on every change; opt in for development only
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=os.getenv("API_RELOAD", "0") == "1")
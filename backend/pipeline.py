@@ -0,0 +1,353 @@
+import os
+import time
+import asyncio
+import threading
+import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import telemetry
+from cache import ResultCache
+from reporting.render_queue import ReportQueue, WARM_UP_ROUNDS
+
+logger = logging.getLogger("aeonblue.pipeline")
+
+# Layers warmed after boot and reported by GET /ready, in warm-up order
+LAYERS = ("sar", "backtrack", "attribution")
+
+# Engines of the current process, each built on first use or by warm_up
+_engines = {}
+_engines_lock = threading.Lock()
+_preloaded = {}  # layer -> seconds its preload took in this process
+
+
+def init_worker(pool_process: bool = False, inference_address: str = None):
+    """
+    Process-pool initializer. Engines are not built here, so the pool comes up at once:
+    warm_up builds and preloads them in the background after boot, and a request that
+    gets to a worker first builds the engine it needs.
+    Reports render on their own pool (reporting/render_queue.py).
+    """
+    if pool_process:
+        telemetry.mark_worker()
+        telemetry.install_log_queue()
+    if inference_address:
+        # SAR segmentation goes to the pool's shared inference service
+        os.environ["SAR_INFERENCE_ADDRESS"] = inference_address
+    logger.info("[Pipeline] Worker %s started.", os.getpid())
+
+
+def _build_engine(name: str):
+    if name == "sar":
+        from sar_processing.processor import SARProcessor
+        return SARProcessor()
+    if name == "backtrack":
+        from lagrangian_backtracking.engine import BacktrackingEngine
+        return BacktrackingEngine()
+    if name == "attribution":
+        from ais_correlation.correlator import AISCorrelator
+        return AISCorrelator()
+    return ResultCache()
+
+
+def _engine(name: str):
+    engine = _engines.get(name)
+    if engine is None:
+        with _engines_lock:
+            engine = _engines.get(name)
+            if engine is None:
+                engine = _engines[name] = _build_engine(name)
+    return engine
+
+
+def warm_up(layers: tuple = LAYERS, delay_s: float = 0.0):
+    """
+    Builds the engines of `layers` in this process and preloads their data (mask
+    catalog, recent AIS partitions, environmental field coordinates), once per process.
+    Returns the pid and the seconds each layer took.
+    """
+    for name in layers:
+        if name not in _preloaded:
+            started = time.perf_counter()
+            _engine(name).preload()
+            _preloaded[name] = round(time.perf_counter() - started, 3)
+    # Holding each task briefly makes the pool hand them to distinct workers
+    time.sleep(delay_s)
+    return os.getpid(), {name: _preloaded[name] for name in layers}
+
+
+def run_sar(image_id: str, gps_coordinates: dict):
+    sar = _engine("sar")
+    return _engine("cache").get_or_compute(
+        "sar", sar.cache_fingerprint(),
+        {"image_id": image_id, "gps_coordinates": gps_coordinates},
+        lambda: sar.process_spill(image_id, gps_coordinates),
+        # The overlay tiles are a side effect of the layer; recompute if they are gone
+        # (or if the entry predates them)
+        validate=lambda result: _tileset_exists((result.get("tiles") or {}).get("tileset_id"))
+    )
+
+
+def _tileset_exists(tileset_id: str):
+    from sar_processing.tiles import read_tileset
+
+    return bool(tileset_id) and read_tileset(tileset_id) is not None
+
+
+def run_scene(scene_path: str, gps_coordinates: dict, image_id: str):
+    sar = _engine("sar")
+    stat = os.stat(scene_path)
+    # Keyed on the file's identity too, so a scene replaced under the same name is reprocessed
+    return _engine("cache").get_or_compute(
+        "sar_scene", sar.cache_fingerprint(),
+        {"scene_path": os.path.abspath(scene_path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+         "gps_coordinates": gps_coordinates, "image_id": image_id},
+        lambda: sar.process_scene(scene_path, gps_coordinates, image_id)
+    )
+
+
+def run_backtrack(gps_coordinates: dict, timestamp: str, slick_polygon: list = None):
+    physics = _engine("backtrack")
+    return _engine("cache").get_or_compute(
+        "backtrack", physics.cache_fingerprint(),
+        {"gps_coordinates": gps_coordinates, "timestamp": timestamp, "slick_polygon": slick_polygon},
+        lambda: physics.run_backtrack(gps_coordinates, timestamp, slick_polygon=slick_polygon)
+    )
+
+
+def run_attribution(origin_point: dict, leak_start_time: str):
+    correlator = _engine("attribution")
+    return _engine("cache").get_or_compute(
+        "attribution", correlator.cache_fingerprint(),
+        {"origin_point": origin_point, "leak_start_time": leak_start_time},
+        lambda: correlator.attribute_polluter(origin_point, leak_start_time)
+    )
+
+
+def run_attribution_batch(origins: list):
+    """
+    Serves cached origins from the cache and runs one batched join for the rest.
+    """
+    correlator = _engine("attribution")
+    cache = _engine("cache")
+    if not cache.enabled:
+        return correlator.attribute_polluters(origins)
+
+    fingerprint = correlator.cache_fingerprint()
+    keys = [cache.make_key("attribution", fingerprint, origin) for origin in origins]
+    results = [cache.get("attribution", key) for key in keys]
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        for i, result in zip(missing, correlator.attribute_polluters([origins[i] for i in missing])):
+            cache.put("attribution", keys[i], result)
+            results[i] = result
+    logger.info("[Cache] attribution batch: %s/%s origins cached", len(origins) - len(missing), len(origins))
+    return results
+
+
+class LatencyTracker:
+    """
+    Rolling window of recent latencies per name (pipeline layers and whole requests).
+    """
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._samples = {}
+
+    def record(self, name: str, seconds: float):
+        self._samples.setdefault(name, deque(maxlen=self.window)).append(seconds)
+
+    def summary(self):
+        report = {}
+        import numpy as np
+
+        for name, samples in self._samples.items():
+            values = np.fromiter(samples, dtype=np.float64) * 1000.0
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            report[name] = {
+                "count": len(values),
+                "p50_ms": round(float(p50), 2),
+                "p95_ms": round(float(p95), 2),
+                "p99_ms": round(float(p99), 2),
+                "max_ms": round(float(values.max()), 2)
+            }
+        return report
+
+
+class PipelineExecutor:
+    """
+    Runs the CPU-heavy layers off the event loop on a pool of warm worker processes.
+    PIPELINE_WORKERS sets the pool size (default: CPU count); 0 runs the layers on a
+    thread pool in this process instead, which is handy for debugging.
+    """
+
+    def __init__(self, workers: int = None, artifacts=None):
+        if workers is None:
+            workers = int(os.getenv("PIPELINE_WORKERS", str(os.cpu_count() or 1)))
+        self.workers = workers
+        self.pool = None
+        self.inference = None
+        self.latency = LatencyTracker()
+        self.artifacts = artifacts
+        self.reports = ReportQueue(artifacts=artifacts)
+        self.layers = {name: {"status": "cold"} for name in LAYERS}
+
+    def start(self):
+        """Creates the pools without waiting on them; warm_up() then warms the engines."""
+        if self.workers > 0:
+            # One model and micro-batcher for all workers, so concurrent requests share batches
+            from sar_processing.inference import InferenceService
+
+            self.inference = InferenceService()
+            address = self.inference.start()
+            self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker,
+                                            initargs=(True, address))
+        else:
+            self.pool = ThreadPoolExecutor(max_workers=4)
+            logger.info("[Pipeline] Running layers in-process (PIPELINE_WORKERS=0).")
+        self.reports.start()
+
+    async def warm_up(self):
+        """
+        Background warm-up after boot: builds and preloads one layer at a time on every
+        worker, then the render workers. Requests are served meanwhile (a cold worker
+        builds what it needs); readiness() reports progress.
+        The pool hands tasks to whichever worker is free, so a round of one task per
+        worker can miss some: rounds repeat, each holding its tasks longer, until every
+        worker has answered. A layer is only "warm" once all of them have.
+        """
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        tasks, delay_s = (self.workers, 0.2) if self.workers > 0 else (1, 0.0)
+        for name in LAYERS:
+            self.layers[name] = {"status": "warming"}
+            timings = {}  # pid -> preload seconds
+            try:
+                for round_ in range(WARM_UP_ROUNDS):
+                    results = await asyncio.gather(*[
+                        loop.run_in_executor(self.pool, warm_up, (name,), delay_s * 2 ** round_) for _ in range(tasks)
+                    ])
+                    timings.update((pid, layer_timings[name]) for pid, layer_timings in results)
+                    if len(timings) >= tasks:
+                        break
+            except Exception as e:
+                logger.warning("[Pipeline] Warm-up of %s failed: %s", name, e)
+                self.layers[name] = {"status": "failed", "error": str(e)}
+                continue
+            if len(timings) < tasks:
+                logger.warning("[Pipeline] Warm-up of %s reached %s of %s workers.", name, len(timings), tasks)
+                self.layers[name] = {"status": "partial", "workers": len(timings)}
+                continue
+            self.layers[name] = {"status": "warm", "workers": len(timings), "seconds": max(timings.values())}
+        await self.reports.warm_up()
+        logger.info("[Pipeline] Warm-up complete in %.1f s.", time.perf_counter() - started)
+
+    def readiness(self):
+        layers = dict(self.layers, reports=self.reports.readiness)
+        return {"ready": all(layer["status"] == "warm" for layer in layers.values()), "layers": layers}
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+        if self.inference is not None:
+            self.inference.shutdown()
+            self.inference = None
+        self.reports.shutdown()
+
+    async def run(self, layer: str, fn, *args, profile_path: str = None):
+        """
+        Runs one layer in the pool. Spans and counters recorded by the worker come back
+        with the result and are merged into this process's /metrics.
+        """
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        try:
+            result, delta = await loop.run_in_executor(self.pool, telemetry.run_instrumented, fn, args, profile_path)
+            telemetry.merge(delta)
+            return result
+        finally:
+            elapsed = time.perf_counter() - started
+            self.latency.record(layer, elapsed)
+            telemetry.observe("aeonblue_layer_seconds", elapsed, layer=layer)
+
+    async def analyze_spill(self, image_id: str, gps_coordinates: dict, timestamp: str, on_layer=None,
+                            profile_dir: str = None, scene_path: str = None):
+        """
+        The Pixels-to-Proof workflow. B (backtracking) seeds its particles inside the slick
+        polygon A (SAR) extracts, so it follows A; C needs B's origin and D needs
+        everything. Many requests still run side by side across the pool. D only queues
+        the PDF: its URL comes back "pending" while it renders in the background.
+        `on_layer(key, status, result)` is called as each layer starts and finishes,
+        with key one of the response keys ("sar_processing", ...).
+        With `profile_dir`, layers A-C are profiled into one file each there.
+        With `scene_path` (a dropped Sentinel-1 raster), A reads that scene tile by tile
+        instead of the archive mask of `image_id`.
+        """
+        started = time.perf_counter()
+
+        async def layer(key: str, name: str, fn, *args):
+            if on_layer:
+                on_layer(key, "running", None)
+            profile_path = os.path.join(profile_dir, name) if profile_dir else None
+            result = await self.run(name, fn, *args, profile_path=profile_path)
+            if on_layer:
+                on_layer(key, "done", result)
+            return result
+
+        logger.info(">> Triggering Layer A: SAR Processing")
+        if scene_path:
+            sar_result = await layer("sar_processing", "A_sar", run_scene, scene_path, gps_coordinates, image_id)
+        else:
+            sar_result = await layer("sar_processing", "A_sar", run_sar, image_id, gps_coordinates)
+        self._index_tiles(image_id, sar_result)
+
+        logger.info(">> Triggering Layer B: Physics & Backtracking (seeded in the slick polygon)")
+        physics_result = await layer("lagrangian_backtracking", "B_backtrack", run_backtrack,
+                                     gps_coordinates, timestamp, sar_result.get("polygon"))
+
+        logger.info(">> Triggering Layer C: Spatiotemporal AIS Attribution")
+        attribution_result = await layer("ais_correlation", "C_attribution", run_attribution,
+                                         physics_result["origin_point"], physics_result["leak_start_time"])
+
+        logger.info(">> Triggering Layer D: Automated Forensic Reporting")
+        if on_layer:
+            on_layer("reporting", "running", None)
+        report_result = self.reports.submit(image_id, sar_result, physics_result, attribution_result)
+        if on_layer:
+            on_layer("reporting", "done", report_result)
+
+        self.latency.record("analyze_spill", time.perf_counter() - started)
+        telemetry.observe("aeonblue_request_seconds", time.perf_counter() - started, workflow="analyze_spill")
+        return {
+            "sar_processing": sar_result,
+            "lagrangian_backtracking": physics_result,
+            "ais_correlation": attribution_result,
+            "reporting": report_result
+        }
+
+    def _index_tiles(self, image_id: str, sar_result: dict):
+        # Tilesets are written by the workers; the index lives in this process
+        tiles = sar_result.get("tiles") or {}
+        if self.artifacts is not None and tiles.get("tileset_id"):
+            from sar_processing.tiles import TILES_DIR
+
+            self.artifacts.register("tileset", tiles["tileset_id"], os.path.join(TILES_DIR, tiles["tileset_id"]),
+                                    case_id=image_id, meta={"bounds": tiles.get("bounds"), "maxzoom": tiles.get("maxzoom")})
+
+    async def analyze_batch(self, spills: list):
+        """
+        Backtracks every spill in parallel across the pool, then attributes all origins
+        in one batched AIS join.
+        """
+        started = time.perf_counter()
+        physics_results = await asyncio.gather(*[
+            self.run("B_backtrack", run_backtrack, spill["gps_coordinates"], spill["timestamp"])
+            for spill in spills
+        ])
+        attribution_results = await self.run("C_attribution_batch", run_attribution_batch, [
+            {"origin_point": physics["origin_point"], "leak_start_time": physics["leak_start_time"]}
+            for physics in physics_results
+        ])
+        self.latency.record("analyze_batch", time.perf_counter() - started)
+        telemetry.observe("aeonblue_request_seconds", time.perf_counter() - started, workflow="analyze_batch")
+        return physics_results, attribution_results
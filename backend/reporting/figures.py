@@ -0,0 +1,351 @@
+import os
+import json
+import hashlib
+import threading
+import numpy as np
+import cv2
+
+from sar_processing.tiles import TILE_SIZE, read_tileset, tile_path
+
+# Figures are drawn at this size and embedded as JPEG, which ReportLab passes through
+# to the PDF without re-encoding
+FIGURE_SIZE = (1000, 640)
+JPEG_QUALITY = 88
+# Bump when the drawing changes, to invalidate cached figures
+FIGURE_VERSION = 2
+# Most tiles read to build one SAR thumbnail; a coarser zoom is used beyond this
+MAX_THUMBNAIL_TILES = 64
+
+SEA_BGR = (74, 48, 27)
+SLICK_BGR = (60, 60, 230)
+WAKE_BGR = (230, 220, 60)
+ORIGIN_BGR = (40, 200, 255)
+VESSEL_BGR = [(80, 255, 120), (255, 180, 80), (200, 120, 255), (200, 200, 200)]
+
+
+def _mercator_y(lat):
+    lat = np.radians(np.clip(np.asarray(lat, dtype=np.float64), -85.0, 85.0))
+    return np.log(np.tan(np.pi / 4.0 + lat / 2.0))
+
+
+class MapFrame:
+    """
+    Web Mercator view of (west, south, east, north) on a width x height raster, padded
+    so the extent keeps its true aspect ratio.
+    """
+
+    def __init__(self, extent: tuple, size: tuple = FIGURE_SIZE, pad: float = 0.12):
+        west, south, east, north = extent
+        self.width, self.height = size
+        x0, x1 = np.radians(west), np.radians(east)
+        y0, y1 = _mercator_y(south), _mercator_y(north)
+        span = max(x1 - x0, (y1 - y0) * self.width / self.height, 1e-7) * (1.0 + 2.0 * pad)
+        cx, cy = (x0 + x1) / 2.0, (y0 + y1) / 2.0
+        self.x0, self.scale = cx - span / 2.0, self.width / span
+        self.y1 = cy + span * self.height / self.width / 2.0
+
+    def pixels(self, lon, lat):
+        """Raster (x, y) of lon/lat arrays."""
+        x = (np.radians(np.asarray(lon, dtype=np.float64)) - self.x0) * self.scale
+        y = (self.y1 - _mercator_y(lat)) * self.scale
+        return np.stack([x, y], axis=-1)
+
+    def lonlat_bounds(self):
+        west = np.degrees(self.x0)
+        east = np.degrees(self.x0 + self.width / self.scale)
+        north = np.degrees(np.arctan(np.sinh(self.y1)))
+        south = np.degrees(np.arctan(np.sinh(self.y1 - self.height / self.scale)))
+        return west, south, east, north
+
+
+def _points_extent(points: list):
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    return (float(points[:, 0].min()), float(points[:, 1].min()),
+            float(points[:, 0].max()), float(points[:, 1].max()))
+
+
+def _rings(geometry: dict):
+    if geometry["type"] == "Polygon":
+        return [geometry["coordinates"][0]]
+    if geometry["type"] == "MultiPolygon":
+        return [polygon[0] for polygon in geometry["coordinates"]]
+    return []
+
+
+def slick_rings(sar: dict):
+    """Exterior rings (lon/lat) of every slick, or the single spill polygon."""
+    features = (sar.get("slicks") or {}).get("features") or []
+    rings = [ring for feature in features for ring in _rings(feature["geometry"])]
+    if not rings and sar.get("polygon"):
+        rings = [sar["polygon"]]
+    return rings
+
+
+def wake_lines(physics: dict):
+    wake = physics.get("wake_path_geojson") or {}
+    if isinstance(wake, str):
+        wake = json.loads(wake)
+    return [f["geometry"]["coordinates"] for f in wake.get("features", []) if f["geometry"]["type"] == "LineString"]
+
+
+def vessel_tracks(attribution: dict, minutes: float = 15.0):
+    """
+    Track of each attributed vessel through its closest point of approach: the AIS
+    fixes bounding its CPA segment (`cpa_fixes`) with the CPA between them. Results
+    without fixes get a course extrapolated +/- `minutes` along the CPA heading at
+    the CPA speed, flagged `extrapolated`. Synthetic vessels are never plotted.
+    """
+    tracks = []
+    for rank, vessel in enumerate(attribution.get("attributed_vessels") or []):
+        if vessel.get("synthetic") or vessel.get("cpa_lat") is None or vessel.get("cpa_lon") is None:
+            continue
+        lat, lon = float(vessel["cpa_lat"]), float(vessel["cpa_lon"])
+        fixes = [[float(fix["lon"]), float(fix["lat"])] for fix in vessel.get("cpa_fixes") or []]
+        extrapolated = False
+        if fixes:
+            line = [fixes[0], [lon, lat], fixes[-1]] if len(fixes) > 1 else [[lon, lat]]
+        else:
+            heading = str(vessel.get("heading", "")).rstrip("°")
+            half_m = float(vessel.get("speed_knots") or 0.0) * 1852.0 * minutes / 60.0
+            if heading.lstrip("-").replace(".", "", 1).isdigit() and half_m > 0:
+                course = np.radians(float(heading))
+                dlat = half_m * np.cos(course) / 111111.0
+                dlon = half_m * np.sin(course) / (111111.0 * max(0.01, np.cos(np.radians(lat))))
+                line = [[lon - dlon, lat - dlat], [lon, lat], [lon + dlon, lat + dlat]]
+                extrapolated = True
+            else:
+                line = [[lon, lat]]
+        tracks.append({"rank": rank, "name": str(vessel.get("vessel_name", "UNKNOWN")), "line": line,
+                       "fixes": fixes, "extrapolated": extrapolated})
+    return tracks
+
+
+class FigureRenderer:
+    """
+    Draws the evidence figures from already-computed layer outputs (SAR tiles and
+    slicks, backtrack density and wake path, AIS CPAs), with no recomputation.
+    SAR thumbnails and finished figures are cached on disk under content hashes, so
+    re-rendering a packet only re-embeds them. The thumbnails a thread uses are
+    collected for the artifact index (take_thumbnails).
+    """
+
+    def __init__(self, cache_dir: str = os.path.join("Forensic_Reports", "thumbnails"), size: tuple = FIGURE_SIZE):
+        self.cache_dir = cache_dir
+        self.size = size
+        os.makedirs(cache_dir, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+
+    def take_thumbnails(self):
+        """Paths of the SAR thumbnails used by this thread since the last call."""
+        paths = list(dict.fromkeys(getattr(self._local, "thumbnails", [])))
+        self._local.thumbnails = []
+        return paths
+
+    def _cached(self, kind: str, payload, draw, ext: str):
+        """
+        (path, image) of a cached raster: image is the freshly drawn array on a miss,
+        None on a hit (read it from path only if needed).
+        """
+        digest = hashlib.sha1(json.dumps([kind, FIGURE_VERSION, self.size, payload], sort_keys=True,
+                                         default=str).encode("utf-8")).hexdigest()[:24]
+        path = os.path.join(self.cache_dir, f"{kind}_{digest}.{ext}")
+        if os.path.exists(path):
+            self.hits += 1
+            return path, None
+        self.misses += 1
+        image = draw()
+        if image is None:
+            return None, None
+        # Thumbnails are mostly transparent and compress well at the fastest PNG level
+        params = [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY] if ext == "jpg" else [cv2.IMWRITE_PNG_COMPRESSION, 1]
+        ok, buffer = cv2.imencode(f".{ext}", image, params)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(buffer.tobytes())
+        os.replace(tmp_path, path)
+        return path, image
+
+    def sar_thumbnail(self, tileset_id: str, frame: MapFrame):
+        """
+        The SAR overlay resampled into the frame from its XYZ pyramid (BGRA, cached PNG).
+        """
+        meta = read_tileset(tileset_id)
+        if meta is None:
+            return None
+        west, south, east, north = frame.lonlat_bounds()
+        path, image = self._cached("sar", [tileset_id, [round(v, 9) for v in (west, south, east, north)]],
+                                   lambda: self._draw_thumbnail(tileset_id, meta, frame), "png")
+        if path is not None:
+            self._local.__dict__.setdefault("thumbnails", []).append(path)
+        if path is not None and image is None:
+            image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+        return image
+
+    def _draw_thumbnail(self, tileset_id: str, meta: dict, frame: MapFrame):
+        # Zoom whose tile pixels match the figure's, capped to the pyramid and tile budget
+        zoom = int(np.ceil(np.log2(frame.scale * 2.0 * np.pi / TILE_SIZE)))
+        zoom = int(np.clip(zoom, meta["minzoom"], meta["maxzoom"]))
+        west, south, east, north = frame.lonlat_bounds()
+        while True:
+            n = 2 ** zoom
+            tx0 = int(np.floor((west + 180.0) / 360.0 * n))
+            tx1 = int(np.floor((east + 180.0) / 360.0 * n))
+            ty0 = int(np.floor((np.pi - _mercator_y(north)) / (2.0 * np.pi) * n))
+            ty1 = int(np.floor((np.pi - _mercator_y(south)) / (2.0 * np.pi) * n))
+            if (tx1 - tx0 + 1) * (ty1 - ty0 + 1) <= MAX_THUMBNAIL_TILES or zoom <= meta["minzoom"]:
+                break
+            zoom -= 1
+
+        mosaic = np.zeros(((ty1 - ty0 + 1) * TILE_SIZE, (tx1 - tx0 + 1) * TILE_SIZE, 4), dtype=np.uint8)
+        found = False
+        for ty in range(ty0, ty1 + 1):
+            for tx in range(tx0, tx1 + 1):
+                path = tile_path(tileset_id, zoom, tx, ty)
+                if not os.path.exists(path):
+                    continue
+                tile = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+                if tile is None or tile.ndim != 3 or tile.shape[2] != 4:
+                    continue
+                r, c = (ty - ty0) * TILE_SIZE, (tx - tx0) * TILE_SIZE
+                mosaic[r:r + TILE_SIZE, c:c + TILE_SIZE] = tile
+                found = True
+        if not found:
+            return None
+
+        # Both rasters are Web Mercator, so mosaic -> figure is one scale + offset
+        mosaic_scale = TILE_SIZE * 2 ** zoom / (2.0 * np.pi)  # mosaic px per mercator unit
+        s = frame.scale / mosaic_scale
+        ox = (tx0 * TILE_SIZE / mosaic_scale - np.pi - frame.x0) * frame.scale
+        oy = (frame.y1 - (np.pi - ty0 * TILE_SIZE / mosaic_scale)) * frame.scale
+        matrix = np.float32([[s, 0, ox], [0, s, oy]])
+        return cv2.warpAffine(mosaic, matrix, (frame.width, frame.height), flags=cv2.INTER_AREA if s < 1 else cv2.INTER_LINEAR,
+                              borderMode=cv2.BORDER_CONSTANT, borderValue=0)
+
+    @staticmethod
+    def _blend(canvas: np.ndarray, bgra: np.ndarray, opacity: float = 1.0):
+        # Only the box holding visible pixels is blended; overlays cover a small part of the frame
+        x, y, w, h = cv2.boundingRect(bgra[:, :, 3])
+        if w == 0 or h == 0:
+            return
+        region, src = canvas[y:y + h, x:x + w], bgra[y:y + h, x:x + w]
+        alpha = src[:, :, 3:4].astype(np.float32) * (opacity / 255.0)
+        region[:] = (region + (src[:, :, :3] - region.astype(np.float32)) * alpha).astype(np.uint8)
+
+    @staticmethod
+    def _polylines(canvas, frame: MapFrame, lines: list, color, thickness: int, closed: bool = False):
+        pts = [np.round(frame.pixels(*np.asarray(line, dtype=np.float64).T)).astype(np.int32) for line in lines if len(line)]
+        if pts:
+            cv2.polylines(canvas, pts, closed, color, thickness, cv2.LINE_AA)
+        return pts
+
+    def _draw_slicks(self, canvas, frame: MapFrame, rings: list):
+        pts = [np.round(frame.pixels(*np.asarray(ring, dtype=np.float64).T)).astype(np.int32) for ring in rings]
+        if not pts:
+            return
+        fill = canvas.copy()
+        cv2.fillPoly(fill, pts, SLICK_BGR, cv2.LINE_AA)
+        cv2.addWeighted(fill, 0.35, canvas, 0.65, 0, dst=canvas)
+        cv2.polylines(canvas, pts, True, SLICK_BGR, 2, cv2.LINE_AA)
+
+    def _draw_density(self, canvas, frame: MapFrame, density: dict):
+        probability = np.asarray(density["probability"], dtype=np.float32)
+        if probability.size == 0 or probability.max() <= 0:
+            return
+        norm = probability / probability.max()
+        # Row 0 is the southernmost band; images grow downwards
+        heat = cv2.applyColorMap((norm[::-1] * 255).astype(np.uint8), cv2.COLORMAP_INFERNO)
+        alpha = (np.sqrt(norm[::-1]) * 200).astype(np.uint8)
+        grid = np.dstack([heat, alpha])
+        west, south, east, north = density["bounds"]
+        (x0, y0), (x1, y1) = frame.pixels([west, east], [north, south])
+        rows, cols = probability.shape
+        matrix = np.float32([[(x1 - x0) / cols, 0, x0], [0, (y1 - y0) / rows, y0]])
+        warped = cv2.warpAffine(grid, matrix, (frame.width, frame.height), flags=cv2.INTER_LINEAR,
+                                borderMode=cv2.BORDER_CONSTANT, borderValue=0)
+        self._blend(canvas, warped, 0.8)
+
+    @staticmethod
+    def _marker(canvas, point, color, label: str = None):
+        x, y = int(round(point[0])), int(round(point[1]))
+        cv2.circle(canvas, (x, y), 7, (255, 255, 255), -1, cv2.LINE_AA)
+        cv2.circle(canvas, (x, y), 5, color, -1, cv2.LINE_AA)
+        if label:
+            cv2.putText(canvas, label, (x + 10, y - 8), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 3, cv2.LINE_AA)
+            cv2.putText(canvas, label, (x + 10, y - 8), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1, cv2.LINE_AA)
+
+    def _base(self, frame: MapFrame, tileset_id: str):
+        canvas = np.empty((frame.height, frame.width, 3), dtype=np.uint8)
+        canvas[:] = SEA_BGR
+        thumbnail = self.sar_thumbnail(tileset_id, frame) if tileset_id else None
+        if thumbnail is not None:
+            self._blend(canvas, thumbnail)
+        return canvas
+
+    def sar_figure(self, sar: dict):
+        """
+        Figure 1, visual evidence: the SAR overlay with every slick outlined. JPEG path.
+        """
+        rings = slick_rings(sar)
+        tileset_id = (sar.get("tiles") or {}).get("tileset_id")
+        points = [pt for ring in rings for pt in ring] or (sar.get("bounds") or [])
+        if not points:
+            return None
+
+        def draw():
+            frame = MapFrame(_points_extent(points), self.size, pad=0.35)
+            canvas = self._base(frame, tileset_id)
+            self._draw_slicks(canvas, frame, rings)
+            return canvas
+
+        return self._cached("fig_sar", [tileset_id, rings], draw, "jpg")[0]
+
+    def backtrack_figure(self, sar: dict, physics: dict, attribution: dict):
+        """
+        Figure 2, physics and attribution: origin density, wake path, origin, slicks
+        and the attributed vessels' AIS fixes around their CPA. JPEG path.
+        """
+        rings = slick_rings(sar)
+        lines = wake_lines(physics)
+        density = physics.get("origin_density")
+        origin = physics.get("origin_point")
+        tracks = vessel_tracks(attribution)
+        tileset_id = (sar.get("tiles") or {}).get("tileset_id")
+
+        points = [pt for ring in rings for pt in ring] + [pt for line in lines for pt in line]
+        # Framed on the CPAs, not the track ends: tracks may run off the figure
+        points += [track["line"][len(track["line"]) // 2] for track in tracks]
+        if origin:
+            points.append([origin["lon"], origin["lat"]])
+        if density:
+            west, south, east, north = density["bounds"]
+            points += [[west, south], [east, north]]
+        if not points:
+            return None
+
+        def draw():
+            frame = MapFrame(_points_extent(points), self.size)
+            canvas = self._base(frame, tileset_id)
+            if density:
+                self._draw_density(canvas, frame, density)
+            self._draw_slicks(canvas, frame, rings)
+            if rings:
+                # Slicks can be a few pixels at this scale; label the largest one
+                self._marker(canvas, frame.pixels(*np.asarray(rings[0], dtype=np.float64).mean(axis=0)), SLICK_BGR, "Slick")
+            self._polylines(canvas, frame, lines, WAKE_BGR, 3)
+            for track in tracks:
+                rank = track["rank"]
+                color = VESSEL_BGR[min(rank, len(VESSEL_BGR) - 1)]
+                pts = self._polylines(canvas, frame, [track["line"]], color, 1 if track["extrapolated"] else 2)
+                # AIS fixes as dots; an extrapolated course has none and says so
+                for x, y in (np.round(frame.pixels(*np.asarray(track["fixes"], dtype=np.float64).T)).astype(np.int32)
+                             if track["fixes"] else []):
+                    cv2.circle(canvas, (int(x), int(y)), 3, color, -1, cv2.LINE_AA)
+                label = f"{rank + 1}. {track['name']}" + (" (extrapolated course)" if track["extrapolated"] else "")
+                self._marker(canvas, pts[0][len(pts[0]) // 2], color, label)
+            if origin:
+                self._marker(canvas, frame.pixels(origin["lon"], origin["lat"]), ORIGIN_BGR, "Origin")
+            return canvas
+
+        return self._cached("fig_backtrack", [tileset_id, rings, lines, density, origin, tracks], draw, "jpg")[0]
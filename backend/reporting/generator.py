@@ -1,28 +1,76 @@
 import os
 import json
+import time
+import logging
 from datetime import datetime
+from telemetry import span, observe
+
+logger = logging.getLogger("aeonblue.reporting")
+
+# Report typography. TTF faces (REPORT_FONT_PATH / REPORT_FONT_BOLD_PATH) are parsed and
+# registered once per process; the built-in Helvetica faces need no loading.
+DEFAULT_FONTS = {"regular": "Helvetica", "bold": "Helvetica-Bold"}
+
+# Evidence packets only; /reports serves this directory and nothing else
+REPORTS_DIR = os.path.join("Forensic_Reports", "reports")
+
 
 class ReportGenerator:
-    def __init__(self, output_dir: str = "Forensic_Reports"):
+    def __init__(self, output_dir: str = REPORTS_DIR):
         self.output_dir = output_dir
         if not os.path.exists(self.output_dir):
             os.makedirs(self.output_dir)
+        self.fonts = None
+        self._figures = None
+        # Per-packet render latency target; slower packets are logged
+        self.budget_ms = float(os.getenv("REPORT_BUDGET_MS", "300"))
 
-    def generate_evidence_packet(self, spill_id: str,
-                                 sar_evidence: dict, 
-                                 physics_proof: dict, 
-                                 attribution_proof: dict):
+    def cache_fingerprint(self):
+        return {"layer_version": 4, "output_dir": self.output_dir}
+
+    def load_fonts(self):
         """
-        Compiles a structured "Evidence Packet" in PDF format.
+        Resolves the report fonts once (render workers call this at startup).
         """
-        
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"AeonBlue_Evidential_Packet_{spill_id}_{timestamp}.pdf"
-        output_path = os.path.join(self.output_dir, filename)
+        if self.fonts is not None:
+            return self.fonts
+        # Embedded JPEG figures go into the PDF as binary streams; ReportLab's default
+        # ASCII85 armour is pure Python and costs more than drawing the figures
+        from reportlab import rl_config
+        rl_config.useA85 = 0
+
+        fonts = dict(DEFAULT_FONTS)
+        regular_path, bold_path = os.getenv("REPORT_FONT_PATH"), os.getenv("REPORT_FONT_BOLD_PATH")
+        if regular_path:
+            try:
+                from reportlab.pdfbase import pdfmetrics
+                from reportlab.pdfbase.ttfonts import TTFont
+
+                pdfmetrics.registerFont(TTFont("AeonBlue", regular_path))
+                fonts["regular"] = "AeonBlue"
+                if bold_path:
+                    pdfmetrics.registerFont(TTFont("AeonBlue-Bold", bold_path))
+                    fonts["bold"] = "AeonBlue-Bold"
+            except Exception as e:
+                logger.warning("[Reporting] Could not load report fonts, using Helvetica: %s", e)
+        self.fonts = fonts
+        return fonts
+
+    def packet_id(self, spill_id: str, sar_evidence: dict, physics_proof: dict, attribution_proof: dict):
+        """
+        Content address of a packet: a hash of everything it is rendered from, so it is
+        known before rendering and identical packets share one file.
+        """
+        from cache import ResultCache
+
+        return ResultCache.make_key("report", self.cache_fingerprint(), {
+            "image_id": spill_id, "sar": sar_evidence, "physics": physics_proof, "attribution": attribution_proof
+        })[:20]
 
-        print(f"[Reporting] Generating Evidence Packet: {output_path}")
-        
-        report_content = {
+    @staticmethod
+    def build_report_content(spill_id: str, sar_evidence: dict, physics_proof: dict,
+                             attribution_proof: dict, timestamp: str):
+        return {
             "title": f"Forensic Evidence Report: {spill_id}",
             "generated_at": timestamp,
             "visual_evidence": {
@@ -34,73 +82,185 @@ class ReportGenerator:
             "physics_proof": {
                 "origin_point": physics_proof['origin_point'],
                 "leak_start_time": physics_proof['leak_start_time'],
-                "wake_path_geojson": "Included as GeoJSON overlay plot in final PDF"
+                "wake_path_geojson": "Plotted in Figure 2"
             },
             "attribution_proof": {
                 "intersection_time": attribution_proof['intersection_time'],
                 "attributed_vessel": attribution_proof['attributed_vessels'][0] if attribution_proof['attributed_vessels'] else None
             }
         }
-        
-        try:
-            from reportlab.lib.pagesizes import letter
-            from reportlab.pdfgen import canvas
-            c = canvas.Canvas(output_path, pagesize=letter)
-            c.setFont("Helvetica-Bold", 16)
-            c.drawString(50, 750, report_content["title"])
-            c.setFont("Helvetica", 12)
-            c.drawString(50, 730, f"Generated At: {report_content['generated_at']}")
-            
-            y = 700
-            c.setFont("Helvetica-Bold", 14)
-            c.drawString(50, y, "Visual Evidence (SAR)")
-            y -= 20
-            c.setFont("Helvetica", 12)
-            c.drawString(50, y, f"SAR Image ID: {report_content['visual_evidence']['sar_image_id']}")
+
+    def _summary_page(self, c, fonts, report_content: dict):
+        c.setFont(fonts["bold"], 16)
+        c.drawString(50, 750, report_content["title"])
+        c.setFont(fonts["regular"], 12)
+        c.drawString(50, 730, f"Generated At: {report_content['generated_at']}")
+
+        y = 700
+        c.setFont(fonts["bold"], 14)
+        c.drawString(50, y, "Visual Evidence (SAR)")
+        y -= 20
+        c.setFont(fonts["regular"], 12)
+        c.drawString(50, y, f"SAR Image ID: {report_content['visual_evidence']['sar_image_id']}")
+        y -= 15
+        c.drawString(50, y, f"Total Area (m2): {report_content['visual_evidence']['total_area_m2']}")
+        y -= 15
+        c.drawString(50, y, f"Est Volume (Liters): {report_content['visual_evidence']['estimated_volume_liters']}")
+
+        y -= 30
+        c.setFont(fonts["bold"], 14)
+        c.drawString(50, y, "Physics Proof (Lagrangian Backtracking)")
+        y -= 20
+        c.setFont(fonts["regular"], 12)
+        c.drawString(50, y, f"Origin Point: {report_content['physics_proof']['origin_point']}")
+        y -= 15
+        c.drawString(50, y, f"Leak Start Time: {report_content['physics_proof']['leak_start_time']}")
+        y -= 15
+        c.drawString(50, y, f"Wake Path: {report_content['physics_proof']['wake_path_geojson']}")
+
+        y -= 30
+        c.setFont(fonts["bold"], 14)
+        c.drawString(50, y, "Attribution Proof (AIS Intersection)")
+        y -= 20
+        c.setFont(fonts["regular"], 12)
+        c.drawString(50, y, f"Intersection Time: {report_content['attribution_proof']['intersection_time']}")
+
+        vessel = report_content['attribution_proof']['attributed_vessel']
+        if vessel:
+            y -= 15
+            c.drawString(50, y, f"Vessel Name: {vessel.get('vessel_name', 'Unknown')}")
             y -= 15
-            c.drawString(50, y, f"Total Area (m2): {report_content['visual_evidence']['total_area_m2']}")
+            c.drawString(50, y, f"MMSI/IMO: {vessel.get('mmsi', 'Unknown')} / {vessel.get('imo_number', 'Unknown')}")
             y -= 15
-            c.drawString(50, y, f"Est Volume (Liters): {report_content['visual_evidence']['estimated_volume_liters']}")
-            
-            y -= 30
-            c.setFont("Helvetica-Bold", 14)
-            c.drawString(50, y, "Physics Proof (Lagrangian Backtracking)")
-            y -= 20
-            c.setFont("Helvetica", 12)
-            c.drawString(50, y, f"Origin Point: {report_content['physics_proof']['origin_point']}")
+            c.drawString(50, y, f"Speed: {vessel.get('speed_knots', 0)} knots")
             y -= 15
-            c.drawString(50, y, f"Leak Start Time: {report_content['physics_proof']['leak_start_time']}")
-            
-            y -= 30
-            c.setFont("Helvetica-Bold", 14)
-            c.drawString(50, y, "Attribution Proof (AIS Intersection)")
-            y -= 20
-            c.setFont("Helvetica", 12)
-            c.drawString(50, y, f"Intersection Time: {report_content['attribution_proof']['intersection_time']}")
-            
-            vessel = report_content['attribution_proof']['attributed_vessel']
-            if vessel:
-                y -= 15
-                c.drawString(50, y, f"Vessel Name: {vessel.get('vessel_name', 'Unknown')}")
-                y -= 15
-                c.drawString(50, y, f"MMSI/IMO: {vessel.get('mmsi', 'Unknown')} / {vessel.get('imo_number', 'Unknown')}")
-                y -= 15
-                c.drawString(50, y, f"Speed: {vessel.get('speed_knots', 0)} knots")
-                y -= 15
-                c.drawString(50, y, f"Confidence: {vessel.get('probability_score_percent', 'N/A')}%")
-            else:
-                y -= 15
-                c.drawString(50, y, "No exact vessel correlation within timeframe.")
-            
+            c.drawString(50, y, f"Confidence: {vessel.get('probability_score_percent', 'N/A')}%")
+        else:
+            y -= 15
+            c.drawString(50, y, "No exact vessel correlation within timeframe.")
+
+    def _figure(self, c, path: str, y_top: float):
+        """Draws a cached figure full width below y_top; returns the y under it."""
+        from .figures import FIGURE_SIZE
+
+        width = 512.0
+        height = width * FIGURE_SIZE[1] / FIGURE_SIZE[0]
+        c.drawImage(path, 50, y_top - height, width=width, height=height)
+        return y_top - height
+
+    def _sar_page(self, c, fonts, sar_evidence: dict):
+        c.setFont(fonts["bold"], 14)
+        c.drawString(50, 750, "Figure 1. Visual Evidence: SAR Overlay and Detected Slicks")
+        with span("report.figure", figure="sar"):
+            path = self.figures().sar_figure(sar_evidence)
+        y = self._figure(c, path, 735) - 20 if path else 715
+        c.setFont(fonts["regular"], 10)
+        c.drawString(50, y, "Feathered Sentinel-1 overlay; detected slicks outlined in red.")
+
+        features = (sar_evidence.get("slicks") or {}).get("features") or []
+        y -= 25
+        c.setFont(fonts["bold"], 11)
+        c.drawString(50, y, f"Detected slicks: {len(features)}")
+        c.setFont(fonts["regular"], 10)
+        for feature in features[:12]:
+            props = feature["properties"]
+            y -= 14
+            c.drawString(60, y, f"#{props.get('slick_id')}: {props.get('area_m2', 0):,.1f} m2, "
+                                f"{props.get('volume_liters', 0):,.2f} L ({props.get('oil_pixels', 0)} px)")
+        return path
+
+    def _backtrack_page(self, c, fonts, sar_evidence: dict, physics_proof: dict, attribution_proof: dict):
+        c.setFont(fonts["bold"], 14)
+        c.drawString(50, 750, "Figure 2. Physics and Attribution: Backtrack and AIS Tracks")
+        with span("report.figure", figure="backtrack"):
+            path = self.figures().backtrack_figure(sar_evidence, physics_proof, attribution_proof)
+        y = self._figure(c, path, 735) - 20 if path else 715
+        c.setFont(fonts["regular"], 10)
+        spread = (physics_proof.get("origin_density") or {}).get("spread_m")
+        c.drawString(50, y, "Origin probability density (heat), ensemble-mean wake path (cyan), origin (amber),")
+        y -= 12
+        c.drawString(50, y, "slicks (red) and each vessel's AIS fixes (dots) around its closest point of approach."
+                            + (f" Ensemble spread: {spread:,.0f} m." if spread else ""))
+        y -= 12
+        c.drawString(50, y, "Lines marked \"extrapolated course\" are projected from the CPA heading and speed, not AIS fixes.")
+
+        y -= 25
+        c.setFont(fonts["bold"], 11)
+        c.drawString(50, y, "Attributed vessels")
+        c.setFont(fonts["regular"], 10)
+        for rank, vessel in enumerate((attribution_proof.get("attributed_vessels") or [])[:10]):
+            y -= 14
+            c.drawString(60, y, f"{rank + 1}. {vessel.get('vessel_name', 'Unknown')} (MMSI {vessel.get('mmsi', '?')}): "
+                                f"CPA {vessel.get('distance_to_origin_m', '?')} m at {vessel.get('speed_knots', 0)} kn, "
+                                f"{vessel.get('probability_score_percent', 'N/A')}%"
+                                + (" [synthetic, no AIS match; not plotted]" if vessel.get("synthetic") else ""))
+        return path
+
+    def figures(self):
+        if self._figures is None:
+            from .figures import FigureRenderer
+
+            self._figures = FigureRenderer()
+        return self._figures
+
+    def generate_evidence_packet(self, spill_id: str,
+                                 sar_evidence: dict,
+                                 physics_proof: dict,
+                                 attribution_proof: dict,
+                                 timestamp: str = None):
+        """
+        Compiles a structured "Evidence Packet" in PDF format.
+        The PDF is named by packet_id, written next to its final name and renamed into
+        place, so the /reports static route never serves a half-written packet.
+        """
+
+        timestamp = timestamp or datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"{self.packet_id(spill_id, sar_evidence, physics_proof, attribution_proof)}.pdf"
+        output_path = os.path.join(self.output_dir, filename)
+        tmp_path = f"{output_path}.{os.getpid()}.part"
+
+        logger.info("[Reporting] Generating Evidence Packet: %s", output_path)
+
+        report_content = self.build_report_content(spill_id, sar_evidence, physics_proof, attribution_proof, timestamp)
+        fonts = self.load_fonts()
+
+        started = time.perf_counter()
+        figures = []
+        self.figures().take_thumbnails()
+        try:
+            from reportlab.lib.pagesizes import letter
+            from reportlab.pdfgen import canvas
+            c = canvas.Canvas(tmp_path, pagesize=letter)
+            # One page at a time: each page's figure is produced (or fetched from the
+            # figure cache) only when that page is drawn
+            pages = [
+                lambda: self._summary_page(c, fonts, report_content),
+                lambda: self._sar_page(c, fonts, sar_evidence),
+                lambda: self._backtrack_page(c, fonts, sar_evidence, physics_proof, attribution_proof)
+            ]
+            for draw_page in pages:
+                figure = draw_page()
+                if figure:
+                    figures.append(figure)
+                c.showPage()
             c.save()
         except Exception as e:
-            print(f"[Reporting] Could not generate actual PDF: {e}")
-            with open(output_path, 'w') as f:
+            logger.warning("[Reporting] Could not generate actual PDF: %s", e)
+            with open(tmp_path, 'w') as f:
                 f.write(json.dumps(report_content, indent=4))
-        
-        print(f"[Reporting] Packet assembly complete. Saved as {filename}")
-        
+        os.replace(tmp_path, output_path)
+        # SAR thumbnails drawn or read for the figures are indexed with them
+        figures += self.figures().take_thumbnails()
+
+        elapsed_s = time.perf_counter() - started
+        observe("aeonblue_span_seconds", elapsed_s, span="report.pdf_render")
+        elapsed_ms = elapsed_s * 1000.0
+        if elapsed_ms > self.budget_ms:
+            logger.warning("[Reporting] WARNING: packet took %.0f ms (budget %.0f ms)", elapsed_ms, self.budget_ms)
+        logger.info("[Reporting] Packet assembly complete. Saved as %s", filename)
+
         return {
             "report_path": filename,
-            "report_summary": report_content
+            "report_summary": report_content,
+            "figures": figures
         }
@@ -0,0 +1,300 @@
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import threading
+import logging
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import telemetry
+from cache import ResultCache
+from .generator import ReportGenerator, REPORTS_DIR
+
+logger = logging.getLogger("aeonblue.reporting")
+
+# Generator of the current render worker, built once by init_render_worker
+_generator = None
+
+# Warm-up rounds before giving up on workers no task has reached
+WARM_UP_ROUNDS = 8
+
+
+def init_render_worker(output_dir: str, pool_process: bool = False):
+    """
+    Render-pool initializer: builds the generator and loads its fonts once per worker.
+    """
+    global _generator
+    if pool_process:
+        telemetry.mark_worker()
+        telemetry.install_log_queue()
+    _generator = ReportGenerator(output_dir)
+    _generator.load_fonts()
+    logger.info("[Reporting] Render worker %s ready.", os.getpid())
+
+
+def render_packet(output_dir: str, spill_id: str, sar_evidence: dict, physics_proof: dict,
+                  attribution_proof: dict, timestamp: str):
+    if _generator is None or _generator.output_dir != output_dir:
+        init_render_worker(output_dir)
+    return _generator.generate_evidence_packet(spill_id, sar_evidence, physics_proof, attribution_proof, timestamp)
+
+
+def warm_render_worker(output_dir: str, delay_s: float = 0.0):
+    """
+    Imports ReportLab and the figure renderer ahead of the first packet.
+    Returns the pid; holding each task briefly spreads them over distinct workers.
+    """
+    if _generator is None or _generator.output_dir != output_dir:
+        init_render_worker(output_dir)
+    import reportlab.pdfgen.canvas
+    _generator.figures()
+    time.sleep(delay_s)
+    return os.getpid()
+
+
+class ReportStore:
+    """
+    SQLite record of queued packets (table `reports` in the jobs database by default,
+    REPORT_QUEUE_DB): the entry served by GET /report-queue/{id}, and for pending
+    packets the inputs needed to queue them again after a restart.
+    """
+
+    def __init__(self, db_path: str):
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS reports (
+                    report_id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    entry TEXT NOT NULL,
+                    inputs TEXT,
+                    updated_at REAL NOT NULL
+                )""")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS reports_status ON reports (status)")
+
+    def put(self, entry: dict, inputs: dict = None):
+        # Inputs are only kept while the packet is pending
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO reports VALUES (?, ?, ?, ?, ?)",
+                               (entry["report_id"], entry["status"], json.dumps(entry),
+                                json.dumps(inputs) if inputs is not None else None, time.time()))
+
+    def get(self, report_id: str):
+        with self._lock:
+            row = self._conn.execute("SELECT entry FROM reports WHERE report_id = ?", (report_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def pending(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT entry, inputs FROM reports WHERE status = 'pending' ORDER BY updated_at").fetchall()
+        return [(json.loads(entry), json.loads(inputs)) for entry, inputs in rows if inputs is not None]
+
+
+class ReportQueue:
+    """
+    Renders evidence packets in the background on a pool of warm render workers
+    (REPORT_WORKERS, default 2; 0 renders on threads in-process). `submit` returns
+    the packet's URL immediately with status "pending"; GET /report-queue/{report_id}
+    reports when it is "ready". Packets are cached on their inputs like the other layers,
+    and identical packets already being rendered are shared. Finished packets and their
+    figures are indexed in the artifact store, if one is given.
+    Entries are persisted in a ReportStore and only pending ones stay in memory;
+    packets still pending at shutdown are queued again by the next start().
+    """
+
+    def __init__(self, output_dir: str = REPORTS_DIR, workers: int = None, artifacts=None, db_path: str = None):
+        if workers is None:
+            workers = int(os.getenv("REPORT_WORKERS", "2"))
+        self.workers = workers
+        self.generator = ReportGenerator(output_dir)
+        self.output_dir = output_dir
+        self.cache = ResultCache()
+        self.artifacts = artifacts
+        self.store = ReportStore(db_path or os.getenv("REPORT_QUEUE_DB", os.getenv("JOBS_DB", "Forensic_Reports/jobs.sqlite")))
+        self.pool = None
+        self._reports = {}  # pending entries only
+        self._lock = threading.Lock()
+        self._finished_cond = threading.Condition(self._lock)
+        self.rendered = 0
+        self.failed = 0
+        self.readiness = {"status": "cold"}
+
+    def start(self):
+        if self.workers > 0:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=init_render_worker,
+                                            initargs=(self.output_dir, True))
+        else:
+            self.pool = ThreadPoolExecutor(max_workers=2)
+        logger.info("[Reporting] Render queue started (%s workers).", self.workers or 'in-process')
+        # Packets queued before the last shutdown (or crash) render again
+        recovered = self.store.pending()
+        for entry, inputs in recovered:
+            self._render(entry, inputs)
+        if recovered:
+            logger.info("[Reporting] Re-queued %s unfinished packets.", len(recovered))
+
+    async def warm_up(self):
+        """Warms every render worker; called by the pipeline's background warm-up."""
+        if self.pool is None:
+            self.start()
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        tasks, delay_s = (self.workers, 0.2) if self.workers > 0 else (1, 0.0)
+        self.readiness = {"status": "warming"}
+        pids = set()
+        try:
+            # Rounds repeat, holding their tasks longer, until every worker has answered
+            for round_ in range(WARM_UP_ROUNDS):
+                pids.update(await asyncio.gather(*[
+                    loop.run_in_executor(self.pool, warm_render_worker, self.output_dir, delay_s * 2 ** round_)
+                    for _ in range(tasks)
+                ]))
+                if len(pids) >= tasks:
+                    break
+        except Exception as e:
+            logger.warning("[Reporting] Warm-up failed: %s", e)
+            self.readiness = {"status": "failed", "error": str(e)}
+            return
+        if len(pids) < tasks:
+            logger.warning("[Reporting] Warm-up reached %s of %s render workers.", len(pids), tasks)
+            self.readiness = {"status": "partial", "workers": len(pids)}
+            return
+        self.readiness = {"status": "warm", "workers": len(pids), "seconds": round(time.perf_counter() - started, 3)}
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+
+    def _exists(self, result: dict):
+        return os.path.exists(os.path.join(self.output_dir, result["report_path"]))
+
+    def submit(self, spill_id: str, sar_evidence: dict, physics_proof: dict, attribution_proof: dict):
+        """
+        Queues one packet and returns its entry: report_id, report_path, report_url,
+        status ("pending" / "ready" / "failed") and the text summary, which is known
+        before the PDF exists.
+        """
+        if self.pool is None:
+            self.start()
+        inputs = {"image_id": spill_id, "sar": sar_evidence, "physics": physics_proof, "attribution": attribution_proof}
+        key = self.cache.make_key("report", self.generator.cache_fingerprint(), inputs)
+        report_id = key[:20]  # == generator.packet_id(...), the PDF's content address
+
+        with self._lock:
+            entry = self._reports.get(report_id)
+            if entry is not None:
+                return dict(entry)
+        entry = self.store.get(report_id)
+        if entry is not None and entry["status"] == "ready" and self._exists(entry):
+            return entry
+
+        cached = self.cache.get("report", key, validate=self._exists) if self.cache.enabled else None
+        if cached is not None:
+            logger.info("[Cache] report hit (%s)", key[:12])
+            entry = {"report_id": report_id, "report_path": cached["report_path"],
+                     "report_url": f"/reports/{cached['report_path']}", "status": "ready",
+                     "report_summary": cached["report_summary"]}
+            self.store.put(entry)
+            self._index(report_id, spill_id, cached)
+            return dict(entry)
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"{report_id}.pdf"
+        entry = {
+            "report_id": report_id,
+            "report_path": filename,
+            "report_url": f"/reports/{filename}",
+            "status": "pending",
+            "report_summary": ReportGenerator.build_report_content(
+                spill_id, sar_evidence, physics_proof, attribution_proof, timestamp)
+        }
+        inputs = dict(inputs, key=key, timestamp=timestamp)
+        self.store.put(entry, inputs)
+        return self._render(entry, inputs)
+
+    def _render(self, entry: dict, inputs: dict):
+        report_id = entry["report_id"]
+        pool = self.pool
+        if pool is None:
+            # Shut down between submit() and here; the stored pending entry renders on the next start()
+            raise RuntimeError(f"Render queue is shut down; report {report_id} stays queued until it restarts")
+        with self._lock:
+            self._reports[report_id] = entry
+        future = pool.submit(telemetry.run_instrumented, render_packet, (
+            self.output_dir, inputs["image_id"], inputs["sar"], inputs["physics"], inputs["attribution"],
+            inputs["timestamp"]))
+        future.add_done_callback(lambda f: self._finished(dict(entry), inputs["image_id"], inputs["key"], f))
+        return dict(entry)
+
+    def submit_many(self, packets: list):
+        """
+        Bulk mode: queues many packets (dicts with spill_id, sar, physics, attribution)
+        at once; they render in parallel across the pool.
+        """
+        return [self.submit(p["spill_id"], p["sar"], p["physics"], p["attribution"]) for p in packets]
+
+    def _index(self, report_id: str, spill_id: str, result: dict):
+        if self.artifacts is None:
+            return
+        self.artifacts.register("report", report_id, os.path.join(self.output_dir, result["report_path"]),
+                                case_id=spill_id, meta={"generated_at": result["report_summary"].get("generated_at")})
+        for path in result.get("figures") or []:
+            self.artifacts.register("figure", os.path.splitext(os.path.basename(path))[0], path, case_id=spill_id)
+
+    def _finished(self, entry: dict, spill_id: str, key: str, future):
+        if future.cancelled():
+            return  # shut down first: still pending in the store, queued again on start
+        report_id = entry["report_id"]
+        try:
+            result, delta = future.result()
+            telemetry.merge(delta)
+        except Exception as e:
+            logger.warning("[Reporting] Packet %s failed: %s", report_id, e)
+            entry.update(status="failed", error=str(e))
+            self.store.put(entry)
+            with self._lock:
+                self.failed += 1
+                self._reports.pop(report_id, None)
+                self._finished_cond.notify_all()
+            return
+        entry.update(status="ready", report_path=result["report_path"])
+        self.store.put(entry)
+        with self._lock:
+            self.rendered += 1
+            self._reports.pop(report_id, None)
+            self._finished_cond.notify_all()
+        stored = {"report_path": entry["report_path"], "report_summary": entry["report_summary"],
+                  "figures": result.get("figures") or []}
+        self._index(report_id, spill_id, stored)
+        if self.cache.enabled:
+            self.cache.put("report", key, stored)
+
+    def wait(self, report_ids: list = None, timeout: float = None):
+        """
+        Blocks until the given (or all) queued packets are no longer pending. Used by bulk runs.
+        """
+        with self._finished_cond:
+            ids = list(report_ids or self._reports)
+            if not self._finished_cond.wait_for(lambda: not any(i in self._reports for i in ids), timeout):
+                raise TimeoutError("report rendering did not finish in time")
+        return [entry for entry in map(self.status, ids) if entry is not None]
+
+    def status(self, report_id: str):
+        with self._lock:
+            entry = self._reports.get(report_id)
+            if entry is not None:
+                return dict(entry)
+        return self.store.get(report_id)
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._reports)
+        return {"workers": self.workers, "pending": pending, "rendered": self.rendered, "failed": self.failed}
@@ -0,0 +1,259 @@
+import os
+import sys
+import time
+import sqlite3
+import threading
+import logging
+import numpy as np
+import cv2
+
+logger = logging.getLogger("aeonblue.sar")
+
+CATALOG_VERSION = 1
+# Rows written per transaction by a refresh, and how long its lease keeps other
+# processes from starting one (renewed with every batch)
+REFRESH_BATCH = 500
+REFRESH_LEASE_S = 600.0
+
+
+class MaskCatalog:
+    """
+    SQLite index of the Zenodo mask archive, so requests never list the directory or
+    decode TIFs just to find a usable mask.
+
+    One row per mask with its path, size/mtime, dimensions, oil pixel count, oil
+    bounding box and contour statistics. refresh() scans the archive and only decodes
+    files that are new or whose size/mtime changed; removed files are dropped.
+    Overwriting a mask in place leaves the directory mtime alone, so the per-file
+    stat sweep also runs every `sweep_interval_s` (MASK_CATALOG_SWEEP_S, default 300).
+    A refresh commits every REFRESH_BATCH rows, so readers and other writers never
+    wait on a whole sweep, and a lease in `meta` keeps it to one process at a time.
+    """
+
+    def __init__(self, db_path: str, mask_dir: str, sweep_interval_s: float = None):
+        self.db_path = db_path
+        self.mask_dir = mask_dir
+        self.sweep_interval_s = (sweep_interval_s if sweep_interval_s is not None
+                                 else float(os.getenv("MASK_CATALOG_SWEEP_S", "300")))
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        # Long timeout: a worker waits for another worker's refresh instead of failing
+        self._conn = sqlite3.connect(db_path, timeout=3600, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS masks (
+                image_id TEXT PRIMARY KEY,
+                path TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                width INTEGER NOT NULL,
+                height INTEGER NOT NULL,
+                oil_pixels INTEGER NOT NULL,
+                bbox_x0 INTEGER, bbox_y0 INTEGER, bbox_x1 INTEGER, bbox_y1 INTEGER,
+                contour_count INTEGER NOT NULL,
+                largest_contour_area REAL NOT NULL,
+                largest_contour_perimeter REAL NOT NULL
+            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS masks_oil ON masks (oil_pixels)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._refresher = None
+
+    def _meta(self, key: str):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else None
+
+    def _archive_state(self):
+        # Adding, removing or renaming files changes the directory's own mtime
+        return f"{CATALOG_VERSION}:{os.path.abspath(self.mask_dir)}:{os.stat(self.mask_dir).st_mtime}"
+
+    def is_built(self):
+        return self._meta("archive_state") is not None
+
+    def is_current(self):
+        if not os.path.isdir(self.mask_dir) or self._meta("archive_state") != self._archive_state():
+            return False
+        return time.time() - float(self._meta("swept_at") or 0) < self.sweep_interval_s
+
+    @staticmethod
+    def describe_mask(path: str):
+        """
+        Decodes one mask and returns its catalog statistics (None if unreadable).
+        """
+        mask = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if mask is None:
+            return None
+        binary = (mask > 0).astype(np.uint8)
+        h, w = binary.shape
+        oil_pixels = int(np.count_nonzero(binary))
+        stats = {"width": w, "height": h, "oil_pixels": oil_pixels,
+                 "bbox_x0": None, "bbox_y0": None, "bbox_x1": None, "bbox_y1": None,
+                 "contour_count": 0, "largest_contour_area": 0.0, "largest_contour_perimeter": 0.0}
+        if oil_pixels:
+            x, y, bw, bh = cv2.boundingRect(binary)
+            stats.update(bbox_x0=x, bbox_y0=y, bbox_x1=x + bw, bbox_y1=y + bh)
+            contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            if contours:
+                largest = max(contours, key=cv2.contourArea)
+                stats.update(contour_count=len(contours),
+                             largest_contour_area=float(cv2.contourArea(largest)),
+                             largest_contour_perimeter=float(cv2.arcLength(largest, True)))
+        return stats
+
+    def refresh(self, force: bool = False, wait: bool = False):
+        """
+        Incrementally brings the catalog in line with the archive. Cheap (one stat)
+        when nothing was added or removed since the last refresh and the last sweep
+        is recent. If another process is refreshing, returns at once, or with `wait`
+        polls until it is done.
+        """
+        if not os.path.isdir(self.mask_dir):
+            return 0
+        if not force and self.is_current():
+            return 0
+        while True:
+            claim = self._claim(force)
+            if claim == "current":
+                return 0
+            if claim == "claimed":
+                break
+            if not wait:
+                return 0
+            time.sleep(1.0)
+        try:
+            return self._sweep()
+        except BaseException:
+            self._write([], [], {"refresh_lease": None})
+            raise
+
+    def refresh_in_background(self):
+        """
+        Starts refresh() on a daemon thread (with its own connection) if the catalog is
+        stale and no refresh is running; lookups meanwhile read the catalog as it is.
+        """
+        if (self._refresher is not None and self._refresher.is_alive()) or self.is_current():
+            return
+        self._refresher = threading.Thread(target=self._refresh_detached, name="mask-catalog-refresh", daemon=True)
+        self._refresher.start()
+
+    def _refresh_detached(self):
+        catalog = MaskCatalog(self.db_path, self.mask_dir, self.sweep_interval_s)
+        try:
+            catalog.refresh()
+        except Exception:
+            logger.exception("[Mask Catalog] Background refresh of %s failed.", self.mask_dir)
+        finally:
+            catalog._conn.close()
+
+    def _claim(self, force: bool):
+        """Takes the refresh lease: "claimed", "current" (nothing to do) or "busy"."""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have refreshed while we waited for the write lock
+            if not force and self.is_current():
+                return "current"
+            lease = self._meta("refresh_lease")
+            if lease is not None and float(lease) > time.time():
+                return "busy"
+            self._set_meta("refresh_lease", time.time() + REFRESH_LEASE_S)
+            return "claimed"
+        finally:
+            self._conn.execute("COMMIT")
+
+    def _set_meta(self, key: str, value):
+        if value is None:
+            self._conn.execute("DELETE FROM meta WHERE key = ?", (key,))
+        else:
+            self._conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, str(value)))
+
+    def _write(self, rows: list, removed: list, meta: dict):
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO masks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self._conn.executemany("DELETE FROM masks WHERE image_id = ?", removed)
+            for key, value in meta.items():
+                self._set_meta(key, value)
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def _sweep(self):
+        started = time.time()
+        # The state the sweep starts from: files added while it runs trigger the next one
+        archive_state = self._archive_state()
+        known = {row["image_id"]: (row["size"], row["mtime"])
+                 for row in self._conn.execute("SELECT image_id, size, mtime FROM masks")}
+        seen = set()
+        rows = []
+        updated = 0
+        with os.scandir(self.mask_dir) as entries:
+            for entry in entries:
+                if not entry.is_file() or not entry.name.lower().endswith(".tif"):
+                    continue
+                image_id = os.path.splitext(entry.name)[0]
+                stat = entry.stat()
+                seen.add(image_id)
+                if known.get(image_id) == (stat.st_size, stat.st_mtime):
+                    continue
+                stats = self.describe_mask(entry.path)
+                if stats is None:
+                    continue
+                rows.append((image_id, entry.path, stat.st_size, stat.st_mtime, stats["width"], stats["height"],
+                             stats["oil_pixels"], stats["bbox_x0"], stats["bbox_y0"], stats["bbox_x1"],
+                             stats["bbox_y1"], stats["contour_count"], stats["largest_contour_area"],
+                             stats["largest_contour_perimeter"]))
+                if len(rows) >= REFRESH_BATCH:
+                    self._write(rows, [], {"refresh_lease": time.time() + REFRESH_LEASE_S})
+                    updated += len(rows)
+                    rows = []
+                    logger.info("[Mask Catalog] Indexed %s masks...", updated)
+        removed = [(image_id,) for image_id in known if image_id not in seen]
+        self._write(rows, removed, {"archive_state": archive_state, "swept_at": started, "refresh_lease": None})
+        updated += len(rows)
+        logger.info("[Mask Catalog] Refreshed %s: %s indexed, %s removed in %.1fs.",
+                    self.mask_dir, updated, len(removed), time.time() - started)
+        return updated
+
+    def lookup(self, image_id: str):
+        row = self._conn.execute("SELECT * FROM masks WHERE image_id = ?", (image_id,)).fetchone()
+        return dict(row) if row else None
+
+    def count_with_oil(self, min_oil_pixels: int):
+        return self._conn.execute("SELECT COUNT(*) FROM masks WHERE oil_pixels > ?",
+                                  (min_oil_pixels,)).fetchone()[0]
+
+    def with_oil(self, min_oil_pixels: int, limit: int = 100, offset: int = 0):
+        rows = self._conn.execute(
+            "SELECT * FROM masks WHERE oil_pixels > ? ORDER BY oil_pixels LIMIT ? OFFSET ?",
+            (min_oil_pixels, limit, offset)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def random_with_oil(self, min_oil_pixels: int, rng=None):
+        """
+        Random mask with more than `min_oil_pixels` oil pixels: the first match at or
+        after a random rowid, a seek on the rowid rather than an OFFSET scan. Masks
+        that follow a run of deleted rows or masks without oil are picked more often.
+        """
+        low, high = self._conn.execute("SELECT MIN(rowid), MAX(rowid) FROM masks").fetchone()
+        if low is None:
+            return None
+        start = int((rng or np.random.default_rng()).integers(low, high + 1))
+        query = "SELECT * FROM masks WHERE oil_pixels > ? AND rowid {} ? ORDER BY rowid {} LIMIT 1"
+        row = (self._conn.execute(query.format(">=", "ASC"), (min_oil_pixels, start)).fetchone()
+               or self._conn.execute(query.format("<", "DESC"), (min_oil_pixels, start)).fetchone())
+        return dict(row) if row else None
+
+
+if __name__ == "__main__":
+    # python -m sar_processing.catalog <mask_dir> [catalog_path]
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if len(sys.argv) < 2:
+        print("Usage: python -m sar_processing.catalog <mask_dir> [catalog_path]")
+        sys.exit(1)
+    catalog_path = sys.argv[2] if len(sys.argv) > 2 else os.getenv("MASK_CATALOG_PATH", "DataSet/Mask/mask_catalog.sqlite")
+    catalog = MaskCatalog(catalog_path, sys.argv[1])
+    catalog.refresh(force=True)
+    print(f"[Mask Catalog] {catalog.count_with_oil(100)} masks with > 100 oil pixels.")
@@ -0,0 +1,93 @@
+import os
+import threading
+import numpy as np
+import cv2
+
+
+class OverlayCompositor:
+    """
+    Builds the feathered BGRA SAR overlay for a binary oil mask with a fixed set of
+    reusable buffers. Buffers are per thread, so one compositor can serve the
+    pipeline's threads; a buffer larger than `buffer_cap_mb`
+    (COMPOSITOR_BUFFER_CAP_MB, default 256) is allocated for the call and not kept.
+
+    Alpha is zero further than `fade_px` from any oil pixel, so noise, blur, distance
+    transform and fade are only computed inside the oil bounding box dilated by
+    `fade_px`; the rest of the overlay stays transparent zeros. All intermediate
+    work is uint8/float32 and lands directly in the BGRA output buffer.
+    """
+
+    def __init__(self, fade_px: float = 400.0, seed: int = None, buffer_cap_mb: float = None):
+        self.fade_px = fade_px
+        self.seed = seed
+        cap_mb = buffer_cap_mb if buffer_cap_mb is not None else float(os.getenv("COMPOSITOR_BUFFER_CAP_MB", "256"))
+        self.buffer_cap_bytes = int(cap_mb * 1024 * 1024)
+        self._local = threading.local()
+
+    def _buffer(self, name: str, shape: tuple, dtype):
+        # Grow-only backing store per thread and buffer name; callers get a view of the needed size
+        size = int(np.prod(shape))
+        if size * np.dtype(dtype).itemsize > self.buffer_cap_bytes:
+            return np.empty(shape, dtype=dtype)  # oversized scene: freed with the result
+        buffers = self._local.__dict__.setdefault("buffers", {})
+        backing = buffers.get(name)
+        if backing is None or backing.dtype != dtype or backing.size < size:
+            backing = np.empty(size, dtype=dtype)
+            buffers[name] = backing
+        return backing[:size].reshape(shape)
+
+    def composite(self, mask: np.ndarray, seed: int = None):
+        """
+        Returns the (h, w, 4) uint8 BGRA overlay for a uint8 0/255 mask. The speckle is
+        drawn from `seed` (else the compositor's), so a given mask and seed always give
+        the same overlay, and hence the same tileset id. The array is a
+        reused buffer: it is only valid until the next call on this compositor from the
+        same thread.
+        """
+        h, w = mask.shape
+        bgra = self._buffer("bgra", (h, w, 4), np.uint8)
+        bgra.fill(0)
+
+        x, y, bw, bh = cv2.boundingRect(mask)
+        if bw == 0 or bh == 0:
+            return bgra  # no oil: fully transparent, as the distance fade would give
+
+        # The 3x3 chamfer distance underestimates true distance by up to ~5%, so the
+        # fade can reach slightly past fade_px; +2 px more keeps the blur edge hidden
+        margin = int(np.ceil(self.fade_px * 1.06)) + 2
+        r0, r1 = max(0, y - margin), min(h, y + bh + margin)
+        c0, c1 = max(0, x - margin), min(w, x + bw + margin)
+        shape = (r1 - r0, c1 - c0)
+        roi_mask = mask[r0:r1, c0:c1]
+        oil = roi_mask > 0
+
+        # Backscatter: water speckle (120 +- 25) everywhere, dampened oil (35 +- 8) on the slick
+        rng = np.random.default_rng(self.seed if seed is None else seed)
+        level = self._buffer("level", shape, np.float32)
+        rng.standard_normal(dtype=np.float32, out=level)
+        level *= 25.0
+        level += 120.0
+        level[oil] = rng.standard_normal(int(np.count_nonzero(oil)), dtype=np.float32) * 8.0 + 35.0
+        np.clip(level, 0, 255, out=level)
+        gray = self._buffer("gray", shape, np.uint8)
+        np.copyto(gray, level, casting="unsafe")
+
+        # Slightly blur the boundaries to make the oil blending feel organic
+        blurred = self._buffer("blurred", shape, np.uint8)
+        cv2.GaussianBlur(gray, (3, 3), 0, dst=blurred)
+
+        # Distance field from the oil contour, faded to full transparency at fade_px
+        inverted = self._buffer("inverted", shape, np.uint8)
+        cv2.bitwise_not(roi_mask, dst=inverted)
+        dist = self._buffer("dist", shape, np.float32)
+        cv2.distanceTransform(inverted, cv2.DIST_L2, 3, dst=dist)
+        dist *= -255.0 / self.fade_px
+        dist += 255.0
+        np.clip(dist, 0, 255, out=dist)
+
+        out = bgra[r0:r1, c0:c1]
+        out[:, :, 0] = blurred
+        out[:, :, 1] = blurred
+        out[:, :, 2] = blurred
+        np.copyto(out[:, :, 3], dist, casting="unsafe")
+        return bgra
@@ -0,0 +1,358 @@
+import os
+import time
+import threading
+import queue
+import logging
+from abc import ABC, abstractmethod
+from concurrent.futures import Future
+from multiprocessing.managers import BaseManager
+import numpy as np
+
+from .scene import SceneSource, iter_tiles, calibrate_to_sigma0_db
+
+logger = logging.getLogger("aeonblue.sar")
+
+# Model input edge (Attention U-Net++ export) and the context each tile carries on every
+# side; only the tile core is kept when masks are reassembled
+MODEL_TILE_PX = 512
+OVERLAP_PX = 32
+
+
+class ModelRunner(ABC):
+    """
+    Segmentation model interface: `predict` takes a float32 batch of Sigma0 dB tiles
+    shaped (N, 1, tile_px, tile_px) and returns oil probabilities of the same shape.
+    """
+    tile_px = MODEL_TILE_PX
+
+    @abstractmethod
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        ...
+
+    def describe(self):
+        """Identifies the model (for logs and the result cache fingerprint)."""
+        return {"runner": type(self).__name__, "tile_px": self.tile_px}
+
+
+class OnnxModelRunner(ModelRunner):
+    """
+    Runs an exported segmentation network with ONNX Runtime on CPU. Inputs are
+    standardized with the training statistics (`input_mean_db`, `input_std_db`);
+    models exporting logits get a sigmoid applied.
+    """
+
+    def __init__(self, model_path: str, tile_px: int = MODEL_TILE_PX, intra_op_threads: int = 0,
+                 input_mean_db: float = -20.0, input_std_db: float = 5.0, outputs_logits: bool = True):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads  # 0 = one per core
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        self.model_path = model_path
+        self.tile_px = tile_px
+        self.input_mean_db = input_mean_db
+        self.input_std_db = input_std_db
+        self.outputs_logits = outputs_logits
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        x = (batch - self.input_mean_db) * (1.0 / self.input_std_db)
+        out = self.session.run(None, {self.input_name: x.astype(np.float32, copy=False)})[0]
+        if self.outputs_logits:
+            out = 1.0 / (1.0 + np.exp(-out))
+        return out.astype(np.float32, copy=False)
+
+    def describe(self):
+        return dict(super().describe(), model_path=self.model_path,
+                    model_mtime=os.path.getmtime(self.model_path))
+
+
+class ThresholdModelRunner(ModelRunner):
+    """
+    Local stand-in model with no weights: the dark-spot detector of the scene
+    pipeline as a soft probability, sigmoid((threshold_db - smoothed dB) / softness_db).
+    Deterministic, so it is usable offline and in tests.
+    """
+
+    def __init__(self, tile_px: int = MODEL_TILE_PX, threshold_db: float = -21.0, smooth_px: int = 7,
+                 softness_db: float = 1.0):
+        self.tile_px = tile_px
+        self.threshold_db = threshold_db
+        self.smooth_px = smooth_px
+        self.softness_db = softness_db
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        import cv2
+
+        out = np.empty_like(batch, dtype=np.float32)
+        for i in range(len(batch)):
+            cv2.blur(batch[i, 0], (self.smooth_px, self.smooth_px), dst=out[i, 0])
+        out -= self.threshold_db
+        out *= 1.0 / self.softness_db
+        np.exp(out, out=out)
+        out += 1.0
+        np.reciprocal(out, out=out)
+        return out
+
+    def describe(self):
+        return dict(super().describe(), threshold_db=self.threshold_db, smooth_px=self.smooth_px,
+                    softness_db=self.softness_db)
+
+
+def create_runner(settings: dict = None):
+    """
+    ONNX runner when a model is configured (`model_path` or SAR_MODEL_PATH), else the
+    threshold stand-in (with the scene pipeline's `threshold_db` and `smooth_px`).
+    """
+    settings = settings or {}
+    model_path = settings.get("model_path", os.getenv("SAR_MODEL_PATH"))
+    tile_px = int(settings.get("model_tile_px", MODEL_TILE_PX))
+    if model_path:
+        logger.info("[SAR Inference] Loading ONNX model %s", model_path)
+        return OnnxModelRunner(model_path, tile_px=tile_px,
+                               intra_op_threads=int(settings.get("intra_op_threads", 0)))
+    return ThresholdModelRunner(tile_px=tile_px, threshold_db=float(settings.get("threshold_db", -21.0)),
+                                smooth_px=int(settings.get("smooth_px", 7)))
+
+
+class MicroBatcher:
+    """
+    Collects single tiles from any number of threads into model batches. A batch runs
+    as soon as `max_batch` tiles are waiting or the oldest has waited `max_delay_ms`,
+    so concurrent requests share forward passes without a lone request stalling.
+    """
+
+    def __init__(self, runner: ModelRunner, max_batch: int = 8, max_delay_ms: float = 10.0):
+        self.runner = runner
+        self.max_batch = max_batch
+        self.max_delay_s = max_delay_ms / 1000.0
+        self.batches = 0
+        self.tiles = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, name="sar-microbatcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, tile: np.ndarray) -> Future:
+        """Queues one (tile_px, tile_px) Sigma0 dB tile; the future yields its probabilities."""
+        future = Future()
+        self._queue.put((tile, future))
+        return future
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            pending = [item]
+            deadline = time.monotonic() + self.max_delay_s
+            stop = False
+            while len(pending) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                pending.append(item)
+            self._run(pending)
+            if stop:
+                return
+
+    def _run(self, pending: list):
+        try:
+            probs = self.runner.predict(np.stack([tile for tile, _ in pending])[:, None])
+        except Exception as e:
+            for _, future in pending:
+                future.set_exception(e)
+            return
+        self.batches += 1
+        self.tiles += len(pending)
+        for i, (_, future) in enumerate(pending):
+            future.set_result(probs[i, 0])
+
+
+class ArraySource:
+    """In-memory raster with the SceneSource read interface."""
+
+    def __init__(self, array: np.ndarray):
+        self.array = array
+        self.height, self.width = array.shape[:2]
+        self.transform = None
+
+    def read(self, row0: int, row1: int, col0: int, col1: int):
+        return self.array[row0:row1, col0:col1]
+
+
+class SegmentationEngine:
+    """
+    Tiled scene inference: cuts a Sigma0 scene into model-sized tiles with OVERLAP_PX
+    of context, sends them through the shared MicroBatcher, and writes each tile's
+    core back into one probability mask. Tiles are submitted with a bounded number
+    in flight, so memory stays at a few batches whatever the scene size.
+    """
+
+    def __init__(self, runner: ModelRunner = None, max_batch: int = None, max_delay_ms: float = None,
+                 overlap_px: int = OVERLAP_PX):
+        self.runner = runner or create_runner()
+        max_batch = max_batch or int(os.getenv("SAR_INFERENCE_BATCH", "8"))
+        max_delay_ms = max_delay_ms if max_delay_ms is not None else float(os.getenv("SAR_INFERENCE_DELAY_MS", "10"))
+        self.batcher = MicroBatcher(self.runner, max_batch=max_batch, max_delay_ms=max_delay_ms)
+        self.overlap_px = overlap_px
+
+    def close(self):
+        self.batcher.close()
+
+    def describe(self):
+        return self.runner.describe()
+
+    def stats(self):
+        """Forward passes and tiles run so far (tiles per batch shows how well requests share)."""
+        return {"batches": self.batcher.batches, "tiles": self.batcher.tiles}
+
+    def predict(self, source, calibration_constant: float = None, out: np.ndarray = None):
+        """
+        Probability mask (float32, scene-sized, or written into `out`) for a Sigma0 dB
+        source: an ndarray, a SceneSource or a path. With `calibration_constant`, the
+        source holds DN and each tile is calibrated on the fly.
+        """
+        if isinstance(source, str):
+            source = SceneSource(source)
+        elif isinstance(source, np.ndarray):
+            source = ArraySource(source)
+        if out is None:
+            out = np.empty((source.height, source.width), dtype=np.float32)
+
+        tile_px = self.runner.tile_px
+        core_px = tile_px - 2 * self.overlap_px
+        in_flight = []
+        max_in_flight = 4 * self.batcher.max_batch
+        for core, halo in iter_tiles(source.height, source.width, core_px, self.overlap_px):
+            tile = source.read(*halo)
+            if calibration_constant is not None:
+                tile = calibrate_to_sigma0_db(tile, calibration_constant)
+            # Scene-edge tiles are mirrored out to the model's fixed input size, each axis
+            # on its own (a single row or column can only be repeated)
+            for axis, extent in enumerate(tile.shape):
+                if extent < tile_px:
+                    pad = [(0, 0), (0, 0)]
+                    pad[axis] = (0, tile_px - extent)
+                    tile = np.pad(tile, pad, mode="reflect" if extent > 1 else "edge")
+            in_flight.append((core, halo, self.batcher.submit(np.asarray(tile, dtype=np.float32))))
+            if len(in_flight) >= max_in_flight:
+                self._write(out, *in_flight.pop(0))
+        for item in in_flight:
+            self._write(out, *item)
+        return out
+
+    @staticmethod
+    def _write(out: np.ndarray, core: tuple, halo: tuple, future: Future):
+        probs = future.result()
+        r0, c0 = core[0] - halo[0], core[2] - halo[2]
+        out[core[0]:core[1], core[2]:core[3]] = probs[r0:r0 + core[1] - core[0], c0:c0 + core[3] - core[2]]
+
+    def segment(self, source, threshold: float = 0.5, calibration_constant: float = None):
+        """
+        Binary oil mask (uint8 0/255, the archive mask format) and the probability mask.
+        """
+        probs = self.predict(source, calibration_constant)
+        return (probs >= threshold).view(np.uint8) * np.uint8(255), probs
+
+
+# The one engine of an InferenceService process, built on the first call so starting
+# the service does not wait on the model
+_shared_engine = None
+_shared_settings = {}
+_shared_lock = threading.Lock()
+
+
+def _configure_shared_engine(settings: dict):
+    global _shared_settings
+    _shared_settings = settings or {}
+
+
+def _get_shared_engine():
+    global _shared_engine
+    with _shared_lock:
+        if _shared_engine is None:
+            _shared_engine = SegmentationEngine(create_runner(_shared_settings),
+                                                max_batch=_shared_settings.get("max_batch"),
+                                                max_delay_ms=_shared_settings.get("max_delay_ms"))
+        return _shared_engine
+
+
+class _InferenceManager(BaseManager):
+    pass
+
+
+_InferenceManager.register("engine", callable=_get_shared_engine, exposed=("predict", "describe", "stats"))
+
+
+class InferenceService:
+    """
+    One SegmentationEngine for a whole process pool. A manager process owns the model
+    and its MicroBatcher and serves each client connection on its own thread, so tiles
+    sent by different pool workers meet in the same batches. Clients connect with
+    RemoteSegmenter at `address`; the pool's workers share this process's authkey.
+    """
+
+    def __init__(self, settings: dict = None):
+        self.settings = settings or {}
+        self.manager = None
+
+    @property
+    def address(self):
+        return self.manager.address if self.manager is not None else None
+
+    def start(self):
+        self.manager = _InferenceManager()
+        self.manager.start(initializer=_configure_shared_engine, initargs=(self.settings,))
+        logger.info("[SAR Inference] Shared inference service listening on %s", self.manager.address)
+        return self.manager.address
+
+    def shutdown(self):
+        if self.manager is not None:
+            self.manager.shutdown()
+            self.manager = None
+
+
+class RemoteSegmenter:
+    """
+    Client of an InferenceService with the engine's predict/segment/describe. Picklable:
+    only the address travels, and each process connects on first use.
+    """
+
+    def __init__(self, address):
+        self.address = address
+        self._engine = None
+
+    def __getstate__(self):
+        return {"address": self.address, "_engine": None}
+
+    def _remote(self):
+        if self._engine is None:
+            manager = _InferenceManager(address=self.address)
+            manager.connect()
+            self._engine = manager.engine()
+        return self._engine
+
+    def predict(self, source, calibration_constant: float = None):
+        return self._remote().predict(source, calibration_constant)
+
+    def segment(self, source, threshold: float = 0.5, calibration_constant: float = None):
+        probs = self.predict(source, calibration_constant)
+        return (probs >= threshold).view(np.uint8) * np.uint8(255), probs
+
+    def describe(self):
+        return self._remote().describe()
+
+    def stats(self):
+        return self._remote().stats()
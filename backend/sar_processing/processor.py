@@ -1,8 +1,15 @@
 import os
+import hashlib
+import logging
 import numpy as np
 import cv2
-import glob
-import random
+from .catalog import MaskCatalog
+from .scene import SceneSource, process_scene, normalize_scene_to_sigma0
+from .tiles import build_tile_pyramid
+from .compositor import OverlayCompositor
+from telemetry import span, count
+
+logger = logging.getLogger("aeonblue.sar")
 
 class SARProcessor:
     def __init__(self, data_settings: dict = None):
@@ -15,51 +22,158 @@ class SARProcessor:
         self.mask_base_dir = data_settings["mask_base_dir"]
         self.pixel_res = data_settings["pixel_resolution_m"]
         self.thickness_um = data_settings["film_thickness_um"]
+        # Masks below this many oil pixels are not served for unknown image ids
+        self.min_oil_pixels = data_settings.get("min_oil_pixels", 100)
+        self.catalog_path = data_settings.get(
+            "catalog_path", os.getenv("MASK_CATALOG_PATH", "DataSet/Mask/mask_catalog.sqlite"))
+        self.catalog = None
+
+        # Full-scene (GRD) processing: calibration constant A_sigma (sigma0 = DN^2 / A^2),
+        # dark-spot threshold in Sigma0 dB and its smoothing window, tile pool size
+        # Multi-slick extraction: smallest slick reported (0: any slick of at least one
+        # pixel, whatever the pixel size), and the polygon simplification tolerance in
+        # pixels (Douglas-Peucker on the repaired outline)
+        self.min_slick_area_m2 = data_settings.get("min_slick_area_m2", 0.0)
+        self.simplify_tolerance_px = data_settings.get("simplify_tolerance_px", 1.0)
+        # Reused overlay buffers (one processor per worker process)
+        self.compositor = OverlayCompositor(fade_px=400.0)
+        # Where the API is reachable from the browser, for tile URLs
+        self.public_base_url = data_settings.get("public_base_url", os.getenv("PUBLIC_BASE_URL", "http://localhost:8000"))
+        self.scene_pixel_res = data_settings.get("scene_pixel_resolution_m", 10.0)  # IW GRD-H pixel spacing
+        self.scene_params = {
+            "calibration_constant": data_settings.get("calibration_constant", 474.0),
+            "threshold_db": data_settings.get("threshold_db", -21.0),
+            "smooth_px": data_settings.get("smooth_px", 7)
+        }
+        self.scene_workers = int(data_settings.get("scene_workers", os.getenv("SAR_SCENE_WORKERS", "1")))
+        # Segmentation model inference (ONNX when SAR_MODEL_PATH is set, threshold stand-in otherwise),
+        # built on first use; probabilities at or above the threshold count as oil. In pipeline
+        # workers the model lives in the pool's shared inference service (SAR_INFERENCE_ADDRESS)
+        self.inference_settings = data_settings.get("inference", {})
+        self.inference_threshold = data_settings.get("inference_threshold", 0.5)
+        self.inference_address = data_settings.get("inference_address", os.getenv("SAR_INFERENCE_ADDRESS"))
+        self.inference_service = None
+        self.segmenter = None
+
+    def cache_fingerprint(self):
+        """
+        Configuration and input-data version of this layer, for the result cache.
+        Adding or removing masks changes the archive directory's mtime.
+        """
+        archive_mtime = os.path.getmtime(self.mask_base_dir) if os.path.isdir(self.mask_base_dir) else None
+        return {
+            "layer_version": 4,
+            "mask_base_dir": self.mask_base_dir,
+            "archive_mtime": archive_mtime,
+            "pixel_resolution_m": self.pixel_res,
+            "film_thickness_um": self.thickness_um,
+            "min_slick_area_m2": self.min_slick_area_m2,
+            "simplify_tolerance_px": self.simplify_tolerance_px,
+            "scene_params": self.scene_params,
+            "inference_threshold": self.inference_threshold,
+            # Switching models (or model files) invalidates the masks it produced
+            "model": self.get_segmenter().describe()
+        }
+
+    def preload(self):
+        """Opens and refreshes the mask catalog ahead of the first request (background warm-up)."""
+        if os.path.isdir(self.mask_base_dir):
+            if self.catalog is None:
+                self.catalog = MaskCatalog(self.catalog_path, self.mask_base_dir)
+            self.catalog.refresh(wait=True)
+        # Loads the model (in the shared service when there is one)
+        self.get_segmenter().describe()
+
+    def get_segmenter(self):
+        """
+        The pool's shared inference service when running in a pipeline worker, else an
+        engine of this process. Scene tile processes (scene_workers > 1) can only reach a
+        service, so without one the processor starts its own.
+        """
+        if self.segmenter is None:
+            from .inference import SegmentationEngine, InferenceService, RemoteSegmenter, create_runner
+
+            settings = dict(self.scene_params, **self.inference_settings)
+            address = self.inference_address
+            if address is None and self.scene_workers > 1:
+                self.inference_service = InferenceService(settings)
+                address = self.inference_service.start()
+            if address is not None:
+                self.segmenter = RemoteSegmenter(address)
+            else:
+                self.segmenter = SegmentationEngine(create_runner(settings))
+        return self.segmenter
 
     def normalize_to_sigma0(self, raw_tiff_path: str):
         """
         Converts raw Sentinel-1 TIFFs into Sigma0 decibel (dB) values 
         to handle the high dynamic range of SAR data.
         """
-        # In a real environment:
-        # with rasterio.open(raw_tiff_path) as src:
-        #     data = src.read(1)
-        #     # Apply calibration factor logic to get sigma0 dB
-        #     return calibrated_data
-        
-        print(f"[SAR Processor] Normalizing {raw_tiff_path} to Sigma0 dB...")
-        return "sigma0_normalized_data_placeholder"
+        logger.info("[SAR Processor] Normalizing %s to Sigma0 dB...", raw_tiff_path)
+        if not os.path.exists(raw_tiff_path):
+            return "sigma0_normalized_data_placeholder"
+
+        # Streamed tile by tile into a float32 .npy next to the reports, never whole in memory
+        stem = os.path.splitext(os.path.basename(raw_tiff_path))[0]
+        out_path = os.path.join("Forensic_Reports", f"sigma0_{stem}.npy")
+        return normalize_scene_to_sigma0(SceneSource(raw_tiff_path), out_path,
+                                         self.scene_params["calibration_constant"])
+
+    @staticmethod
+    def _mock_mask():
+        mock_mask = np.zeros((256, 256), dtype=np.uint8)
+        mock_mask[100:150, 100:160] = 255
+        return mock_mask, "mock_path.tif"
 
     def get_mask_from_archive(self, image_id: str):
         """
         AI Ingestion: Pulls from massive 10GB Zenodo Sentinel-1 TIF Dataset.
-        Selects a dynamic mask (since this is real scattered data).
+        Masks are looked up in the SQLite mask catalog (built once, refreshed
+        incrementally): the mask named `image_id` if it exists, otherwise a random
+        mask with a meaningful amount of oil. Only the chosen TIF is decoded.
         """
-        tif_files = glob.glob(os.path.join(self.mask_base_dir, "*.tif"))
-        
-        if not tif_files:
-            print(f"[SAR Processor] CRITICAL: No TIF files found in {self.mask_base_dir}. Using fallback mock.")
-            mock_mask = np.zeros((256, 256), dtype=np.uint8)
-            mock_mask[100:150, 100:160] = 255
-            return mock_mask, "mock_path.tif"
-            
-        # Try to find a real dataset mask that actually contains oil (white pixels)
-        for _ in range(15):
-            chosen_tif = random.choice(tif_files)
-            mask_img = cv2.imread(chosen_tif, cv2.IMREAD_GRAYSCALE)
-            
-            if mask_img is not None:
-                # Zenith masks use 1 to denote oil. Threshold anything > 0 to 255 for cv2 contours
-                _, binary_mask = cv2.threshold(mask_img, 0, 255, cv2.THRESH_BINARY)
-                if np.sum(binary_mask > 0) > 100: # Ensure it has a meaningful amount of oil
-                    print(f"[SAR Processor] Fetching REAL dataset mask from: {chosen_tif}")
-                    return binary_mask, chosen_tif
-                    
-        # Fallback if somehow no images had oil
-        print("[SAR Processor] CRITICAL: Could not find any TIFs with oil. Using fallback mock.")
-        mock_mask = np.zeros((256, 256), dtype=np.uint8)
-        mock_mask[100:150, 100:160] = 255
-        return mock_mask, "mock_path.tif"
+        if not os.path.isdir(self.mask_base_dir):
+            logger.error("[SAR Processor] CRITICAL: No TIF files found in %s. Using fallback mock.", self.mask_base_dir)
+            return self._mock_mask()
+
+        if self.catalog is None:
+            self.catalog = MaskCatalog(self.catalog_path, self.mask_base_dir)
+        if self.catalog.is_built():
+            # A stale catalog is refreshed off the request path, which reads it as it is
+            self.catalog.refresh_in_background()
+        else:
+            self.catalog.refresh(wait=True)
+
+        entry = self.catalog.lookup(image_id) or self.catalog.random_with_oil(self.min_oil_pixels)
+        if entry is None:
+            # Fallback if somehow no images had oil
+            logger.error("[SAR Processor] CRITICAL: Could not find any TIFs with oil. Using fallback mock.")
+            return self._mock_mask()
+
+        mask_img = cv2.imread(entry["path"], cv2.IMREAD_GRAYSCALE)
+        if mask_img is None:
+            logger.error("[SAR Processor] CRITICAL: Catalogued mask %s is unreadable. Using fallback mock.",
+                         entry['path'])
+            return self._mock_mask()
+
+        # Zenith masks use 1 to denote oil. Threshold anything > 0 to 255 for cv2 contours
+        _, binary_mask = cv2.threshold(mask_img, 0, 255, cv2.THRESH_BINARY)
+        count("sar_mask_bytes_read", os.path.getsize(entry["path"]))
+        logger.info("[SAR Processor] Fetching REAL dataset mask from: %s (%s oil pixels)",
+                    entry['path'], entry['oil_pixels'])
+        return binary_mask, entry["path"]
+
+    def infer_mask(self, scene, calibrated: bool = True):
+        """
+        AI inference: segments a Sigma0 dB scene (ndarray or .npy/GeoTIFF path; DN when
+        calibrated=False) with the model runner, tile by tile through the micro-batcher.
+        Returns the binary mask (0/255, like archive masks) and its pollution metrics.
+        """
+        segmenter = self.get_segmenter()
+        calibration = None if calibrated else self.scene_params["calibration_constant"]
+        mask, _ = segmenter.segment(scene, self.inference_threshold, calibration)
+        logger.info("[SAR Processor] Inference done with %s.", segmenter.describe()['runner'])
+        return mask, self.quantify_pollution(mask)
 
     def quantify_pollution(self, mask: np.ndarray):
         """
@@ -67,10 +181,12 @@ class SARProcessor:
         - Pixel-to-Area: TotalArea = (Count(WhitePixels) * PixelResolution^2)
         - Volume Estimation: Multiplies area by film thickness (μm) 
         """
-        white_pixels_count = np.sum(mask > 0)
-        
+        return self.metrics_from_pixel_count(np.count_nonzero(mask))
+
+    def metrics_from_pixel_count(self, white_pixels_count: int, pixel_res_m: float = None):
         # Area in square meters
-        total_area_m2 = white_pixels_count * (self.pixel_res ** 2)
+        pixel_res_m = pixel_res_m or self.pixel_res
+        total_area_m2 = white_pixels_count * (pixel_res_m ** 2)
         
         # Volume: m^2 * (thickness_um * 1e-6 meters) = volume in cubic meters
         volume_m3 = total_area_m2 * (self.thickness_um * 1e-6)
@@ -84,9 +200,67 @@ class SARProcessor:
             "volume_m3": float(volume_m3),
             "volume_liters": float(volume_liters)
         }
-        print(f"[SAR Processor] Quantification Complete: {metrics}")
+        logger.info("[SAR Processor] Quantification Complete: %s", metrics)
         return metrics
 
+    def process_scene(self, scene_path: str, gps_coordinates: dict = None, image_id: str = None):
+        """
+        Runner for a full-size Sentinel-1 GRD scene (GeoTIFF or .npy DN raster).
+        Calibrates, segments with the model and quantifies tile by tile with overlap
+        halos, so memory stays bounded by the tile size, and stitches slick contours
+        across tile borders.
+        Georeferenced scenes use their own transform; otherwise the scene is centered on
+        gps_coordinates at the configured pixel resolution, as in process_spill.
+        """
+        from .slicks import slick_feature_collection, pixel_to_geo_transform
+        import shapely
+
+        source = SceneSource(scene_path)
+        image_id = image_id or os.path.splitext(os.path.basename(scene_path))[0]
+        logger.info("[SAR Processor] Processing scene %s (%sx%s) in tiles...", scene_path, source.width, source.height)
+
+        mask_path = os.path.join("Forensic_Reports", f"scene_mask_{image_id}.npy")
+        params = dict(self.scene_params, inference_threshold=self.inference_threshold)
+        oil_pixels, geometry, scene_tiles = process_scene(source, params, mask_out_path=mask_path,
+                                                          workers=self.scene_workers,
+                                                          segmenter=self.get_segmenter())
+        pollution_metrics = self.metrics_from_pixel_count(oil_pixels, self.scene_pixel_res)
+
+        if source.transform is not None:
+            transform = source.transform
+        else:
+            deg_per_pixel = self.scene_pixel_res / 111111.0
+            lon_deg_per_pixel = deg_per_pixel / max(0.01, np.cos(np.radians(gps_coordinates["lat"])))
+            transform = pixel_to_geo_transform(source.width, source.height, gps_coordinates["lon"],
+                                               gps_coordinates["lat"], lon_deg_per_pixel, deg_per_pixel)
+
+        # Stitched slicks, each sized by its polygon area in pixels
+        pixel_area_m2 = self.scene_pixel_res ** 2
+        parts = shapely.get_parts(geometry) if not geometry.is_empty else np.empty(0, dtype=object)
+        part_pixels = np.round(shapely.area(parts)).astype(np.int64)
+        keep = (part_pixels >= 1) & (part_pixels * pixel_area_m2 >= self.min_slick_area_m2)
+        slicks, spill_polygon = slick_feature_collection(parts[keep], part_pixels[keep], transform, pixel_area_m2,
+                                                         self.thickness_um, self.simplify_tolerance_px)
+
+        a, b, c, d, e, f = transform
+        corners = [(0, 0), (source.width, 0), (source.width, source.height), (0, source.height)]
+        bounds = [[a * x + b * y + c, d * x + e * y + f] for x, y in corners]
+
+        logger.info("[SAR Processor] Scene done: %s tiles, %s slicks, %s oil pixels.",
+                    scene_tiles, len(slicks['features']), oil_pixels)
+        return {
+            "image_id": image_id,
+            "gps_coordinates": gps_coordinates,
+            "mask_path": mask_path,
+            "metrics": pollution_metrics,
+            "polygon": spill_polygon,
+            "slicks": slicks,
+            "bounds": bounds,
+            # Processing tiles, not an overlay tileset: full scenes get no XYZ overlay
+            "scene_tiles": scene_tiles,
+            "status": "Processed"
+        }
+
     def process_spill(self, image_id: str, gps_coordinates: dict):
         """
         Main runner for the SAR Processing & AI Proxy Layer.
@@ -95,7 +269,8 @@ class SARProcessor:
         normalized_data = self.normalize_to_sigma0("raw_proxy")
 
         # 2. Extract real TIF mask
-        mask, mask_path = self.get_mask_from_archive(image_id)
+        with span("sar.mask_load"):
+            mask, mask_path = self.get_mask_from_archive(image_id)
 
         # 4. Generate precise Geographic Polygon from CV2 Contours
         center_lat = gps_coordinates["lat"]
@@ -122,89 +297,33 @@ class SARProcessor:
         ]
 
         # Since real Sentinel-1 32-bit floats cannot easily be decoded by cv2 natively,
-        # we construct a physically accurate synthetic SAR patch for the *full image*.
-        # 1. Base chaotic wave backscatter (Speckle Noise on water)
-        synthetic_sar = np.random.normal(loc=120, scale=25, size=mask.shape)
-        # 2. Oil slick dampening (Smoother, darker)
-        oil_noise = np.random.normal(loc=35, scale=8, size=mask.shape)
-        
-        # 3. Combine perfectly on the exact polygon mask
-        raw_img = np.where(mask > 0, oil_noise, synthetic_sar)
-        raw_img = np.clip(raw_img, 0, 255).astype(np.uint8)
-        
-        # Slightly blur the boundaries to make the oil blending feel ultra organic
-        raw_img = cv2.GaussianBlur(raw_img, (3, 3), 0)
-
-        # --- Alpha Channel & Seamless Edge Feathering ---
-        # A solid square SAR overlay covers coastlines blindly. We generate a dynamic 
-        # distance field from the oil contour and fade the SAR noise into total transparency!
-        inverted_mask = cv2.bitwise_not(mask)
-        dist_transform = cv2.distanceTransform(inverted_mask, cv2.DIST_L2, 3)
-        
-        # Fade out 400 pixels away from the spill edge (extremely soft blend)
-        fade_dist = 400.0
-        alpha = np.clip(1.0 - (dist_transform / fade_dist), 0, 1) * 255.0
-        
-        # Build RGBA image
-        bgra_img = cv2.cvtColor(raw_img, cv2.COLOR_GRAY2BGRA)
-        bgra_img[:, :, 3] = alpha.astype(np.uint8)
-
-        # Find contours of the white (255) oil spill pixels
-        # CHAIN_APPROX_SIMPLE compresses straight pixel-lines to their end points,
-        # perfectly preserving the polygon outline but dropping redundant intermediate points 
-        # that were choking MapLibre's rendering engine!
-        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        
-        spill_polygon = []
-        if len(contours) > 0:
-            # Get the largest oil body if multiple exist in the TIF
-            largest_contour = max(contours, key=cv2.contourArea)
-            
-            # Extract precise polygon vertices points
-            # We omit approxPolyDP completely because it creates "bowtie" self-intersections 
-            # on organic natural shapes, which MapLibre strictly and silently suppresses!
-            # We also skip slicing (like [::10]) to ensure we never accidentally fall under the 
-            # minimum 4-coordinate GeoJSON polygon limit on small contours. MapLibre can render 10,000 pts instantly.
-            for point in largest_contour:
-                px = point[0][0] # x coordinate (Width)
-                py = point[0][1] # y coordinate (Height)
-                
-                # Offset from image center
-                dx_pixels = px - (w / 2.0)
-                dy_pixels = (h / 2.0) - py # Y is inverted in images vs maps
-                
-                pt_lon = center_lon + (dx_pixels * lon_deg_per_pixel)
-                pt_lat = center_lat + (dy_pixels * deg_per_pixel)
-                
-                spill_polygon.append([pt_lon, pt_lat])
-                
-            # Close the polygon loop for GeoJSON specification
-            if len(spill_polygon) > 0:
-                spill_polygon.append(spill_polygon[0])
-                
-            # --- GEOJSON SANITIZATION ---
-            # MapLibre natively and silently refuses to render ANY polygon that overlaps itself (bowties).
-            # Because oil disperses organically, raster contours constantly fold over themselves.
-            # We use Shapely's buffer(0) to analytically dissolve all self-intersecting loops into perfect flat geometry!
-            try:
-                import shapely.geometry
-                poly_shape = shapely.geometry.Polygon(spill_polygon)
-                safe_poly = poly_shape.buffer(0)
-                
-                if safe_poly.geom_type == 'MultiPolygon':
-                    # If dissolving split it into islands, grab the main body
-                    biggest = max(safe_poly.geoms, key=lambda a: a.area)
-                    clean_coords = list(biggest.exterior.coords)
-                else:
-                    clean_coords = list(safe_poly.exterior.coords)
-                    
-                spill_polygon = [list(pt) for pt in clean_coords]
-            except Exception as e:
-                print(f"[SAR Processor] Shapely topology cleanup warning: {e}")
+        # we construct a physically accurate synthetic SAR patch: chaotic wave speckle on
+        # water, smoother and darker backscatter on the slick, feathered into total
+        # transparency 400 px from the spill edge so the overlay never covers coastlines
+        # blindly. Only the region the fade can reach is computed (see OverlayCompositor).
+        # Speckle seeded by the mask name: the same mask always renders the same overlay
+        # and so reuses its content-addressed tileset
+        seed = int.from_bytes(hashlib.sha1(os.path.basename(mask_path).encode("utf-8")).digest()[:8], "little")
+        with span("sar.composite"):
+            bgra_img = self.compositor.composite(mask, seed=seed)
 
-        else:
+        # Every oil body above min_slick_area_m2 becomes a slick: contours (CHAIN_APPROX_SIMPLE
+        # keeps the outline but drops redundant points) are repaired with make_valid, since
+        # MapLibre silently refuses self-intersecting polygons, simplified, and
+        # georeferenced in one affine op over all vertices.
+        from .slicks import contour_polygons, slick_feature_collection, pixel_to_geo_transform
+
+        pixel_area_m2 = self.pixel_res ** 2
+        with span("sar.contour_extraction"):
+            polygons, oil_pixels = contour_polygons(mask, min_pixels=max(1, int(np.ceil(self.min_slick_area_m2 / pixel_area_m2))))
+            transform = pixel_to_geo_transform(w, h, center_lon, center_lat, lon_deg_per_pixel, deg_per_pixel)
+            slicks, spill_polygon = slick_feature_collection(polygons, oil_pixels, transform, pixel_area_m2,
+                                                             self.thickness_um, self.simplify_tolerance_px)
+        logger.info("[SAR Processor] Extracted %s slicks.", len(slicks['features']))
+
+        if not spill_polygon:
             # Fallback if the extracted real mask somehow had literally 0 oil (No oil category)
-            print("[SAR Processor] WARNING: The parsed TIF mask contained 0 oil pixels. Appending invisible fallback.")
+            logger.warning("[SAR Processor] WARNING: The parsed TIF mask contained 0 oil pixels. Appending invisible fallback.")
             spill_polygon = [
                 [center_lon - 0.001, center_lat - 0.001],
                 [center_lon + 0.001, center_lat - 0.001],
@@ -213,19 +332,12 @@ class SARProcessor:
                 [center_lon - 0.001, center_lat - 0.001]
             ]
             
-        # Extract File ID cleanly (e.g., '00000.tif' -> '00000')
-        filename = os.path.basename(mask_path)
-        file_id = filename.split(".")[0].split("_")[0]
-            
-        # Save as a web-compatible PNG (to support our seamless alpha transparency channel!) 
-        # locally in Forensic_Reports so MapLibre can ingest it dynamically
-        public_filename = f"sar_overlay_{file_id}.png"
-        public_path = os.path.join("Forensic_Reports", public_filename)
-        cv2.imwrite(public_path, bgra_img)
-        
-        import time
-        cache_buster = int(time.time() * 1000)
-        image_url = f"http://localhost:8000/reports/{public_filename}?t={cache_buster}"
+        # Cut the overlay (with its alpha feathering) into a content-addressed XYZ tile
+        # pyramid, so MapLibre fetches only the visible tiles and caches them for good
+        with span("sar.png_encode"):
+            tileset = build_tile_pyramid(bgra_img, (bounds[0][0], bounds[2][1], bounds[1][0], bounds[0][1]))
+        tiles = dict(tileset, url_template=(
+            f"{self.public_base_url}/tiles/{tileset['tileset_id']}/{{z}}/{{x}}/{{y}}.png"))
 
         return {
             "image_id": image_id,
@@ -233,7 +345,8 @@ class SARProcessor:
             "mask_path": mask_path,
             "metrics": pollution_metrics,
             "polygon": spill_polygon,
+            "slicks": slicks,
             "bounds": bounds,
-            "image_url": image_url,
+            "tiles": tiles,
             "status": "Processed"
         }
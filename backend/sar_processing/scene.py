@@ -0,0 +1,183 @@
+import numpy as np
+import cv2
+
+# Core tile edge in pixels; each tile is read with a halo of HALO_PX on every side so
+# smoothing and morphology near tile borders see the same neighbourhood as in one pass
+TILE_PX = 2048
+HALO_PX = 32
+
+
+class SceneSource:
+    """
+    Windowed reader over a full-size GRD raster: a GeoTIFF read through rasterio
+    windows, or a .npy array memory-mapped from disk. Only the requested window is
+    ever materialized. Picklable, so process-pool workers reopen it themselves.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.transform = None
+        self._handle = None
+        if path.endswith(".npy"):
+            self.height, self.width = np.load(path, mmap_mode="r").shape[:2]
+        else:
+            import rasterio
+
+            with rasterio.open(path) as ds:
+                self.height, self.width = ds.height, ds.width
+                if not ds.transform.is_identity:
+                    # (a, b, c, d, e, f): lon = a*x + b*y + c, lat = d*x + e*y + f
+                    self.transform = tuple(ds.transform)[:6]
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_handle"] = None
+        return state
+
+    def read(self, row0: int, row1: int, col0: int, col1: int):
+        if self.path.endswith(".npy"):
+            # Mapped per read: pages touched for this window are released with the map
+            # instead of accumulating in the process's resident set
+            scene = np.load(self.path, mmap_mode="r")
+            window = np.array(scene[row0:row1, col0:col1])
+            del scene
+            return window
+
+        from rasterio.windows import Window
+
+        if self._handle is None:
+            import rasterio
+
+            self._handle = rasterio.open(self.path)
+        return self._handle.read(1, window=Window(col0, row0, col1 - col0, row1 - row0))
+
+
+def iter_tiles(height: int, width: int, tile_px: int = TILE_PX, halo_px: int = HALO_PX):
+    """
+    Yields (core, halo) windows as (row0, row1, col0, col1); cores tile the scene
+    exactly, halos extend them by halo_px clipped to the scene.
+    """
+    for row0 in range(0, height, tile_px):
+        for col0 in range(0, width, tile_px):
+            core = (row0, min(row0 + tile_px, height), col0, min(col0 + tile_px, width))
+            halo = (max(0, core[0] - halo_px), min(height, core[1] + halo_px),
+                    max(0, core[2] - halo_px), min(width, core[3] + halo_px))
+            yield core, halo
+
+
+def calibrate_to_sigma0_db(dn: np.ndarray, calibration_constant: float):
+    """
+    Sentinel-1 radiometric calibration of digital numbers to Sigma0 in dB:
+    sigma0 = DN^2 / A^2, in float32 and in place to keep one tile-sized buffer.
+    """
+    db = dn.astype(np.float32)
+    np.square(db, out=db)
+    db *= 1.0 / (calibration_constant ** 2)
+    np.maximum(db, 1e-6, out=db)
+    np.log10(db, out=db)
+    db *= 10.0
+    return db
+
+
+def process_tile(source: SceneSource, core: tuple, halo: tuple, params: dict, mask_out_path: str = None,
+                 segmenter=None):
+    """
+    Calibrates, segments and quantifies one tile. With a `segmenter` (a SegmentationEngine
+    or RemoteSegmenter), oil is where the model's probability reaches
+    `inference_threshold`. Without one, dark-spot detection: Sigma0 dB smoothed over
+    `smooth_px` below `threshold_db`, then a 3x3 opening against speckle.
+    Returns the core's oil pixel count and oil contours in scene pixel coordinates.
+    Contours are traced over the core plus one pixel to the right and bottom, so
+    slicks crossing a border overlap by a pixel and merge when stitched.
+    """
+    dn = source.read(*halo)
+    valid = dn != 0  # GRD no-data border
+    db = calibrate_to_sigma0_db(dn, params["calibration_constant"])
+    del dn
+    if segmenter is not None:
+        probs = segmenter.predict(db)
+        del db
+        mask = ((probs >= params.get("inference_threshold", 0.5)) & valid).view(np.uint8)
+        del probs, valid
+    else:
+        cv2.blur(db, (params["smooth_px"], params["smooth_px"]), dst=db)
+        mask = ((db < params["threshold_db"]) & valid).view(np.uint8)
+        del db, valid
+        cv2.morphologyEx(mask, cv2.MORPH_OPEN, np.ones((3, 3), np.uint8), dst=mask)
+
+    r0, c0 = core[0] - halo[0], core[2] - halo[2]
+    rows, cols = core[1] - core[0], core[3] - core[2]
+    core_mask = mask[r0:r0 + rows, c0:c0 + cols]
+    oil_pixels = int(np.count_nonzero(core_mask))
+
+    if mask_out_path is not None:
+        out = np.load(mask_out_path, mmap_mode="r+")
+        out[core[0]:core[1], core[2]:core[3]] = core_mask * np.uint8(255)
+        out.flush()
+        del out
+
+    rings = []
+    if oil_pixels:
+        trace = mask[r0:r0 + rows + 1, c0:c0 + cols + 1]
+        contours, _ = cv2.findContours(trace, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        for contour in contours:
+            if len(contour) >= 3:
+                rings.append((contour[:, 0, :] + (core[2], core[0])).tolist())
+    return {"core": core, "oil_pixels": oil_pixels, "rings": rings}
+
+
+def _process_tile_task(args):
+    return process_tile(*args)
+
+
+def stitch_rings(rings: list):
+    """
+    Unions per-tile contour rings (scene pixel coordinates) into one geometry, merging
+    slicks that were split across tile borders.
+    """
+    import shapely.geometry
+    from shapely.ops import unary_union
+
+    polygons = [shapely.geometry.Polygon(ring).buffer(0) for ring in rings]
+    return unary_union([polygon for polygon in polygons if not polygon.is_empty])
+
+
+def process_scene(source: SceneSource, params: dict, mask_out_path: str = None, workers: int = 1,
+                  tile_px: int = TILE_PX, halo_px: int = HALO_PX, segmenter=None):
+    """
+    Streams a whole scene tile by tile. Peak memory is a few tile-sized buffers per
+    worker regardless of scene size; `workers` > 1 spreads tiles over a process pool
+    (a segmenter is then sent to it, so it must be a RemoteSegmenter).
+    If mask_out_path is given, the binary oil mask is written into a uint8 .npy there.
+    Returns (oil_pixels, stitched geometry in pixel coordinates, tile count).
+    """
+    if mask_out_path is not None:
+        np.lib.format.open_memmap(mask_out_path, mode="w+", dtype=np.uint8,
+                                  shape=(source.height, source.width)).flush()
+
+    tasks = [(source, core, halo, params, mask_out_path, segmenter)
+             for core, halo in iter_tiles(source.height, source.width, tile_px, halo_px)]
+    if workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_process_tile_task, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+    else:
+        results = [process_tile(*task) for task in tasks]
+
+    oil_pixels = sum(result["oil_pixels"] for result in results)
+    geometry = stitch_rings([ring for result in results for ring in result["rings"]])
+    return oil_pixels, geometry, len(tasks)
+
+
+def normalize_scene_to_sigma0(source: SceneSource, out_path: str, calibration_constant: float,
+                              tile_px: int = TILE_PX):
+    """
+    Writes the calibrated Sigma0 dB scene into a float32 .npy, one tile at a time.
+    """
+    out = np.lib.format.open_memmap(out_path, mode="w+", dtype=np.float32, shape=(source.height, source.width))
+    for core, _ in iter_tiles(source.height, source.width, tile_px, 0):
+        out[core[0]:core[1], core[2]:core[3]] = calibrate_to_sigma0_db(source.read(*core), calibration_constant)
+    out.flush()
+    del out
+    return out_path
@@ -0,0 +1,100 @@
+import numpy as np
+import cv2
+import shapely
+from shapely.geometry import mapping
+
+
+def pixel_to_geo_transform(width: int, height: int, center_lon: float, center_lat: float,
+                           lon_deg_per_pixel: float, lat_deg_per_pixel: float):
+    """
+    Affine (a, b, c, d, e, f) placing an image centered on (center_lon, center_lat):
+    lon = a*x + b*y + c, lat = d*x + e*y + f (y grows downwards in images).
+    """
+    return (lon_deg_per_pixel, 0.0, center_lon - (width / 2.0) * lon_deg_per_pixel,
+            0.0, -lat_deg_per_pixel, center_lat + (height / 2.0) * lat_deg_per_pixel)
+
+
+def contour_polygons(mask: np.ndarray, min_pixels: int = 1):
+    """
+    Every oil body of a binary mask as a repaired Shapely polygon in pixel
+    coordinates, with its oil pixel count. Bodies are 8-connected components (the
+    same connectivity findContours uses for outer contours); the ones under
+    min_pixels are dropped.
+    """
+    count, labels, stats, _ = cv2.connectedComponentsWithStats((mask > 0).view(np.uint8), connectivity=8)
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    contours = [c[:, 0, :] for c in contours]
+    if not contours:
+        return np.empty(0, dtype=object), np.empty(0, dtype=np.int64)
+
+    # Component of each contour = label under its first vertex
+    firsts = np.array([c[0] for c in contours])
+    pixels = stats[labels[firsts[:, 1], firsts[:, 0]], cv2.CC_STAT_AREA]
+    keep = np.flatnonzero(pixels >= min_pixels)
+    if len(keep) == 0:
+        return np.empty(0, dtype=object), np.empty(0, dtype=np.int64)
+
+    # One ragged array of all vertices, built into rings and polygons in bulk
+    kept = [contours[i] for i in keep]
+    sizes = np.array([len(c) for c in kept])
+    polygons = np.full(len(kept), None, dtype=object)
+    rings = np.flatnonzero(sizes >= 3)
+    if len(rings):
+        coords = np.concatenate([kept[i] for i in rings]).astype(np.float64)
+        ring_index = np.repeat(np.arange(len(rings)), sizes[rings])
+        # Raster contours fold over themselves (bowties); make_valid dissolves them
+        polygons[rings] = shapely.make_valid(shapely.polygons(shapely.linearrings(coords, indices=ring_index)))
+
+    # Contours run through pixel centers, so bodies one pixel thin (a pixel, a line)
+    # have no area: their footprint is the contour widened by half a pixel instead
+    for i in np.flatnonzero([polygon is None or shapely.area(polygon) == 0 for polygon in polygons]):
+        vertices = kept[i].astype(np.float64)
+        outline = shapely.points(vertices[0]) if len(vertices) == 1 else shapely.linestrings(vertices)
+        polygons[i] = shapely.buffer(outline, 0.5, cap_style="square", join_style="mitre")
+    return polygons, pixels[keep].astype(np.int64)
+
+
+def slick_feature_collection(polygons, oil_pixels, transform: tuple, pixel_area_m2: float,
+                             thickness_um: float, simplify_px: float = 1.0):
+    """
+    Simplifies pixel-space slick polygons, georeferences all their vertices with one
+    affine NumPy op, and returns (GeoJSON FeatureCollection sorted by area with
+    per-slick area/volume, exterior ring of the largest slick).
+    """
+    if len(polygons) == 0:
+        return {"type": "FeatureCollection", "features": []}, []
+
+    if simplify_px > 0:
+        polygons = shapely.simplify(polygons, simplify_px, preserve_topology=True)
+    a, b, c, d, e, f = transform
+    matrix = np.array([[a, d], [b, e]])
+    offset = np.array([c, f])
+    polygons = shapely.transform(polygons, lambda xy: xy @ matrix + offset)
+
+    order = np.argsort(-np.asarray(oil_pixels))
+    features = []
+    main_ring = []
+    for rank, i in enumerate(order):
+        geometry = polygons[i]
+        # make_valid can hand back collections; keep only their polygonal parts
+        parts = [part for part in shapely.get_parts(geometry) if part.geom_type == "Polygon" and not part.is_empty]
+        if not parts:
+            continue
+        geometry = parts[0] if len(parts) == 1 else shapely.multipolygons(parts)
+        area_m2 = float(oil_pixels[i]) * pixel_area_m2
+        volume_m3 = area_m2 * thickness_um * 1e-6
+        features.append({
+            "type": "Feature",
+            "properties": {
+                "slick_id": rank,
+                "oil_pixels": int(oil_pixels[i]),
+                "area_m2": round(area_m2, 3),
+                "volume_m3": volume_m3,
+                "volume_liters": volume_m3 * 1000
+            },
+            "geometry": mapping(geometry)
+        })
+        if not main_ring:
+            largest = max(parts, key=lambda part: part.area)
+            main_ring = [list(pt) for pt in largest.exterior.coords]
+    return {"type": "FeatureCollection", "features": features}, main_ring
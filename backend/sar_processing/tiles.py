@@ -0,0 +1,133 @@
+import os
+import json
+import hashlib
+import logging
+import numpy as np
+
+logger = logging.getLogger("aeonblue.sar")
+
+TILE_SIZE = 256
+TILES_DIR = os.path.join("Forensic_Reports", "tiles")
+MAX_ZOOM_CAP = 22
+# Overview zooms kept below the single-tile zoom, so the slick stays visible zoomed out
+OVERVIEW_ZOOMS = 8
+
+
+def _lon_to_tile_x(lon, zoom: int):
+    return (np.asarray(lon) + 180.0) / 360.0 * (2 ** zoom)
+
+
+def _lat_to_tile_y(lat, zoom: int):
+    lat_rad = np.radians(np.asarray(lat))
+    return (1.0 - np.log(np.tan(lat_rad) + 1.0 / np.cos(lat_rad)) / np.pi) / 2.0 * (2 ** zoom)
+
+
+def _tile_y_to_lat(y, zoom: int):
+    return np.degrees(np.arctan(np.sinh(np.pi * (1.0 - 2.0 * np.asarray(y) / (2 ** zoom)))))
+
+
+def zoom_range(width: int, bounds: tuple):
+    """
+    (min_zoom, max_zoom) for an image of `width` pixels spanning bounds = (w, s, e, n):
+    max_zoom is the first Web Mercator zoom at least as fine as the image itself,
+    min_zoom is OVERVIEW_ZOOMS below the last one at which the whole image still fits
+    in a single tile.
+    """
+    lon_span = max(1e-12, bounds[2] - bounds[0])
+    src_deg_per_px = lon_span / width
+    max_zoom = int(np.ceil(np.log2(360.0 / (TILE_SIZE * src_deg_per_px))))
+    min_zoom = int(np.floor(np.log2(360.0 / lon_span))) - OVERVIEW_ZOOMS
+    max_zoom = int(np.clip(max_zoom, 0, MAX_ZOOM_CAP))
+    return int(np.clip(min_zoom, 0, max_zoom)), max_zoom
+
+
+def tileset_id_for(image: np.ndarray, bounds: tuple):
+    # Content address: identical overlays at identical bounds share one immutable tileset
+    digest = hashlib.sha1(image.tobytes())
+    digest.update(json.dumps([round(b, 9) for b in bounds]).encode("utf-8"))
+    return digest.hexdigest()[:20]
+
+
+def build_tile_pyramid(image: np.ndarray, bounds: tuple, tiles_dir: str = TILES_DIR):
+    """
+    Cuts a BGRA overlay spanning bounds = (west, south, east, north) into a Web Mercator
+    XYZ pyramid: <tiles_dir>/<tileset_id>/{z}/{x}/{y}.png plus tileset.json.
+    Every zoom from the coarsest overview to native resolution is resampled from the
+    nearest pyrDown overview of the image, so low zooms are not aliased. Fully
+    transparent tiles are not written. Returns the tileset metadata.
+    """
+    import cv2
+
+    tileset_id = tileset_id_for(image, bounds)
+    root = os.path.join(tiles_dir, tileset_id)
+    meta_path = os.path.join(root, "tileset.json")
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            return json.load(f)
+
+    west, south, east, north = bounds
+    min_zoom, max_zoom = zoom_range(image.shape[1], bounds)
+
+    # Overviews: each level halves the resolution of the previous one
+    overviews = [image]
+    while min(overviews[-1].shape[:2]) > 1 and len(overviews) <= max_zoom - min_zoom:
+        overviews.append(cv2.pyrDown(overviews[-1]))
+
+    src_deg_per_px = (east - west) / image.shape[1]
+    pixel = np.arange(TILE_SIZE, dtype=np.float64) + 0.5
+    written = 0
+    for zoom in range(min_zoom, max_zoom + 1):
+        tile_deg_per_px = 360.0 / (TILE_SIZE * 2 ** zoom)
+        level = int(np.clip(np.floor(np.log2(max(1.0, tile_deg_per_px / src_deg_per_px))), 0, len(overviews) - 1))
+        src = overviews[level]
+        src_h, src_w = src.shape[:2]
+
+        x0, x1 = np.floor(_lon_to_tile_x([west, east], zoom)).astype(int)
+        y0, y1 = np.floor(_lat_to_tile_y([north, south], zoom)).astype(int)
+        for tx in range(x0, x1 + 1):
+            lons = (tx + pixel / TILE_SIZE) / (2 ** zoom) * 360.0 - 180.0
+            map_x = ((lons - west) / (east - west) * src_w - 0.5).astype(np.float32)
+            for ty in range(y0, y1 + 1):
+                lats = _tile_y_to_lat(ty + pixel / TILE_SIZE, zoom)
+                map_y = ((north - lats) / (north - south) * src_h - 0.5).astype(np.float32)
+                grid_x, grid_y = np.meshgrid(map_x, map_y)
+                tile = cv2.remap(src, grid_x, grid_y, cv2.INTER_LINEAR,
+                                 borderMode=cv2.BORDER_CONSTANT, borderValue=(0, 0, 0, 0))
+                if not tile[:, :, 3].any():
+                    continue
+                tile_dir = os.path.join(root, str(zoom), str(tx))
+                os.makedirs(tile_dir, exist_ok=True)
+                cv2.imwrite(os.path.join(tile_dir, f"{ty}.png"), tile)
+                written += 1
+
+    meta = {
+        "tileset_id": tileset_id,
+        "bounds": [west, south, east, north],
+        "minzoom": min_zoom,
+        "maxzoom": max_zoom,
+        "tile_size": TILE_SIZE,
+        "tiles": written
+    }
+    os.makedirs(root, exist_ok=True)
+    # Written last: its presence marks a complete tileset
+    with open(meta_path, "w") as f:
+        json.dump(meta, f)
+    logger.info("[SAR Processor] Tile pyramid %s: z%s-%s, %s tiles.", tileset_id, min_zoom, max_zoom, written)
+    return meta
+
+
+def read_tileset(tileset_id: str, tiles_dir: str = TILES_DIR):
+    """The tileset's metadata, or None if it does not exist (or the id is malformed)."""
+    from artifacts import ARTIFACT_ID
+
+    if not ARTIFACT_ID.match(tileset_id):
+        return None
+    meta_path = os.path.join(tiles_dir, tileset_id, "tileset.json")
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path) as f:
+        return json.load(f)
+
+
+def tile_path(tileset_id: str, z: int, x: int, y: int, tiles_dir: str = TILES_DIR):
+    return os.path.join(tiles_dir, tileset_id, str(z), str(x), f"{y}.png")
@@ -0,0 +1,210 @@
+import os
+import sys
+import time
+import queue
+import atexit
+import logging
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+
+# Histogram bucket upper bounds in seconds (Prometheus convention), 1 ms to 60 s
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+PROFILES_DIR = os.path.join("Forensic_Reports", "profiles")
+
+
+class Registry:
+    """
+    Span histograms and counters of one process. Worker processes drain theirs after
+    every task and the API process merges the deltas, so /metrics covers the pools too.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}  # (name, labels) -> [per-bucket counts incl. +Inf, sum]
+        self._counters = {}  # (name, labels) -> value
+
+    def observe(self, name: str, seconds: float, labels: tuple = ()):
+        bucket = bisect_left(BUCKETS, seconds)
+        with self._lock:
+            histogram = self._histograms.get((name, labels))
+            if histogram is None:
+                histogram = self._histograms[(name, labels)] = [0] * (len(BUCKETS) + 1) + [0.0]
+            histogram[bucket] += 1
+            histogram[-1] += seconds
+
+    def inc(self, name: str, value: float = 1, labels: tuple = ()):
+        with self._lock:
+            self._counters[(name, labels)] = self._counters.get((name, labels), 0) + value
+
+    def drain(self):
+        with self._lock:
+            delta = {"histograms": self._histograms, "counters": self._counters}
+            self._histograms, self._counters = {}, {}
+        return delta
+
+    def merge(self, delta: dict):
+        with self._lock:
+            for key, values in delta["histograms"].items():
+                histogram = self._histograms.setdefault(key, [0] * (len(BUCKETS) + 1) + [0.0])
+                for i, value in enumerate(values):
+                    histogram[i] += value
+            for key, value in delta["counters"].items():
+                self._counters[key] = self._counters.get(key, 0) + value
+
+    @staticmethod
+    def _labels(labels: tuple, extra: str = None):
+        parts = [f'{name}="{value}"' for name, value in labels] + ([extra] if extra else [])
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            histograms = sorted((key, list(values)) for key, values in self._histograms.items())
+            counters = sorted(self._counters.items())
+        lines, typed = [], set()
+        for (name, labels), values in histograms:
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ("+Inf",), values[:-1]):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{name}_bucket{self._labels(labels, le)} {cumulative}")
+            lines.append(f"{name}_sum{self._labels(labels)} {values[-1]:.6f}")
+            lines.append(f"{name}_count{self._labels(labels)} {cumulative}")
+        for (name, labels), value in counters:
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{self._labels(labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+_in_worker = False
+
+
+def _label_tuple(labels: dict):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+@contextmanager
+def span(name: str, **labels):
+    """
+    Times a block into the aeonblue_span_seconds histogram, e.g.
+    `with span("sar.mask_load"): ...`.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        REGISTRY.observe("aeonblue_span_seconds", time.perf_counter() - started,
+                         _label_tuple(dict(labels, span=name)))
+
+
+def observe(name: str, seconds: float, **labels):
+    REGISTRY.observe(name, seconds, _label_tuple(labels))
+
+
+def count(name: str, value: float = 1, **labels):
+    """Adds to the counter aeonblue_<name>_total (rows scanned, bytes read, ...)."""
+    REGISTRY.inc(f"aeonblue_{name}_total", value, _label_tuple(labels))
+
+
+def mark_worker():
+    """Called by pool initializers: this process hands its metrics back per task."""
+    global _in_worker
+    _in_worker = True
+    # Forked workers start with a copy of the parent's registry, already counted there
+    REGISTRY.drain()
+
+
+def run_instrumented(fn, args: tuple, profile_path: str = None):
+    """
+    Pool entry point: runs fn(*args), optionally under the profiler, and returns
+    (result, metrics delta). The delta is None on threads of the API process, which
+    record into its registry directly.
+    """
+    if profile_path:
+        with profiled(profile_path):
+            result = fn(*args)
+    else:
+        result = fn(*args)
+    return result, (REGISTRY.drain() if _in_worker else None)
+
+
+def merge(delta: dict):
+    if delta:
+        REGISTRY.merge(delta)
+
+
+def profiling_enabled():
+    return os.getenv("PROFILE_REQUESTS", "0") == "1"
+
+
+@contextmanager
+def profiled(path: str):
+    """
+    Profiles a block into `path`: an HTML flame view with pyinstrument when it is
+    installed, otherwise a cProfile dump (`python -m pstats <path>.prof`).
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        Profiler = None
+
+    if Profiler is not None:
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            with open(f"{path}.html", "w") as f:
+                f.write(profiler.output_html())
+    else:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(f"{path}.prof")
+
+
+_log_pid = None
+_listener = None
+
+
+def install_log_queue():
+    """
+    Sends the "aeonblue.*" loggers through a QueueHandler drained by a background
+    QueueListener thread, so engine logging never blocks on the terminal or a pipe.
+    stdout and other libraries' loggers are left alone. Idempotent per process;
+    forked workers call it again to start their own listener. LOG_QUEUE=0 writes
+    the records directly instead.
+    """
+    global _log_pid, _listener
+    if _log_pid == os.getpid():
+        return
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger = logging.getLogger("aeonblue")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    if os.getenv("LOG_QUEUE", "1") == "0":
+        logger.handlers = [handler]
+    else:
+        log_queue = queue.SimpleQueue()
+        _listener = QueueListener(log_queue, handler)
+        _listener.start()
+        logger.handlers = [QueueHandler(log_queue)]
+        atexit.register(_listener.stop)
+    _log_pid = os.getpid()
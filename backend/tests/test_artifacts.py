@@ -0,0 +1,38 @@
+import os
+
+from artifacts import ArtifactStore
+
+
+def write(store: ArtifactStore, kind: str, artifact_id: str, case_id: str):
+    path = os.path.join(store.root, f"{artifact_id}.bin")
+    with open(path, "wb") as f:
+        f.write(b"x" * 100)
+    store.register(kind, artifact_id, path, case_id=case_id)
+    return path
+
+
+def test_eviction_keeps_pinned_and_held_artifacts(tmp_path):
+    # Over budget from the first artifact: everything evictable goes
+    store = ArtifactStore(root=str(tmp_path), max_bytes=1)
+    paths = {
+        "loose": write(store, "figure", "loose", "case_a"),
+        "pinned": write(store, "report", "pinned", "case_a"),
+        "held": write(store, "geometry", "held", "case_b"),
+        "shared": write(store, "tileset", "shared", "case_a"),
+    }
+    # The same content produced for a held case is kept for both
+    store.register("tileset", "shared", paths["shared"], case_id="case_b")
+    store.pin("pinned")
+    store.hold("case_b", reason="litigation")
+
+    assert store.evict() == {"evicted": 1, "freed_bytes": 100}
+    assert store.get("loose") is None and not os.path.exists(paths["loose"])
+    for artifact_id in ("pinned", "held", "shared"):
+        assert store.get(artifact_id) is not None and os.path.exists(paths[artifact_id])
+    assert store.get("shared")["legal_hold"]
+
+    # Released and unpinned, they go on the next pass
+    store.release("case_b")
+    store.pin("pinned", False)
+    assert store.evict()["evicted"] == 3
+    assert store.list()[0] == []
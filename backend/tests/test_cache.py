@@ -0,0 +1,45 @@
+import os
+import shutil
+
+import pytest
+
+import pipeline
+from sar_processing.tiles import TILES_DIR, read_tileset
+
+COORDS = {"lat": 1.25, "lon": 103.85}
+
+
+@pytest.fixture
+def worker(tmp_path, monkeypatch):
+    """A fresh pipeline worker (engines, result cache) working in tmp_path."""
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("Forensic_Reports")
+    monkeypatch.setenv("RESULT_CACHE", "1")
+    monkeypatch.setenv("RESULT_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(pipeline, "_engines", {})
+    return pipeline._engine("cache")
+
+
+def test_sar_entry_without_its_tileset_is_recomputed(worker):
+    first = pipeline.run_sar("mock_scene", COORDS)
+    tileset_id = first["tiles"]["tileset_id"]
+    assert pipeline.run_sar("mock_scene", COORDS) == first
+    assert worker.misses == 1
+
+    # The overlay was evicted: the cached result would point the map at missing tiles
+    shutil.rmtree(os.path.join(TILES_DIR, tileset_id))
+    again = pipeline.run_sar("mock_scene", COORDS)
+    assert worker.misses == 2
+    assert again["tiles"]["tileset_id"] == tileset_id
+    assert read_tileset(tileset_id) is not None
+
+
+def test_sar_entry_from_before_tiles_is_recomputed(worker):
+    sar = pipeline._engine("sar")
+    inputs = {"image_id": "mock_scene", "gps_coordinates": COORDS}
+    key = worker.make_key("sar", sar.cache_fingerprint(), inputs)
+    worker.put("sar", key, {"image_id": "mock_scene", "overlay_url": "/reports/old.png"})
+
+    result = pipeline.run_sar("mock_scene", COORDS)
+    assert worker.misses == 1
+    assert read_tileset(result["tiles"]["tileset_id"]) is not None
@@ -0,0 +1,70 @@
+import asyncio
+import time
+
+from cache import ResultCache
+from jobs import JobManager, LAYERS
+
+REQUEST = {"image_id": "scene_1", "gps_coordinates": {"lat": 1.25, "lon": 103.85}, "timestamp": "2024-03-01T00:00:00"}
+
+
+class FakePipeline:
+    """Runs every layer through a ResultCache under a fingerprint the test can bump."""
+
+    def __init__(self, cache_dir: str):
+        self.cache = ResultCache(cache_dir)
+        self.fingerprint = {"layer_version": 1}
+        self.computed = 0
+        self.release = asyncio.Event()
+
+    def _compute(self):
+        self.computed += 1
+        return {"layer_version": self.fingerprint["layer_version"]}
+
+    async def analyze_spill(self, image_id, gps_coordinates, timestamp, on_layer=None, scene_path=None):
+        await self.release.wait()
+        result = self.cache.get_or_compute("sar", dict(self.fingerprint), {"image_id": image_id}, self._compute)
+        for key in LAYERS:
+            on_layer(key, "done", result)
+
+
+async def wait_done(manager: JobManager, job_id: str):
+    deadline = time.monotonic() + 10
+    while (job := manager.get(job_id))["status"] not in ("done", "failed"):
+        assert time.monotonic() < deadline
+        await asyncio.sleep(0.01)
+    return job
+
+
+def test_resubmission_after_a_fingerprint_bump_runs_again(tmp_path, monkeypatch):
+    monkeypatch.setenv("RESULT_CACHE", "1")
+
+    async def scenario():
+        fake = FakePipeline(str(tmp_path / "cache"))
+        manager = JobManager(fake, db_path=str(tmp_path / "jobs.sqlite"))
+        await manager.start()
+        try:
+            # Identical requests join the queued job, also when submitted from threads
+            first, duplicate = await asyncio.gather(asyncio.to_thread(manager.submit, REQUEST),
+                                                    asyncio.to_thread(manager.submit, REQUEST))
+            assert duplicate["id"] == first["id"]
+            fake.release.set()
+            done = await wait_done(manager, first["id"])
+            assert done["result"]["sar_processing"] == {"layer_version": 1}
+
+            # Finished jobs are not reused: the same request runs again, from the cache
+            rerun = manager.submit(REQUEST)
+            assert rerun["id"] != first["id"]
+            assert (await wait_done(manager, rerun["id"]))["result"]["sar_processing"] == {"layer_version": 1}
+            assert fake.computed == 1
+
+            # After a layer change the new job computes the new result
+            fake.fingerprint = {"layer_version": 2}
+            bumped = manager.submit(REQUEST)
+            assert bumped["id"] not in (first["id"], rerun["id"])
+            assert (await wait_done(manager, bumped["id"]))["result"]["sar_processing"] == {"layer_version": 2}
+            assert fake.computed == 2
+            assert manager.find_done(REQUEST)["id"] == bumped["id"]
+        finally:
+            await manager.stop()
+
+    asyncio.run(scenario())
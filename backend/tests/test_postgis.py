@@ -0,0 +1,103 @@
+"""
+Integration tests of the PostGIS AIS backend against a real database. Skipped unless
+AIS_DATABASE_URL points at a PostgreSQL server with PostGIS available, e.g.
+
+    docker run -d -p 5432:5432 -e POSTGRES_DB=aeonblue -e POSTGRES_HOST_AUTH_METHOD=trust postgis/postgis
+    AIS_DATABASE_URL=postgresql://postgres@localhost:5432/aeonblue python -m pytest tests/test_postgis.py
+
+The tables are created in a throwaway schema, so the database's own ais_fixes is untouched.
+"""
+import os
+import uuid
+from urllib.parse import quote
+import numpy as np
+import pandas as pd
+import pytest
+
+DATABASE_URL = os.getenv("AIS_DATABASE_URL")
+pytestmark = pytest.mark.skipif(not DATABASE_URL, reason="AIS_DATABASE_URL is not set")
+
+# Two vessels in Singapore Strait, one fix a minute for two hours: one crosses the origin
+# heading east, the other lies at anchor ~75 km away
+ORIGIN = (1.22, 103.82)
+START = pd.Timestamp("2024-03-01 00:00:00")
+
+
+def write_cadastre_csv(path: str):
+    minutes = np.arange(120)
+    rows = []
+    for mmsi, lat0, lon0, dlon in ((563000001, ORIGIN[0], ORIGIN[1] - 0.05, 0.001),
+                                   (563000002, ORIGIN[0] + 0.5, ORIGIN[1] + 0.5, 0.0)):
+        for m in minutes:
+            rows.append({"mmsi": mmsi, "base_date_time": (START + pd.Timedelta(minutes=int(m))).isoformat(),
+                         "latitude": lat0, "longitude": lon0 + dlon * m, "sog": 12.0 if dlon else 0.0,
+                         "vessel_name": f"VESSEL {mmsi}", "imo": f"IMO{mmsi}", "call_sign": f"C{mmsi % 1000}",
+                         "vessel_type": 80})
+    pd.DataFrame(rows).to_csv(path, index=False)
+    return len(rows)
+
+
+@pytest.fixture
+def store():
+    psycopg2 = pytest.importorskip("psycopg2")
+    from ais_correlation.postgis import PostGISStore
+
+    schema = f"aeonblue_test_{uuid.uuid4().hex[:12]}"
+    with psycopg2.connect(DATABASE_URL) as conn, conn.cursor() as cur:
+        cur.execute(f"CREATE SCHEMA {schema}")
+    separator = "&" if "?" in DATABASE_URL else "?"
+    store = PostGISStore(f"{DATABASE_URL}{separator}options={quote(f'-csearch_path={schema},public')}", pool_size=2)
+    try:
+        store.ensure_schema()
+        yield store
+    finally:
+        store.close()
+        with psycopg2.connect(DATABASE_URL) as conn, conn.cursor() as cur:
+            cur.execute(f"DROP SCHEMA {schema} CASCADE")
+
+
+def test_ensure_schema_is_idempotent(store):
+    store.ensure_schema()
+    assert store.read_manifest() is None
+    assert not store.is_current()
+
+
+def test_copy_ingest_and_window(store, tmp_path):
+    csv_path = str(tmp_path / "cadastre.csv")
+    rows = write_cadastre_csv(csv_path)
+    store.ingest_files([csv_path], chunksize=50)
+
+    manifest = store.read_manifest()
+    assert manifest["rows"] == rows
+    assert pd.Timestamp(manifest["start"]) == START
+    assert store.is_current(csv_path)
+
+    frame = store.read_window(START + pd.Timedelta(minutes=30), START + pd.Timedelta(minutes=59))
+    assert len(frame) == 2 * 30
+    assert list(frame.columns[:3]) == ["BaseDateTime", "MMSI", "LAT"]
+    assert frame["BaseDateTime"].dtype == "datetime64[ns]"
+    assert frame["MMSI"].dtype == np.int64 and frame["LAT"].dtype == np.float32
+    assert set(frame["VesselName"]) == {"VESSEL 563000001", "VESSEL 563000002"}
+    # The newest hour, both ends inclusive
+    assert store.preload(hours=1) == 2 * 61
+
+
+def test_near_query_filters_on_the_spheroid(store, tmp_path):
+    csv_path = str(tmp_path / "cadastre.csv")
+    write_cadastre_csv(csv_path)
+    store.ingest_files([csv_path])
+
+    end = START + pd.Timedelta(minutes=119)
+    # Only the moving vessel passes within 2 km of the origin; it covers ~0.036 deg there
+    near = store.query(START, end, [ORIGIN], 2000.0, columns=["MMSI", "LAT", "LON"])
+    assert set(near["MMSI"]) == {563000001}
+    distance_deg = np.hypot(near["LAT"] - ORIGIN[0], (near["LON"] - ORIGIN[1]) * np.cos(np.radians(ORIGIN[0])))
+    assert (distance_deg * 111195.0 <= 2000.0 + 1.0).all()
+    assert 30 <= len(near) <= 40
+
+    # Several origins are one probe: the second brings in the anchored vessel
+    both = store.query(START, end, [ORIGIN, (ORIGIN[0] + 0.5, ORIGIN[1] + 0.5)], 2000.0)
+    assert set(both["MMSI"]) == {563000001, 563000002}
+    assert len(both) == len(near) + 120
+
+    assert store.query(end + pd.Timedelta(hours=1), end + pd.Timedelta(hours=2), [ORIGIN], 2000.0).empty
@@ -0,0 +1,40 @@
+import numpy as np
+import shapely
+
+from sar_processing.slicks import contour_polygons, slick_feature_collection
+
+IDENTITY = (1.0, 0.0, 0.0, 0.0, 1.0, 0.0)
+
+
+def mask_with_bodies():
+    mask = np.zeros((64, 64), dtype=np.uint8)
+    mask[2, 2] = 255                 # single pixel
+    mask[10, 5:15] = 255             # 1 x 10 line
+    mask[30:33, 30:33] = np.eye(3, dtype=np.uint8) * 255  # diagonal, 8-connected
+    mask[20:22, 20:22] = 255         # 2 x 2
+    mask[40:50, 40:50] = 255         # 10 x 10
+    return mask
+
+
+def test_every_body_becomes_a_polygon():
+    polygons, pixels = contour_polygons(mask_with_bodies())
+    assert sorted(pixels.tolist()) == [1, 3, 4, 10, 100]
+    assert all(polygon.geom_type == "Polygon" and polygon.area > 0 for polygon in polygons)
+
+    # Thin bodies cover their pixel footprint
+    by_pixels = dict(zip(pixels.tolist(), polygons))
+    assert by_pixels[1].area == 1.0
+    assert by_pixels[10].area == 10.0
+    assert by_pixels[1].contains(shapely.Point(2, 2))
+
+
+def test_thin_slicks_reach_the_feature_collection():
+    polygons, pixels = contour_polygons(mask_with_bodies())
+    slicks, main_ring = slick_feature_collection(polygons, pixels, IDENTITY, pixel_area_m2=1.0, thickness_um=1.0)
+    assert [f["properties"]["oil_pixels"] for f in slicks["features"]] == [100, 10, 4, 3, 1]
+    assert len(main_ring) >= 4
+
+
+def test_min_pixels_drops_small_bodies():
+    _, pixels = contour_polygons(mask_with_bodies(), min_pixels=4)
+    assert sorted(pixels.tolist()) == [4, 10, 100]
@@ -1,10 +1,24 @@
-import { useState, useCallback, useEffect } from 'react'
+import { useState, useCallback, useEffect, useRef } from 'react'
 import MapView from './components/MapView'
 import SearchBar from './components/SearchBar'
 import NavPillar from './components/NavPillar'
 import DetailsSheet from './components/DetailsSheet'
 import FloatingControls from './components/FloatingControls'
 import styles from './App.module.css'
+import { fetchGeometry, mergeGeometry } from './geometry'
+
+const API_URL = 'http://localhost:8000'
+const JOB_POLL_MS = 1500
+
+// Follows a queued job (GET /jobs/{id}) until it is done or failed
+async function waitForJob(jobUrl) {
+  for (;;) {
+    const response = await fetch(`${API_URL}${jobUrl}`);
+    const job = await response.json();
+    if (job.status === 'done' || job.status === 'failed') return job;
+    await new Promise(resolve => setTimeout(resolve, JOB_POLL_MS));
+  }
+}
 
 export default function App() {
   const [sheetOpen, setSheetOpen] = useState(false)
@@ -32,20 +46,32 @@ export default function App() {
     const coords = alertToUse?.coords || [103.82, 1.22];
 
     try {
-      const fetchPromise = fetch('http://localhost:8000/analyze_spill', {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({
-          image_id: "ZENODO_S1A_IW_GRDH_1SDV_0001",
-          gps_coordinates: { lon: coords[0], lat: coords[1] },
-          timestamp: new Date().toISOString()
-        })
-      });
-
-      const [response] = await Promise.all([fetchPromise, minWait]);
-      const result = await response.json();
+      let result;
+      if (alertToUse?.job_url) {
+        // Live incidents already have a job analyzing the dropped scene: follow it
+        const [job] = await Promise.all([waitForJob(alertToUse.job_url), minWait]);
+        if (job.status === 'failed') throw new Error(job.error);
+        result = job;
+      } else {
+        const fetchPromise = fetch(`${API_URL}/analyze_spill`, {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify({
+            image_id: "ZENODO_S1A_IW_GRDH_1SDV_0001",
+            gps_coordinates: { lon: coords[0], lat: coords[1] },
+            timestamp: new Date().toISOString()
+          })
+        });
+
+        const [response] = await Promise.all([fetchPromise, minWait]);
+        result = await response.json();
+      }
       if (result && result.data) {
-        setIncidentData(result.data);
+        // Slim result: polygons and wake path come from the geometry endpoint
+        const data = result.data.geometry_url
+          ? mergeGeometry(result.data, await fetchGeometry(result.data.geometry_url))
+          : result.data;
+        setIncidentData(data);
       }
     } catch (e) {
       console.error("Forensic engine error: ", e)
@@ -79,36 +105,32 @@ export default function App() {
     handleSpillClick(alert);
   }, [handleSpillClick]);
 
-  // Real-Time Polling Loop for True Live Detection
+  // Live detection feed: the backend pushes an "incident" event for every new
+  // Sentinel-1 scene it ingests (Server-Sent Events; the browser reconnects itself)
+  const busyRef = useRef(false);
+  busyRef.current = isScanned || isAnalyzing;
+
   useEffect(() => {
     if (!liveMode) return;
 
-    console.log("Started true live detection polling...");
-    const interval = setInterval(async () => {
-      // If currently scanning or analyzing, skip this poll
-      if (isScanned || isAnalyzing) return;
-
-      try {
-        console.log("Polling /system-status for new Sentinel-1 acquisitions...");
-        const res = await fetch('http://localhost:8000/system-status');
-        const data = await res.json();
-
-        if (data.new_incident) {
-          console.log("LIVE ALERT: New incident detected!", data.incident_data);
-          setSelectedAlert(data.incident_data);
-          setHasSearched(true);
-          handleSpillClick(data.incident_data);
-
-          // Toggle off live mode automatically so presentation doesn't endlessly loop
-          setLiveMode(false);
-        }
-      } catch (err) {
-        console.error("Polling error", err);
-      }
-    }, 30000); // Poll every 30 seconds as requested
+    console.log("Subscribed to the live detection feed...");
+    const source = new EventSource(`${API_URL}/live-feed`);
+    source.addEventListener('incident', (event) => {
+      // Ignore alerts while a scan or analysis is on screen
+      if (busyRef.current) return;
+      const incident = JSON.parse(event.data);
+      console.log("LIVE ALERT: New incident detected!", incident);
+      setSelectedAlert(incident);
+      setHasSearched(true);
+      handleSpillClick(incident);
+
+      // Toggle off live mode automatically so presentation doesn't endlessly loop
+      setLiveMode(false);
+    });
+    source.onerror = () => console.error("Live feed connection lost, retrying...");
 
-    return () => clearInterval(interval);
-  }, [liveMode, isScanned, isAnalyzing, handleSpillClick]);
+    return () => source.close();
+  }, [liveMode, handleSpillClick]);
 
   return (
     <div className={styles.viewport}>
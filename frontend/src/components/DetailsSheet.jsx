@@ -160,12 +160,24 @@ export default function DetailsSheet({ onClose, lockedVessel, incidentData, isAn
 
                 <div style={{ padding: '0 24px 16px' }}>
                     <button
-                        onClick={() => {
-                            if (incidentData?.reporting?.report_path) {
-                                window.open(`http://localhost:8000/reports/${incidentData.reporting.report_path}`, '_blank');
-                            } else {
+                        onClick={async () => {
+                            const report = incidentData?.reporting;
+                            if (!report?.report_path) {
                                 alert("Report is still being generated or is not available.");
+                                return;
                             }
+                            // Packets render in the background; check the queue before opening
+                            if (report.status && report.status !== 'ready') {
+                                const res = await fetch(`http://localhost:8000/report-queue/${report.report_id}`);
+                                const status = res.ok ? await res.json() : null;
+                                if (status?.status !== 'ready') {
+                                    alert(status?.status === 'failed'
+                                        ? "Report generation failed."
+                                        : "Report is still being generated. Try again in a moment.");
+                                    return;
+                                }
+                            }
+                            window.open(`http://localhost:8000/reports/${report.report_path}`, '_blank');
                         }}
                         style={{
                             width: '100%', padding: '12px', background: '#e8f0fe', color: '#1B4D6B',
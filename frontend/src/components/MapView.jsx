@@ -136,16 +136,48 @@ export default function MapView({ activeLayer = 'visual', isScanned, hasSearched
                 // 1. Polygon and SAR Map Layer Hydration
                 try {
                     const spillSource = map.getSource('spill-area');
-                    if (spillSource && currentPolygon.length >= 4) {
+                    const slicks = incidentData?.sar_processing?.slicks;
+                    if (spillSource && slicks?.features?.length) {
+                        // Every detected slick, not just the largest one
+                        spillSource.setData(slicks);
+                    } else if (spillSource && currentPolygon.length >= 4) {
                         spillSource.setData({ type: 'Feature', geometry: { type: 'Polygon', coordinates: [currentPolygon] } });
                     }
 
-                    const sarSource = map.getSource('sar-image-src');
-                    if (sarSource && incidentData?.sar_processing?.image_url && incidentData?.sar_processing?.bounds) {
-                        sarSource.updateImage({
-                            url: incidentData.sar_processing.image_url,
-                            coordinates: incidentData.sar_processing.bounds
-                        });
+                    // SAR overlay as an XYZ tile pyramid: only visible tiles are fetched, and
+                    // tilesets are immutable so repeat views come straight from the HTTP cache
+                    const sarTiles = incidentData?.sar_processing?.tiles;
+                    if (sarTiles) {
+                        const sourceId = `sar-tiles-${sarTiles.tileset_id}`;
+                        if (!map.getSource(sourceId)) {
+                            if (map.getLayer('sar-image-layer')) map.removeLayer('sar-image-layer');
+                            Object.keys(map.getStyle().sources)
+                                .filter((id) => id.startsWith('sar-tiles-'))
+                                .forEach((id) => map.removeSource(id));
+
+                            map.addSource(sourceId, {
+                                type: 'raster',
+                                tiles: [sarTiles.url_template],
+                                tileSize: sarTiles.tile_size,
+                                bounds: sarTiles.bounds,
+                                minzoom: sarTiles.minzoom,
+                                maxzoom: sarTiles.maxzoom
+                            });
+                            // We place it BELOW the polygon fill
+                            map.addLayer({
+                                id: 'sar-image-layer',
+                                type: 'raster',
+                                source: sourceId,
+                                paint: {
+                                    'raster-opacity': 0,
+                                    'raster-opacity-transition': { duration: 1500 },
+                                    'raster-resampling': 'linear',
+                                    'raster-contrast': 0.15,
+                                    'raster-brightness-min': 0,
+                                    'raster-brightness-max': 1
+                                }
+                            }, 'spill-fill');
+                        }
 
                         if (activeLayer === 'sar') {
                             map.setPaintProperty('sar-image-layer', 'raster-opacity', 0.85);
@@ -247,27 +279,7 @@ export default function MapView({ activeLayer = 'visual', isScanned, hasSearched
         map.on('style.load', () => map.setProjection({ type: 'globe' }))
 
         map.on('load', () => {
-            // Real SAR Image Overlay Dataset! (Starts invisible)
-            map.addSource('sar-image-src', {
-                type: 'image',
-                url: 'data:image/gif;base64,R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7', // 1x1 invisible proxy block
-                coordinates: [[0, 0], [0, 0], [0, 0], [0, 0]] // Will be dynamically mapped
-            });
-
-            // We place it BELOW the polygon later
-            map.addLayer({
-                id: 'sar-image-layer',
-                type: 'raster',
-                source: 'sar-image-src',
-                paint: {
-                    'raster-opacity': 0,
-                    'raster-opacity-transition': { duration: 1500 },
-                    'raster-resampling': 'linear',
-                    'raster-contrast': 0.15,
-                    'raster-brightness-min': 0,
-                    'raster-brightness-max': 1
-                }
-            });
+            // Real SAR overlay tiles are added once an analysis returns its tileset
 
             // Polygon (using opacity transitions to fade in)
             map.addSource('spill-area', {
@@ -292,11 +304,6 @@ export default function MapView({ activeLayer = 'visual', isScanned, hasSearched
                 },
             })
 
-            // Correct mapping order: Put SAR underneath the polygon fill
-            if (map.getLayer('sar-image-layer') && map.getLayer('spill-fill')) {
-                map.moveLayer('sar-image-layer', 'spill-fill');
-            }
-
             // Lagrangian animated tracks
             map.addSource(`track-0`, {
                 type: 'geojson',
@@ -0,0 +1,69 @@
+// Geometry transport for /analyze_spill results.
+// The main response only carries ids and metrics; polygons, the wake path and the
+// origin density are fetched from /geometry/{id} in the compact quantized encoding
+// (integer coordinates, delta-encoded per ring) and decoded back to GeoJSON here.
+
+const API_BASE = 'http://localhost:8000'
+const QUANTIZED = 'application/vnd.aeonblue.quantized+json'
+
+const decodeCoords = (encoded, scale, translate) => {
+    const coords = []
+    let x = 0
+    let y = 0
+    for (let i = 0; i < encoded.length; i += 2) {
+        x += encoded[i]
+        y += encoded[i + 1]
+        coords.push([x * scale[0] + translate[0], y * scale[1] + translate[1]])
+    }
+    return coords
+}
+
+const decodeGeometry = (geometry, scale, translate) => {
+    const c = geometry.coordinates
+    switch (geometry.type) {
+        case 'Point':
+            return { type: 'Point', coordinates: decodeCoords(c, scale, translate)[0] }
+        case 'LineString':
+            return { type: 'LineString', coordinates: decodeCoords(c, scale, translate) }
+        case 'Polygon':
+            return { type: 'Polygon', coordinates: c.map((ring) => decodeCoords(ring, scale, translate)) }
+        case 'MultiPolygon':
+            return { type: 'MultiPolygon', coordinates: c.map((poly) => poly.map((ring) => decodeCoords(ring, scale, translate))) }
+        default:
+            return geometry
+    }
+}
+
+export async function fetchGeometry(geometryUrl) {
+    const res = await fetch(`${API_BASE}${geometryUrl}`, { headers: { Accept: QUANTIZED } })
+    const body = await res.json()
+    if (body.type !== 'QuantizedFeatureCollection') return body
+
+    const { scale, translate } = body.transform
+    const { transform, type, features, ...members } = body
+    return {
+        type: 'FeatureCollection',
+        ...members,
+        features: features.map((f) => ({ ...f, geometry: decodeGeometry(f.geometry, scale, translate) }))
+    }
+}
+
+// Puts the fetched geometry back where the components read it
+// (sar_processing.polygon / slicks, lagrangian_backtracking.wake_path_geojson / origin_density)
+export function mergeGeometry(data, collection) {
+    const byLayer = (layer) => collection.features.filter((f) => f.properties?.layer === layer)
+    const spillPolygon = byLayer('spill_polygon')[0]
+    return {
+        ...data,
+        sar_processing: data.sar_processing && {
+            ...data.sar_processing,
+            polygon: spillPolygon ? spillPolygon.geometry.coordinates[0] : undefined,
+            slicks: { type: 'FeatureCollection', features: byLayer('slick') }
+        },
+        lagrangian_backtracking: data.lagrangian_backtracking && {
+            ...data.lagrangian_backtracking,
+            wake_path_geojson: { type: 'FeatureCollection', features: byLayer('wake_path') },
+            origin_density: collection.origin_density
+        }
+    }
+}